@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when the client accepts several with the same quality.
+CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+# Random bytes added to the gzip header against BREACH, like django.middleware.gzip.GZipMiddleware.
+GZIP_MAX_RANDOM_BYTES = 100
+COMPRESSIBLE_TYPES = {'application/json', 'application/javascript', 'application/xml'}
+# Server-sent events must reach the client as soon as they are written, not when a compressor flushes.
+UNCOMPRESSED_TYPES = {'text/event-stream'}
+
+
+def accepted_codings(header):
+    """Content codings of an ``Accept-Encoding`` header mapped to their quality."""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, codings=CODINGS):
+    """The coding of ``codings`` the client accepts with the highest quality, ``None`` if it accepts none."""
+    accepted = accepted_codings(header)
+    qualities = [(accepted.get(coding, accepted.get('*', 0.0)), coding) for coding in codings]
+    quality, coding = max(qualities, key=lambda item: item[0])
+    return coding if quality > 0 else None
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return compress_string(content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type in UNCOMPRESSED_TYPES:
+        return False
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES or content_type.endswith('+json')
+
+
+class CompressionMiddleware:
+    """
+    Compress text and JSON responses of at least ``COMPRESSION_MIN_SIZE`` bytes with brotli or gzip.
+
+    The coding is negotiated from ``Accept-Encoding``; brotli is only offered when the ``brotli`` package is
+    installed. Streamed responses are gzipped as they are produced, except server-sent events and async streams.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if response.streaming:
+            coding = negotiate(header, ('gzip',))
+            if coding is None:
+                return response
+            response.streaming_content = compress_sequence(response.streaming_content,
+                                                           max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            del response.headers['Content-Length']
+        else:
+            coding = negotiate(header)
+            if coding is None:
+                return response
+            compressed = compress(response.content, coding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body differs per coding, so the ETag can only be weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = f'W/{etag}'
+        response.headers['Content-Encoding'] = coding
+        return response
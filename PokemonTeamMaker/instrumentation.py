@@ -0,0 +1,206 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+_profile = ContextVar('request_profile', default=None)
+
+# ``IN (%s, %s, ...)`` lists differ in length between otherwise identical queries.
+PLACEHOLDER_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+def sql_template(sql):
+    return PLACEHOLDER_LIST.sub('(%s, ...)', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.templates = Counter()
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.templates[sql_template(sql)] += 1
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render_time += time.perf_counter() - self.render_started
+            self.render_started = None
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+class RouteStats:
+    """Rolling per-route samples of the last ``INSTRUMENTATION_SAMPLE_SIZE`` requests, summarized on read."""
+
+    metrics = ('total', 'db', 'serializer', 'render', 'queries')
+    scale = np.array([1000.0, 1000.0, 1000.0, 1000.0, 1.0])
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.requests = Counter()
+        self.n_plus_one = {}
+
+    def record(self, route, profile, total):
+        sample = (total, profile.db_time, profile.serializer_time, profile.render_time, profile.queries)
+        threshold = settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+        repeated = {sql: count for sql, count in profile.templates.items() if count > threshold}
+        with self.lock:
+            if route not in self.samples:
+                self.samples[route] = deque(maxlen=settings.INSTRUMENTATION_SAMPLE_SIZE)
+            self.samples[route].append(sample)
+            self.requests[route] += 1
+            if repeated:
+                flagged = self.n_plus_one.setdefault(route, {})
+                for sql, count in repeated.items():
+                    flagged[sql] = max(flagged.get(sql, 0), count)
+        for sql, count in repeated.items():
+            logger.warning('Possible N+1 on %s: query ran %d times: %s', route, count, sql)
+
+    def snapshot(self):
+        with self.lock:
+            samples = {route: np.array(values) for route, values in self.samples.items()}
+            requests = dict(self.requests)
+            n_plus_one = {route: dict(flagged) for route, flagged in self.n_plus_one.items()}
+
+        routes = {}
+        for route, values in samples.items():
+            # Durations are reported in milliseconds, query counts as they are.
+            percentiles = np.percentile(values, [50, 95, 99], axis=0) * self.scale
+            routes[route] = {
+                'requests': requests[route],
+                'samples': len(values),
+                **{metric: dict(zip(('p50', 'p95', 'p99'), np.round(percentiles[:, idx], 3).tolist()))
+                   for idx, metric in enumerate(self.metrics)},
+                'n_plus_one': n_plus_one.get(route, {}),
+            }
+        return routes
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.requests.clear()
+            self.n_plus_one.clear()
+
+
+route_stats = RouteStats()
+
+
+class InstrumentationMiddleware:
+    """
+    Time SQL, serializers and rendering per request when ``INSTRUMENTATION`` is enabled.
+
+    The breakdown is returned in a ``Server-Timing`` header and aggregated per route in ``route_stats``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+
+        total = time.perf_counter() - profile.started
+        response['Server-Timing'] = profile.server_timing(total)
+        match = request.resolver_match
+        route = f'{request.method} /{match.route}' if match is not None else f'{request.method} <unresolved>'
+        route_stats.record(route, profile, total)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = _profile.get()
+        if profile is not None:
+            profile.start_render()
+            response.add_post_render_callback(profile.finish_render)
+        return response
+
+
+class ProfiledSerializerMixin:
+    def to_representation(self, instance):
+        profile = _profile.get()
+        if profile is None or profile.serializer_depth:
+            return super().to_representation(instance)
+
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile.serializer_depth -= 1
+
+
+_profiled_serializers = {}
+
+
+class InstrumentedViewMixin:
+    """Count the time spent in ``to_representation`` of the view's serializer towards the request profile."""
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if not settings.INSTRUMENTATION:
+            return serializer_class
+        profiled = _profiled_serializers.get(serializer_class)
+        if profiled is None:
+            profiled = type(serializer_class.__name__, (ProfiledSerializerMixin, serializer_class), {
+                '__module__': serializer_class.__module__,
+            })
+            _profiled_serializers[serializer_class] = profiled
+        return profiled
+
+
+class RequestStats(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        response = Response(route_stats.snapshot())
+        if 'download' in request.query_params:
+            response['Content-Disposition'] = 'attachment; filename="request-stats.json"'
+        return response
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
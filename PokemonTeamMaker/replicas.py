@@ -0,0 +1,119 @@
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica. Users, sessions, tokens, favorites and votes are read
+# right after being written by the same user, so they always come from the primary. Cache versions too:
+# replicas lag by different amounts, and reading them from a random one would flip the process-wide
+# snapshots back and forth between versions.
+REPLICATED_MODELS = {
+    'team_builder.type', 'team_builder.pokemon', 'team_builder.move',
+    'team_builder.team', 'team_builder.teampokemon', 'team_builder.builtinteam', 'team_builder.builtinteampokemon',
+    'team_builder.teampopularity', 'team_builder.teamranknode', 'comments.teamcomment', 'comments.pokemoncomment',
+}
+
+# Replica chosen for the current request, ``None`` outside requests or once the request is pinned to the primary.
+_replica = ContextVar('replica', default=None)
+_wrote = ContextVar('wrote', default=False)
+
+
+def replica_aliases():
+    return settings.REPLICA_ALIASES
+
+
+def is_replicated(model):
+    # Many-to-many through tables follow the model that declares the field.
+    model = model._meta.auto_created or model
+    return model._meta.label_lower in REPLICATED_MODELS
+
+
+class ReplicaRouter:
+    """
+    Send reads of ``REPLICATED_MODELS`` made by ``ReplicaPinningMiddleware`` requests to one replica.
+
+    Everything else goes to the primary: writes, reads of other models, reads inside a transaction on the
+    primary and every query of a request once it has written. A request sticks to one replica so that what
+    it reads is from a single snapshot.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or not is_replicated(model) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Reads after a write must see it.
+        if _replica.get() is not None:
+            _replica.set(None)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, schema included.
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Read everything from the primary inside the block, e.g. to build a cache for a version read there."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Let safe requests read from a random replica, unless the client wrote less than ``REPLICA_PIN_SECONDS`` ago.
+
+    Requests that write set a cookie pinning the client's next requests to the primary until replicas had
+    time to catch up, so users read their own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = replica_aliases()
+        pinned_until = request.COOKIES.get(settings.REPLICA_PIN_COOKIE, '')
+        pinned = pinned_until.isdigit() and int(pinned_until) > time.time()
+        if replicas and request.method in ('GET', 'HEAD', 'OPTIONS') and not pinned:
+            replica = random.choice(replicas)
+        else:
+            replica = None
+        replica_token, wrote_token = _replica.set(replica), _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _replica.reset(replica_token)
+            _wrote.reset(wrote_token)
+        if replicas and wrote:
+            until = int(time.time()) + settings.REPLICA_PIN_SECONDS
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, str(until), max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def copy_database(source, target):
+    """
+    Copy the SQLite database ``source`` over ``target`` with the online backup API.
+
+    Unlike copying the file, connections already open on ``target`` see the new content on their next query.
+    """
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,12 +28,17 @@ INSTALLED_APPS = [
     'team_builder',
     'users',
     'comments',
+    'benchmarks',
     
 ]
 
 MIDDLEWARE = [
+    'PokemonTeamMaker.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'PokemonTeamMaker.compression.CompressionMiddleware',
+    'PokemonTeamMaker.replicas.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'users.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -65,29 +70,125 @@ WSGI_APPLICATION = 'PokemonTeamMaker.wsgi.application'
 
 # Database
 
+# Seconds a connection is reused; reused connections are checked before each request. Persistent
+# connections are off by default (0 closes the connection after each request): under ASGI (the event
+# streams) every request runs in its own thread and they would pile up. Only raise it behind a WSGI server.
+CONN_MAX_AGE = config('CONN_MAX_AGE', default=0, cast=int)
+
+# Production SQLite profile, applied to every new connection: WAL lets readers run while a write is in
+# progress, and write transactions (PokemonTeamMaker.transactions.atomic_write) take the lock up front with
+# BEGIN IMMEDIATE while the others stay DEFERRED (see PokemonTeamMaker.sqlite_backend).
+# SQLITE_PROFILE=False falls back to the stock backend and pragmas.
+SQLITE_PROFILE = config('SQLITE_PROFILE', default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    # Durable across application crashes; only an OS crash or power loss can drop the last commits.
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    # Negative sizes are in KiB.
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-64 * 1024, cast=int),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'PokemonTeamMaker.sqlite_backend' if SQLITE_PROFILE else 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'test_db.sqlite3',
+        'OPTIONS': {'pragmas': SQLITE_PRAGMAS} if SQLITE_PROFILE else {},
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas of the primary, as replica_1, replica_2... Off by default, and to be left off on SQLite:
+# WAL already lets reads run during writes, and `manage.py benchmark_replicas` measures no read throughput
+# gain from SQLite copies, since reads in one process are bound by Python, not by the database. They are
+# meant for server databases with replicas on other hosts. Locally these are SQLite files refreshed with
+# `manage.py sync_replicas`. See PokemonTeamMaker.replicas for what is read from them.
+DATABASE_REPLICAS = config('DATABASE_REPLICAS', default='', cast=Csv())
+REPLICA_ALIASES = [f'replica_{number}' for number in range(1, len(DATABASE_REPLICAS) + 1)]
+for alias, name in zip(REPLICA_ALIASES, DATABASE_REPLICAS):
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['PokemonTeamMaker.replicas.ReplicaRouter']
+# Seconds a client that wrote reads from the primary only, so that it sees its writes despite replica lag.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'replica_pin'
+
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_NAME = 'sessionid'
-SESSION_SAVE_EVERY_REQUEST = True
+# Saving the session on every request turns every read into a write; SessionRefreshMiddleware
+# extends the expiry at most once per SESSION_REFRESH_INTERVAL seconds instead.
+SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', default=False, cast=bool)
+SESSION_REFRESH_INTERVAL = config('SESSION_REFRESH_INTERVAL', default=300, cast=int)
 
 # Password & User validation
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Render and parse API JSON with orjson (falls back to DRF's JSON renderer and parser when it isn't installed).
+FAST_JSON = config('FAST_JSON', default=True, cast=bool)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'PokemonTeamMaker.fastjson.FastJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'PokemonTeamMaker.fastjson.FastJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Smallest response body worth compressing, and the brotli quality used when the brotli package is installed.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+
+# Seconds an authenticated token and its user are cached in-process (0 disables the cache). Tokens revoked
+# and users deactivated by another process keep authenticating here for up to that long.
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60.0, cast=float)
+TOKEN_CACHE_SIZE = config('TOKEN_CACHE_SIZE', default=10000, cast=int)
+
+# Process-local snapshot of the Pokemon/Move/Type catalog used by the catalog read views.
+CATALOG_SNAPSHOT = config('CATALOG_SNAPSHOT', default=True, cast=bool)
+CATALOG_VERSION_CHECK_INTERVAL = config('CATALOG_VERSION_CHECK_INTERVAL', default=1.0, cast=float)
+# Seconds the autocomplete search may spend before it returns what it has found so far.
+SEARCH_LATENCY_BUDGET = config('SEARCH_LATENCY_BUDGET', default=0.05, cast=float)
+
+# Half-life of favorites, comments and votes in the team popularity leaderboard.
+POPULARITY_HALF_LIFE_DAYS = config('POPULARITY_HALF_LIFE_DAYS', default=7.0, cast=float)
+
+# Processes running the team battle simulations (0 runs them in the request thread) and the seconds a
+# comparison may take before it answers with the battles finished so far.
+BATTLE_WORKERS = config('BATTLE_WORKERS', default=2, cast=int)
+BATTLE_TIME_BUDGET = config('BATTLE_TIME_BUDGET', default=2.0, cast=float)
+BATTLE_MAX_BATTLES = config('BATTLE_MAX_BATTLES', default=20000, cast=int)
+
+# Live comment streams (served by the ASGI application): events kept per thread for Last-Event-ID replays,
+# events a slow client may fall behind before it is disconnected, threads tracked and seconds between keep-alives.
+COMMENT_STREAM_HISTORY = config('COMMENT_STREAM_HISTORY', default=200, cast=int)
+COMMENT_STREAM_QUEUE_SIZE = config('COMMENT_STREAM_QUEUE_SIZE', default=100, cast=int)
+COMMENT_STREAM_CHANNELS = config('COMMENT_STREAM_CHANNELS', default=10000, cast=int)
+COMMENT_STREAM_KEEPALIVE = config('COMMENT_STREAM_KEEPALIVE', default=15.0, cast=float)
+# Milliseconds browsers wait before reconnecting.
+COMMENT_STREAM_RETRY = config('COMMENT_STREAM_RETRY', default=3000, cast=int)
+
+# Per-request SQL/serializer/render timing with a Server-Timing header and per-route percentiles.
+INSTRUMENTATION = config('INSTRUMENTATION', default=False, cast=bool)
+INSTRUMENTATION_SAMPLE_SIZE = config('INSTRUMENTATION_SAMPLE_SIZE', default=1000, cast=int)
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = config('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', default=10, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -0,0 +1,37 @@
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that applies ``OPTIONS['pragmas']`` to every new connection and starts transactions with
+    ``BEGIN <OPTIONS['transaction_mode']>``, ``DEFERRED`` by default, or ``BEGIN IMMEDIATE`` for write transactions.
+
+    ``IMMEDIATE`` takes the write lock when an ``atomic`` block starts. With ``DEFERRED`` a transaction that
+    reads before it writes has to upgrade its lock, and SQLite fails that upgrade with "database is locked"
+    right away instead of waiting ``busy_timeout`` when another writer is active. Taking it for every
+    transaction would serialize read-only ones too, so only ``atomic_write()`` blocks ask for it by setting
+    ``write_transaction`` (see PokemonTeamMaker.transactions).
+    """
+    write_transaction = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED').upper()
+        if self.write_transaction:
+            mode = 'IMMEDIATE'
+        elif mode not in TRANSACTION_MODES:
+            mode = 'DEFERRED'
+        self.cursor().execute(f'BEGIN {mode}')
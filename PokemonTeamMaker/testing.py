@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase
+
+
+class FileDatabaseTestCase(TransactionTestCase):
+    """
+    ``TransactionTestCase`` run on a SQLite file in a temporary directory instead of the in-memory test database.
+
+    Tests using several connections at once need it: connections share an in-memory database with table
+    locks that fail right away instead of waiting ``busy_timeout``, and without WAL. The file is created
+    for the class and removed after it; the rest of the suite keeps the in-memory database, and other
+    backends their test database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.memory_connection = connections[DEFAULT_DB_ALIAS]
+        if cls.memory_connection.vendor != 'sqlite' or not cls.memory_connection.is_in_memory_db():
+            cls.memory_connection = None
+            return
+        # The settings dict is shared with the connections that threads open, so they use the file too.
+        settings_dict = cls.memory_connection.settings_dict
+        cls.memory_name = settings_dict['NAME']
+        cls.directory = tempfile.mkdtemp()
+        settings_dict['NAME'] = str(Path(cls.directory) / 'test.sqlite3')
+        # The in-memory connection is kept aside, not closed: closing it would drop the database.
+        connections[DEFAULT_DB_ALIAS] = cls.memory_connection.__class__(settings_dict, DEFAULT_DB_ALIAS)
+        ContentType.objects.clear_cache()
+        call_command('migrate', run_syncdb=True, interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.memory_connection is not None:
+            connections[DEFAULT_DB_ALIAS].close()
+            cls.memory_connection.settings_dict['NAME'] = cls.memory_name
+            connections[DEFAULT_DB_ALIAS] = cls.memory_connection
+            ContentType.objects.clear_cache()
+            shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
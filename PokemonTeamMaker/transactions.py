@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def atomic_write(using=None):
+    """
+    ``transaction.atomic()`` for a block that reads rows and then writes based on them.
+
+    On the tuned SQLite backend the outermost block starts with ``BEGIN IMMEDIATE``, taking the write lock
+    up front; read-only and plain ``atomic()`` blocks keep starting with ``BEGIN DEFERRED``. Nested in an
+    open transaction it is a plain ``atomic()``. Other backends ignore the flag.
+    """
+    connection = transaction.get_connection(using)
+    connection.write_transaction = True
+    try:
+        with transaction.atomic(using=using):
+            connection.write_transaction = False
+            yield
+    finally:
+        connection.write_transaction = False
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
+from .instrumentation import RequestStats
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('team-builder/', include('team_builder.urls')),
     path('comments/', include('comments.urls')),
+    path('request-stats/', RequestStats.as_view(), name='request-stats'),
 ]
@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .runner import measure_concurrency
+from .scenarios import SCENARIOS
+
+READ_SCENARIOS = ['team-comments', 'team-comments-top', 'pokemon-comments', 'team-details', 'team-full']
+WRITE_SCENARIOS = ['team-comment-create', 'vote-create', 'favorite-team', 'team-update']
+
+
+class ConcurrencyCommand(BaseCommand):
+    """
+    Run ``measure_concurrency()`` once per database configuration, each in its own process.
+
+    Subclasses set ``command_name`` to their own name and implement ``configurations()``, yielding a label and
+    the environment variables selecting the configuration; code around the ``yield`` prepares and cleans up the
+    database files.
+    """
+    command_name = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Concurrent reading clients.')
+        parser.add_argument('--writers', type=int, default=2, help='Concurrent writing clients.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds measured per configuration.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed used to pick rows for each request.')
+        parser.add_argument('--reads', nargs='*', default=READ_SCENARIOS, help='Read scenarios to cycle through.')
+        parser.add_argument('--writes', nargs='*', default=WRITE_SCENARIOS, help='Write scenarios to cycle through.')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout.')
+        # Runs one measurement in a process started with the environment of a configuration.
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    def configurations(self, options):
+        raise NotImplementedError
+
+    def scenarios(self, names, write):
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in names]
+        unknown = set(names) - {scenario.name for scenario in scenarios}
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}.')
+        if any(scenario.write != write for scenario in scenarios):
+            raise CommandError(f'Only {"write" if write else "read"} scenarios can be used here.')
+        return scenarios
+
+    def handle(self, *args, **options):
+        reads, writes = self.scenarios(options['reads'], False), self.scenarios(options['writes'], True)
+        if options['worker']:
+            self.stdout.write(json.dumps(measure_concurrency(
+                reads, writes, readers=options['readers'], writers=options['writers'],
+                duration=options['duration'], seed=options['seed'])))
+            return
+
+        keys = ('readers', 'writers', 'duration', 'seed', 'reads', 'writes')
+        report = {'meta': {key: options[key] for key in keys}, 'configurations': {}}
+        for label, env in self.configurations(options):
+            result = report['configurations'][label] = self.measure(env, options)
+            self.stderr.write(f'{label}: {result["reads"]["throughput_rps"]} reads/s, '
+                              f'{result["writes"]["throughput_rps"]} writes/s, locked {result["locked"]}')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+            self.stdout.write(self.style.SUCCESS(f'Wrote report to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def measure(self, env, options):
+        command = [sys.executable, '-m', 'django', self.command_name, '--worker',
+                   '--reads', *options['reads'], '--writes', *options['writes']]
+        for key in ('readers', 'writers', 'duration', 'seed'):
+            command += [f'--{key}', str(options[key])]
+        env = {**os.environ, **env,
+               'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'PokemonTeamMaker.settings')}
+        result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'Measurement failed:\n{result.stderr}')
+        return json.loads(result.stdout)
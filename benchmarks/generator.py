@@ -0,0 +1,190 @@
+import time
+import uuid
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from comments.models import TeamComment, PokemonComment, Vote
+from team_builder.analysis import TEAM_SIZE, MOVES_PER_POKEMON
+from team_builder.models import Type, Pokemon, Move, Team, TeamPokemon
+from team_builder.type_chart import TYPE_EFFECTIVENESS
+from team_builder.versioning import CATALOG, bump_version
+
+# Row counts at ``scale=1``.
+COUNTS = {
+    'users': 100_000,
+    'teams': 500_000,
+    'comments': 5_000_000,
+    'votes': 20_000_000,
+}
+DEX_POKEMON = 1000
+DEX_MOVES = 900
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+FULL_TEAM_RATIO = 0.85
+PRIVATE_TEAM_RATIO = 0.1
+POKEMON_COMMENT_RATIO = 0.2
+UPVOTE_RATIO = 0.7
+CATEGORIES = ('Physical', 'Special', 'Status')
+
+
+class Generator:
+    """
+    Fill the database with synthetic users, teams, slots, comments and votes using ``bulk_create``.
+
+    Rows are generated chunk by chunk from a seeded NumPy generator, each chunk in its own
+    transaction; comment vote counters are set from the generated votes so they stay consistent.
+    """
+
+    def __init__(self, scale=1.0, batch_size=5000, seed=0, moves_per_pokemon=MOVES_PER_POKEMON, stdout=None):
+        self.counts = {name: max(1, int(count * scale)) for name, count in COUNTS.items()}
+        self.batch_size = batch_size
+        self.moves_per_pokemon = moves_per_pokemon
+        self.rng = np.random.default_rng(seed)
+        self.tag = uuid.uuid4().hex[:8]
+        self.stdout = stdout
+        self.created = {}
+
+    def log(self, label, rows, started):
+        elapsed = time.perf_counter() - started
+        self.created[label] = self.created.get(label, 0) + rows
+        if self.stdout is not None:
+            self.stdout.write(f'{label}: {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)')
+
+    def chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def run(self):
+        self.seed_catalog()
+        self.seed_users()
+        self.seed_teams()
+        self.seed_comments()
+        return self.created
+
+    def seed_catalog(self):
+        started = time.perf_counter()
+        existing = set(Type.objects.values_list('name', flat=True))
+        Type.objects.bulk_create([Type(name=name.capitalize()) for name in TYPE_EFFECTIVENESS
+                                  if name.capitalize() not in existing])
+        type_ids = np.array(Type.objects.values_list('id', flat=True))
+
+        rng = self.rng
+        if not Pokemon.objects.exists():
+            primary = rng.choice(type_ids, DEX_POKEMON)
+            secondary = np.where(rng.random(DEX_POKEMON) < 0.5, rng.choice(type_ids, DEX_POKEMON), 0)
+            stats = rng.integers(20, 160, size=(DEX_POKEMON, 6))
+            Pokemon.objects.bulk_create([
+                Pokemon(name=f'Benchmon {idx}', primary_type_id=primary[idx],
+                        secondary_type_id=secondary[idx] if secondary[idx] != primary[idx] and secondary[idx] else None,
+                        hp=stats[idx, 0], attack=stats[idx, 1], defense=stats[idx, 2], sp_attack=stats[idx, 3],
+                        sp_defense=stats[idx, 4], speed=stats[idx, 5], is_legendary=idx % 50 == 0,
+                        is_mythical=idx % 97 == 0)
+                for idx in range(DEX_POKEMON)
+            ], batch_size=self.batch_size)
+        if not Move.objects.exists():
+            types = rng.choice(type_ids, DEX_MOVES)
+            Move.objects.bulk_create([
+                Move(name=f'Benchmove {idx}', type_id=types[idx], category=CATEGORIES[idx % 3],
+                     power=None if idx % 3 == 2 else int(rng.integers(40, 130)), accuracy=100, pp=15)
+                for idx in range(DEX_MOVES)
+            ], batch_size=self.batch_size)
+        # bulk_create does not send model signals, so bump the catalog version once here.
+        bump_version(CATALOG)
+
+        self.pokemon_ids = np.array(Pokemon.objects.values_list('id', flat=True))
+        self.move_ids = np.array(Move.objects.values_list('id', flat=True))
+        self.log('catalog', len(self.pokemon_ids) + len(self.move_ids), started)
+
+    def seed_users(self):
+        started = time.perf_counter()
+        password = make_password(BENCHMARK_PASSWORD)
+        user_model = get_user_model()
+        ids = []
+        for start, size in self.chunks(self.counts['users']):
+            users = [user_model(username=f'bench-{self.tag}-{idx}', email=f'bench-{self.tag}-{idx}@example.com',
+                                password=password) for idx in range(start, start + size)]
+            with transaction.atomic():
+                ids.extend(user.pk for user in user_model.objects.bulk_create(users))
+        self.user_ids = np.array(ids)
+        self.log('users', len(ids), started)
+
+    def seed_teams(self):
+        started = time.perf_counter()
+        rng, slots_created, moves_created = self.rng, 0, 0
+        through = TeamPokemon.moves.through
+        ids = []
+        for start, size in self.chunks(self.counts['teams']):
+            owners = rng.choice(self.user_ids, size)
+            private = rng.random(size) < PRIVATE_TEAM_RATIO
+            sizes = np.where(rng.random(size) < FULL_TEAM_RATIO, TEAM_SIZE, rng.integers(1, TEAM_SIZE, size))
+            teams = [Team(name=f'Team {start + idx}', user_id=owners[idx], is_private=private[idx],
+                          is_complete=sizes[idx] == TEAM_SIZE) for idx in range(size)]
+            with transaction.atomic():
+                teams = Team.objects.bulk_create(teams)
+                members = rng.choice(self.pokemon_ids, (size, TEAM_SIZE))
+                slots = TeamPokemon.objects.bulk_create([
+                    TeamPokemon(team_id=team.pk, pokemon_id=members[idx, slot], slot=slot + 1)
+                    for idx, team in enumerate(teams) for slot in range(sizes[idx])
+                ])
+                # Consecutive offsets from a random start give each slot distinct moves.
+                offsets = rng.integers(0, len(self.move_ids), len(slots))
+                moves = [
+                    through(teampokemon_id=slot.pk,
+                            move_id=self.move_ids[(offsets[idx] + move) % len(self.move_ids)])
+                    for idx, slot in enumerate(slots) for move in range(self.moves_per_pokemon)
+                ]
+                through.objects.bulk_create(moves, batch_size=self.batch_size)
+            ids.extend(team.pk for team in teams)
+            slots_created += len(slots)
+            moves_created += len(moves)
+        self.team_ids = np.array(ids)
+        self.log('teams', len(ids), started)
+        self.created['team_pokemons'] = slots_created
+        self.created['team_pokemon_moves'] = moves_created
+
+    def seed_comments(self):
+        started = time.perf_counter()
+        rng, votes_created = self.rng, 0
+        content_types = {model: ContentType.objects.get_for_model(model) for model in (TeamComment, PokemonComment)}
+        votes_per_comment = self.counts['votes'] / self.counts['comments']
+        comments_created = 0
+        for start, size in self.chunks(self.counts['comments']):
+            vote_counts = np.minimum(rng.poisson(votes_per_comment, size), len(self.user_ids))
+            first_voter = rng.integers(0, len(self.user_ids), size)
+            upvotes = [rng.random(count) < UPVOTE_RATIO for count in vote_counts]
+            authors = rng.choice(self.user_ids, size)
+            on_pokemon = rng.random(size) < POKEMON_COMMENT_RATIO
+            teams, pokemons = rng.choice(self.team_ids, size), rng.choice(self.pokemon_ids, size)
+
+            comments = {TeamComment: [], PokemonComment: []}
+            for idx in range(size):
+                fields = {
+                    'content': f'Benchmark comment {start + idx}',
+                    'user_id': authors[idx],
+                    'upvote_count': int(upvotes[idx].sum()),
+                    'downvote_count': int(vote_counts[idx] - upvotes[idx].sum()),
+                }
+                if on_pokemon[idx]:
+                    comments[PokemonComment].append((idx, PokemonComment(pokemon_id=pokemons[idx], **fields)))
+                else:
+                    comments[TeamComment].append((idx, TeamComment(team_id=teams[idx], **fields)))
+
+            with transaction.atomic():
+                votes = []
+                for model, rows in comments.items():
+                    created = model.objects.bulk_create([comment for _, comment in rows])
+                    for (idx, _), comment in zip(rows, created):
+                        # Consecutive users from a random start never vote twice on one comment.
+                        voters = self.user_ids[(first_voter[idx] + np.arange(vote_counts[idx])) % len(self.user_ids)]
+                        votes.extend(Vote(user_id=voter, content_type=content_types[model], object_id=comment.pk,
+                                          is_upvote=is_upvote)
+                                     for voter, is_upvote in zip(voters.tolist(), upvotes[idx].tolist()))
+                Vote.objects.bulk_create(votes, batch_size=self.batch_size)
+            comments_created += size
+            votes_created += len(votes)
+        self.log('comments', comments_created, started)
+        self.created['votes'] = votes_created
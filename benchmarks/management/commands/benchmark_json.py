@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import measure_encoding
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_SCENARIOS = ['moves-list', 'pokemon-list', 'pokemon-list-sparse', 'team-details-expanded', 'teams-full',
+                     'teams-analysis', 'team-comments', 'pokemon-comments']
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON render and parse time of DRF and orjson, and response bytes per content coding.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Renders and parses timed per scenario.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed used to pick rows for each request.')
+        parser.add_argument('--only', nargs='*', default=DEFAULT_SCENARIOS, help='Read scenarios to measure.')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['only']]
+        unknown = set(options['only']) - {scenario.name for scenario in scenarios}
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}.')
+        if any(scenario.write for scenario in scenarios):
+            raise CommandError('Only read scenarios can be used here.')
+
+        report = measure_encoding(scenarios, iterations=options['iterations'], seed=options['seed'])
+        for name, entry in report['endpoints'].items():
+            if 'skipped' not in entry and 'orjson' in entry:
+                self.stderr.write(f'{name}: render {entry["drf"]["render_ms"]} -> {entry["orjson"]["render_ms"]} ms, '
+                                  f'{entry["bytes"]}')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+            self.stdout.write(self.style.SUCCESS(f'Wrote report to {options["output"]}'))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from benchmarks.concurrency import ConcurrencyCommand
+from PokemonTeamMaker.replicas import copy_database
+
+
+class Command(ConcurrencyCommand):
+    """
+    Readers and writers are threads of one process, so once Python itself saturates a core, adding replicas
+    can't raise read throughput: compare with one reader first. Replicas only pay off when readers wait on
+    the primary's lock, i.e. with several cores or processes and enough writes.
+    """
+    help = 'Measure concurrent read throughput with 0, 1, 2... SQLite read replicas while writes hit the primary.'
+    command_name = 'benchmark_replicas'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--replicas', type=int, nargs='*', default=[0, 1, 2], help='Replica counts to compare.')
+
+    def configurations(self, options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Replicas are simulated with copies of the SQLite database.')
+        source = Path(primary.settings_dict['NAME'])
+        for count in options['replicas']:
+            replicas = [source.with_name(f'{source.stem}-replica-{number}{source.suffix}')
+                        for number in range(1, count + 1)]
+            try:
+                for replica in replicas:
+                    copy_database(source, replica)
+                yield f'{count} replicas', {'DATABASE_REPLICAS': ','.join(map(str, replicas))}
+            finally:
+                for replica in replicas:
+                    replica.unlink(missing_ok=True)
@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import Runner, compare
+from benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API endpoint with the Django test client and report the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed used to pick rows for each request.')
+        parser.add_argument('--only', nargs='*', help='Run only these scenarios.')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout.')
+        parser.add_argument('--baseline', help='Earlier report to compare latencies and query counts against.')
+
+    def handle(self, *args, **options):
+        names = {scenario.name for scenario in SCENARIOS}
+        unknown = set(options['only'] or ()) - names
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}.')
+
+        report = Runner(SCENARIOS, iterations=options['iterations'], warmup=options['warmup'], seed=options['seed'],
+                        only=options['only']).run()
+        if options['baseline']:
+            path = Path(options['baseline'])
+            if not path.exists():
+                raise CommandError(f'File "{path}" does not exist.')
+            report['compared_to'] = {'file': str(path), 'ratios': compare(report, json.loads(path.read_text()))}
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+            self.stdout.write(self.style.SUCCESS(f'Wrote report for {len(report["endpoints"])} scenarios to '
+                                                 f'{options["output"]}'))
+        else:
+            self.stdout.write(output)
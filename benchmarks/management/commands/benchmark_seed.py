@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from benchmarks.generator import COUNTS, Generator
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, teams, comments and votes for benchmarking.'
+
+    def add_arguments(self, parser):
+        full = ', '.join(f'{count} {name}' for name, count in COUNTS.items())
+        parser.add_argument('--scale', type=float, default=0.01, help=f'Fraction of the full data set ({full}).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows generated per transaction.')
+        parser.add_argument('--moves-per-pokemon', type=int, default=4, help='Moves attached to every team slot.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = Generator(scale=options['scale'], batch_size=options['batch_size'], seed=options['seed'],
+                            moves_per_pokemon=options['moves_per_pokemon'], stdout=self.stdout).run()
+        # ``bulk_create`` skips the signals that keep the leaderboard up to date.
+        call_command('rebuild_popularity', stdout=self.stdout)
+        total = sum(created.values())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in created.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)'))
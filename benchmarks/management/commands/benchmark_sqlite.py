@@ -0,0 +1,24 @@
+import sqlite3
+
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from benchmarks.concurrency import ConcurrencyCommand
+
+
+class Command(ConcurrencyCommand):
+    help = 'Compare mixed read/write throughput and "database is locked" errors of the stock and tuned SQLite setup.'
+    command_name = 'benchmark_sqlite'
+
+    def configurations(self, options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('The default database is not an SQLite database.')
+        path = primary.settings_dict['NAME']
+        # The journal mode is stored in the file, so the stock run must switch it back from WAL first.
+        connections.close_all()
+        with sqlite3.connect(path) as conn:
+            conn.execute('PRAGMA journal_mode = DELETE')
+        conn.close()
+        yield 'stock', {'SQLITE_PROFILE': 'False'}
+        yield 'tuned', {'SQLITE_PROFILE': 'True'}
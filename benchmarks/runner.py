@@ -0,0 +1,330 @@
+import io
+import itertools
+import json
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils.http import urlencode
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from PokemonTeamMaker.compression import CODINGS, compress
+from PokemonTeamMaker.fastjson import FastJSONParser, FastJSONRenderer, orjson
+from .scenarios import Fixtures, SkipScenario
+
+BENCHMARKED_APPS = ('team_builder', 'comments', 'users')
+
+
+def url_names(patterns=None, included=False):
+    """Names of the URL patterns routed to the benchmarked apps."""
+    names = set()
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver):
+            urlconf = getattr(pattern.urlconf_name, '__name__', pattern.urlconf_name)
+            if included or isinstance(urlconf, str) and urlconf.split('.')[0] in BENCHMARKED_APPS:
+                names |= url_names(pattern.url_patterns, included=True)
+        elif included and isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def summarize(latencies, queries, writes, statuses):
+    latencies = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'iterations': len(latencies),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        # Sequential, single-client throughput: requests per second of time spent inside requests.
+        'throughput_rps': round(len(latencies) / max(latencies.sum() / 1000, 1e-9), 2),
+        'latency_ms': {
+            'mean': round(float(latencies.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(latencies.max()), 3),
+        },
+        'queries': {
+            'mean': round(float(np.mean(queries)), 2),
+            'max': int(np.max(queries)),
+            'writes': round(float(np.mean(writes)), 2),
+        },
+    }
+
+
+class Runner:
+    """
+    Drive every scenario through the Django test client and collect latency, throughput and query counts.
+
+    Query counts come from ``CaptureQueriesContext``; write scenarios run in a transaction that is
+    rolled back after each request, so repeated runs see the same data.
+    """
+
+    def __init__(self, scenarios, iterations=100, warmup=5, seed=0, only=None):
+        self.scenarios = [scenario for scenario in scenarios if not only or scenario.name in only]
+        self.iterations = iterations
+        self.warmup = warmup
+        self.seed = seed
+
+    def request(self, client, fixtures, scenario):
+        path = reverse(scenario.url_name, kwargs=scenario.kwargs(fixtures))
+        params = scenario.params(fixtures) if scenario.params else None
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        if scenario.data is None:
+            return lambda: getattr(client, scenario.method)(path)
+
+        data = scenario.data(fixtures)
+        if isinstance(data, str):
+            return lambda: getattr(client, scenario.method)(path, data, content_type='application/json')
+        return lambda: getattr(client, scenario.method)(path, data)
+
+    def run_scenario(self, fixtures, scenario):
+        client = Client(raise_request_exception=False)
+        if scenario.login:
+            client.force_login(fixtures.require(fixtures.user))
+        if scenario.token:
+            token, _ = Token.objects.get_or_create(user=fixtures.require(fixtures.user))
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+        latencies, queries, writes, statuses = [], [], [], Counter()
+        iterations = scenario.iterations or self.iterations
+        for iteration in range(self.warmup + iterations):
+            if scenario.fresh_login:
+                client.force_login(fixtures.user)
+            send = self.request(client, fixtures, scenario)
+            with transaction.atomic() if scenario.write else nullcontext():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = send()
+                    if response.streaming:
+                        # Streamed bodies are produced while being read, so reading them is part of the latency.
+                        b''.join(response.streaming_content)
+                    latency = time.perf_counter() - started
+                if scenario.write:
+                    transaction.set_rollback(True)
+            if iteration < self.warmup:
+                continue
+            latencies.append(latency)
+            queries.append(len(captured))
+            writes.append(sum(query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS) for query in captured))
+            statuses[response.status_code] += 1
+        return summarize(latencies, queries, writes, statuses)
+
+    def run(self):
+        fixtures = Fixtures(seed=self.seed)
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for scenario in self.scenarios:
+                entry = {'url_name': scenario.url_name, 'method': scenario.method.upper()}
+                try:
+                    entry.update(self.run_scenario(fixtures, scenario))
+                except SkipScenario as error:
+                    entry['skipped'] = str(error)
+                results[scenario.name] = entry
+
+        covered = {scenario.url_name for scenario in self.scenarios}
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': self.iterations,
+                'warmup': self.warmup,
+                'seed': self.seed,
+            },
+            'endpoints': results,
+            'uncovered': sorted(url_names() - covered),
+        }
+
+
+def compare(report, baseline):
+    """Latency and query count ratios of ``report`` against ``baseline`` for endpoints present in both."""
+    ratios = {}
+    for name, entry in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or 'latency_ms' not in entry or 'latency_ms' not in previous:
+            continue
+        ratios[name] = {
+            **{key: round(entry['latency_ms'][key] / max(previous['latency_ms'][key], 1e-9), 3)
+               for key in ('p50', 'p95', 'p99')},
+            'queries': round(entry['queries']['mean'] / max(previous['queries']['mean'], 1e-9), 3),
+        }
+    return ratios
+
+
+def is_locked(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def measure_concurrency(read_scenarios, write_scenarios, readers=8, writers=1, duration=5.0, seed=0):
+    """
+    Throughput of ``readers`` and ``writers`` threads cycling through their scenarios at the same time.
+
+    Unlike ``Runner``, requests run concurrently, so this shows how requests queue behind writes on the same
+    database. Writes are rolled back like in ``Runner``. Requests that failed because the database was
+    locked are counted in ``locked``.
+    """
+    fixtures = Fixtures(seed=seed)
+    runner = Runner([])
+    stop = threading.Event()
+    jobs = [('reads', read_scenarios, offset) for offset in range(readers)]
+    if write_scenarios:
+        jobs += [('writes', write_scenarios, offset) for offset in range(writers)]
+    barrier = threading.Barrier(len(jobs) + 1, timeout=60)
+    results = {'reads': ([], Counter()), 'writes': ([], Counter())}
+    locked = Counter()
+    lock = threading.Lock()
+
+    def request_failed(sender, **kwargs):
+        if is_locked(sys.exc_info()[1]):
+            with lock:
+                locked['requests'] += 1
+
+    def clients(scenarios):
+        # Logged in up front: logging in writes the session, which would contend with the measured requests.
+        result = []
+        for scenario in scenarios:
+            client = Client(raise_request_exception=False)
+            if scenario.login:
+                client.force_login(fixtures.require(fixtures.user))
+            result.append(client)
+        return result
+
+    def worker(kind, scenarios, offset, clients):
+        latencies, statuses = [], Counter()
+        try:
+            barrier.wait()
+            for count in itertools.count(offset):
+                if stop.is_set():
+                    break
+                index = count % len(scenarios)
+                send = runner.request(clients[index], fixtures, scenarios[index])
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic() if scenarios[index].write else nullcontext():
+                        response = send()
+                        if scenarios[index].write:
+                            transaction.set_rollback(True)
+                except OperationalError as error:
+                    # BEGIN and ROLLBACK outside the view can fail too.
+                    if not is_locked(error):
+                        raise
+                    with lock:
+                        locked['transactions'] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+        finally:
+            connections.close_all()
+        with lock:
+            results[kind][0].extend(latencies)
+            results[kind][1].update(statuses)
+
+    threads = [threading.Thread(target=worker, args=(*job, clients(job[1]))) for job in jobs]
+    got_request_exception.connect(request_failed)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+    finally:
+        got_request_exception.disconnect(request_failed)
+
+    report = {}
+    for kind, (latencies, statuses) in results.items():
+        entry = {'iterations': 0, 'statuses': {}}
+        if latencies:
+            entry = summarize(latencies, [0], [0], statuses)
+            del entry['queries']
+        # Requests completed per second of wall-clock time by all threads together.
+        entry['throughput_rps'] = round(len(latencies) / duration, 2)
+        report[kind] = entry
+    report['locked'] = dict(locked)
+    return report
+
+
+def time_per_call(function, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = function()
+    return round((time.perf_counter() - started) / iterations * 1000, 3), result
+
+
+def measure_encoding(scenarios, iterations=50, seed=0):
+    """
+    Render and parse time of each scenario's payload with DRF's and the orjson JSON classes, and its size per coding.
+
+    Every scenario is requested once with the catalog snapshot disabled, so catalog lists are serialized by DRF;
+    the ``response.data`` it returned is then rendered and parsed ``iterations`` times outside of the request.
+    """
+    fixtures = Fixtures(seed=seed)
+    runner = Runner([])
+    codecs = {'drf': (JSONRenderer(), JSONParser())}
+    if orjson is not None:
+        codecs['orjson'] = (FastJSONRenderer(), FastJSONParser())
+    results = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], CATALOG_SNAPSHOT=False):
+        for scenario in scenarios:
+            entry = results[scenario.name] = {'url_name': scenario.url_name}
+            client = Client(raise_request_exception=False)
+            try:
+                if scenario.login:
+                    client.force_login(fixtures.require(fixtures.user))
+                if scenario.token:
+                    token, _ = Token.objects.get_or_create(user=fixtures.require(fixtures.user))
+                    client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+                response = runner.request(client, fixtures, scenario)()
+            except SkipScenario as error:
+                entry['skipped'] = str(error)
+                continue
+            if response.status_code != 200 or getattr(response, 'data', None) is None:
+                entry['skipped'] = f'No DRF payload to render (status {response.status_code}).'
+                continue
+
+            rendered = {}
+            for name, (renderer, parser) in codecs.items():
+                render_ms, content = time_per_call(lambda: renderer.render(response.data), iterations)
+                parse_ms, _ = time_per_call(lambda: parser.parse(io.BytesIO(content)), iterations)
+                entry[name] = {'render_ms': render_ms, 'parse_ms': parse_ms}
+                rendered[name] = content
+            # Both encodings must produce the same document.
+            entry['same_output'] = len({json.dumps(json.loads(content), sort_keys=True)
+                                        for content in rendered.values()}) == 1
+            content = rendered['drf']
+            entry['bytes'] = {'identity': len(content)}
+            for coding in CODINGS:
+                compress_ms, compressed = time_per_call(lambda: compress(content, coding), iterations)
+                entry['bytes'][coding] = len(compressed)
+                entry.setdefault('compress_ms', {})[coding] = compress_ms
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'orjson': orjson.__version__ if orjson is not None else None,
+            'codings': list(CODINGS),
+            'iterations': iterations,
+            'seed': seed,
+        },
+        'endpoints': results,
+    }
@@ -0,0 +1,198 @@
+import json
+
+import numpy as np
+from django.db.models import Count
+
+from comments.models import TeamComment, PokemonComment, Vote
+from team_builder.analysis import TEAM_SIZE
+from team_builder.models import Pokemon, Move, Team, TeamPokemon
+from team_builder.showdown import export_teams
+from .generator import BENCHMARK_PASSWORD
+
+
+class SkipScenario(Exception):
+    pass
+
+
+class Fixtures:
+    """
+    Ids sampled once from the database for scenarios to pick from, plus one owner with an incomplete team.
+
+    Writes act on the owner's objects and are rolled back by the runner, so the data set stays unchanged.
+    """
+
+    def __init__(self, seed=0, sample_size=1000):
+        self.rng = np.random.default_rng(seed)
+        self.pokemons = list(Pokemon.objects.order_by('?').values_list('id', 'name')[:sample_size])
+        self.move_ids = list(Move.objects.order_by('?').values_list('id', flat=True)[:sample_size])
+        self.team_ids = list(Team.objects.filter(is_private=False).order_by('?').values_list('id', flat=True)
+                             [:sample_size])
+        self.incomplete_team_ids = list(Team.objects.filter(is_private=False, is_complete=False).order_by('?')
+                                        .values_list('id', flat=True)[:sample_size])
+        self.team_pokemon_ids = list(TeamPokemon.objects.filter(team__is_private=False).order_by('?')
+                                     .values_list('id', flat=True)[:sample_size])
+        self.team_comment_ids = list(TeamComment.objects.order_by('?').values_list('id', flat=True)[:sample_size])
+        self.pokemon_comment_ids = list(PokemonComment.objects.order_by('?').values_list('id', flat=True)
+                                        [:sample_size])
+        self.commented_team_ids = list(TeamComment.objects.values_list('team_id', flat=True).distinct()[:sample_size])
+        self.commented_pokemon_ids = list(PokemonComment.objects.values_list('pokemon_id', flat=True).distinct()
+                                          [:sample_size])
+
+        team = Team.objects.filter(id__in=self.incomplete_team_ids).annotate(size=Count('pokemons')) \
+            .filter(size__lt=TEAM_SIZE).select_related('user').first()
+        self.own_team = team
+        self.user = team.user if team is not None else None
+        self.own_slots = list(TeamPokemon.objects.filter(team=team).values_list('id', 'slot')) if team else []
+        self.own_comment_id = TeamComment.objects.filter(user=self.user).values_list('id', flat=True).first()
+        self.showdown_text = ''.join(export_teams(Team.objects.filter(pk=team.pk), 1)) if team else None
+        self.voted_comment_id = Vote.objects.filter(user=self.user, content_type__model='teamcomment') \
+            .values_list('object_id', flat=True).first()
+
+    def pick(self, pool, size=None):
+        if not pool:
+            raise SkipScenario('No rows to pick from, seed the database first.')
+        if size is None:
+            return pool[self.rng.integers(len(pool))]
+        return [pool[idx] for idx in self.rng.choice(len(pool), min(size, len(pool)), replace=False)]
+
+    def require(self, value):
+        if value is None:
+            raise SkipScenario('The benchmark user has no matching row.')
+        return value
+
+    @property
+    def free_slot(self):
+        taken = {slot for _, slot in self.own_slots}
+        return next(slot for slot in range(1, TEAM_SIZE + 1) if slot not in taken)
+
+
+class Scenario:
+    """
+    One request pattern against a named URL.
+
+    ``kwargs``, ``params`` and ``data`` are callables taking ``Fixtures`` so every iteration can hit a
+    different row. ``write`` scenarios run inside a rolled back transaction. ``login`` authenticates
+    with a session cookie, ``token`` with an ``Authorization: Token`` header.
+    """
+
+    def __init__(self, name, url_name, method='get', kwargs=None, params=None, data=None, login=False, token=False,
+                 write=False, fresh_login=False, iterations=None):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.kwargs = kwargs or (lambda fixtures: {})
+        self.params = params
+        self.data = data
+        self.login = login or fresh_login
+        self.token = token
+        self.write = write
+        self.fresh_login = fresh_login
+        self.iterations = iterations
+
+
+def json_body(build):
+    return lambda fixtures: json.dumps(build(fixtures))
+
+
+SCENARIOS = [
+    # team_builder
+    Scenario('moves-list', 'moves-list'),
+    Scenario('moves-list-filtered', 'moves-list', params=lambda f: {'power__gte': 80, 'ordering': '-power'}),
+    Scenario('pokemon-list', 'pokemon-list'),
+    Scenario('pokemon-list-filtered', 'pokemon-list',
+             params=lambda f: {'hp__gt': 90, 'is_legendary': 'false', 'ordering': '-speed'}),
+    Scenario('pokemon-list-sparse', 'pokemon-list', params=lambda f: {'fields': 'id,name'}),
+    Scenario('pokemon-detail', 'pokemon-detail', kwargs=lambda f: {'pk': f.pick(f.pokemons)[0]}),
+    Scenario('pokemon-similar', 'pokemon-similar', kwargs=lambda f: {'pk': f.pick(f.pokemons)[0]}),
+    Scenario('pokemons-similar', 'pokemons-similar',
+             params=lambda f: {'ids': ','.join(str(pk) for pk, _ in f.pick(f.pokemons, 20))}),
+    Scenario('search', 'search', params=lambda f: {'q': f.pick(f.pokemons)[1][:4]}),
+    Scenario('team-list', 'team-create', login=True),
+    Scenario('team-list-token', 'team-create', token=True),
+    Scenario('team-full-session', 'team-full', kwargs=lambda f: {'pk': f.pick(f.team_ids)}, login=True),
+    Scenario('team-full-token', 'team-full', kwargs=lambda f: {'pk': f.pick(f.team_ids)}, token=True),
+    Scenario('team-create', 'team-create', method='post', data=lambda f: {'name': 'Benchmark team'}, login=True,
+             write=True),
+    Scenario('team-details', 'team-details', kwargs=lambda f: {'pk': f.pick(f.team_ids)}),
+    Scenario('team-details-expanded', 'team-details', kwargs=lambda f: {'pk': f.pick(f.team_ids)},
+             params=lambda f: {'expand': 'user,pokemons'}),
+    Scenario('team-update', 'team-details', method='patch', kwargs=lambda f: {'pk': f.require(f.own_team).id},
+             data=json_body(lambda f: {'name': 'Renamed'}), login=True, write=True),
+    Scenario('team-delete', 'team-details', method='delete', kwargs=lambda f: {'pk': f.require(f.own_team).id},
+             login=True, write=True),
+    Scenario('team-full', 'team-full', kwargs=lambda f: {'pk': f.pick(f.team_ids)}),
+    Scenario('teams-full', 'teams-full', params=lambda f: {'ids': ','.join(map(str, f.pick(f.team_ids, 20)))}),
+    Scenario('team-analysis', 'team-analysis', kwargs=lambda f: {'pk': f.pick(f.team_ids)}),
+    Scenario('teams-analysis', 'teams-analysis',
+             params=lambda f: {'ids': ','.join(map(str, f.pick(f.team_ids, 20)))}),
+    Scenario('teams-popular', 'teams-popular', params=lambda f: {'limit': 50}),
+    Scenario('team-rank', 'team-rank', kwargs=lambda f: {'pk': f.pick(f.commented_team_ids)}),
+    Scenario('favorite-team', 'favorite-team', method='post', kwargs=lambda f: {'pk': f.pick(f.team_ids)},
+             login=True, write=True),
+    Scenario('favorite-pokemon', 'favorite-pokemon', method='post', kwargs=lambda f: {'pk': f.pick(f.pokemons)[0]},
+             login=True, write=True),
+    Scenario('favorites', 'favorites', login=True),
+    Scenario('favorites-toggle', 'favorites', method='post',
+             data=json_body(lambda f: {'teams': f.pick(f.team_ids, 20),
+                                       'pokemons': [pk for pk, _ in f.pick(f.pokemons, 20)]}),
+             login=True, write=True),
+    Scenario('team-import', 'team-import', method='post',
+             data=json_body(lambda f: {'text': f.require(f.showdown_text)}), login=True, write=True),
+    Scenario('team-export', 'team-export', kwargs=lambda f: {'pk': f.pick(f.team_ids)}),
+    Scenario('teams-export-mine', 'teams-export', login=True),
+    Scenario('teams-export-public', 'teams-export', params=lambda f: {'scope': 'public'}, iterations=3),
+    Scenario('damage', 'damage', params=lambda f: {'attacker': f.pick(f.pokemons)[0], 'move': f.pick(f.move_ids),
+                                                   'defender': f.pick(f.pokemons)[0]}),
+    Scenario('team-matchup', 'team-matchup', kwargs=lambda f: dict(zip(('pk', 'opponent'), f.pick(f.team_ids, 2)))),
+    Scenario('matchup-live', 'matchup', method='post', data=json_body(lambda f: {
+        side: [{'pokemon': pokemon_id, 'moves': f.pick(f.move_ids, 4)} for pokemon_id, _ in f.pick(f.pokemons, 6)]
+        for side in ('team', 'opponent')})),
+    Scenario('team-battle', 'team-battle', kwargs=lambda f: dict(zip(('pk', 'opponent'), f.pick(f.team_ids, 2))),
+             params=lambda f: {'battles': 1000, 'seed': 1}, iterations=5),
+    Scenario('team-recommendations', 'team-recommendations', kwargs=lambda f: {'pk': f.pick(f.incomplete_team_ids)}),
+    Scenario('teampokemon-list', 'teampokemon-list-create', kwargs=lambda f: {'team_id': f.pick(f.team_ids)}),
+    Scenario('teampokemon-create', 'teampokemon-list-create', method='post',
+             kwargs=lambda f: {'team_id': f.require(f.own_team).id},
+             data=lambda f: {'pokemon': f.pick(f.pokemons)[0], 'slot': f.free_slot}, login=True, write=True),
+    Scenario('team-slots', 'team-slots', method='put', kwargs=lambda f: {'team_id': f.require(f.own_team).id},
+             data=json_body(lambda f: {'slots': [{'slot': slot, 'pokemon': f.pick(f.pokemons)[0],
+                                                  'moves': f.pick(f.move_ids, 4)}
+                                                 for slot in range(1, TEAM_SIZE + 1)]}),
+             login=True, write=True),
+    Scenario('teampokemon-details', 'team-pokemon-detail', kwargs=lambda f: {'pk': f.pick(f.team_pokemon_ids)}),
+    Scenario('teampokemon-update', 'team-pokemon-detail', method='patch',
+             kwargs=lambda f: {'pk': f.pick(f.own_slots)[0]},
+             data=json_body(lambda f: {'moves': f.pick(f.move_ids, 4)}), login=True, write=True),
+    Scenario('teampokemon-delete', 'team-pokemon-detail', method='delete',
+             kwargs=lambda f: {'pk': f.pick(f.own_slots)[0]}, login=True, write=True),
+
+    # comments
+    Scenario('team-comments', 'team_comment_list_create', kwargs=lambda f: {'pk': f.pick(f.commented_team_ids)}),
+    Scenario('team-comments-top', 'team_comment_list_create', kwargs=lambda f: {'pk': f.pick(f.commented_team_ids)},
+             params=lambda f: {'ordering': 'upvotes', 'pagination': 'cursor'}),
+    Scenario('team-comment-create', 'team_comment_list_create', method='post',
+             kwargs=lambda f: {'pk': f.pick(f.team_ids)}, data=lambda f: {'content': 'Benchmark comment'},
+             login=True, write=True),
+    Scenario('team-comment-detail', 'team_comment_detail', kwargs=lambda f: {'pk': f.pick(f.team_comment_ids)}),
+    Scenario('team-comment-update', 'team_comment_detail', method='patch',
+             kwargs=lambda f: {'pk': f.require(f.own_comment_id)}, data=json_body(lambda f: {'content': 'Edited'}),
+             login=True, write=True),
+    Scenario('pokemon-comments', 'pokemon_comment_list_create',
+             kwargs=lambda f: {'pk': f.pick(f.commented_pokemon_ids)}),
+    Scenario('pokemon-comment-detail', 'pokemon_comment_detail',
+             kwargs=lambda f: {'pk': f.pick(f.pokemon_comment_ids)}),
+    Scenario('vote-create', 'create_vote', method='post',
+             kwargs=lambda f: {'comment_type': 'team', 'pk': f.pick(f.team_comment_ids), 'vote_type': 'upvote'},
+             login=True, write=True),
+    Scenario('vote-delete', 'delete_vote', method='delete',
+             kwargs=lambda f: {'comment_type': 'team', 'pk': f.require(f.voted_comment_id)}, login=True, write=True),
+
+    # users
+    Scenario('login', 'login', method='post',
+             data=lambda f: {'username': f.require(f.user).username, 'password': BENCHMARK_PASSWORD}, write=True,
+             iterations=10),
+    Scenario('logout', 'logout', method='post', fresh_login=True, write=True),
+    Scenario('signup', 'signup', method='post',
+             data=lambda f: {'username': 'bench-signup', 'password': BENCHMARK_PASSWORD,
+                             'email': 'bench-signup@example.com'}, write=True, iterations=10),
+]
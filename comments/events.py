@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+COMMENT = 'comment'
+VOTES = 'votes'
+# Sent instead of a replay when the events after ``Last-Event-ID`` are gone: the client must reload the thread.
+RESET = 'reset'
+
+
+class Event:
+    def __init__(self, event_id, kind, data):
+        self.id = event_id
+        self.kind = kind
+        self.data = data
+
+    def encode(self):
+        data = json.dumps(self.data, cls=DjangoJSONEncoder)
+        return f'id: {self.id}\nevent: {self.kind}\ndata: {data}\n\n'.encode()
+
+
+class Subscription:
+    """Bounded queue of one stream; a subscriber that falls ``COMMENT_STREAM_QUEUE_SIZE`` events behind is dropped."""
+
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.COMMENT_STREAM_QUEUE_SIZE)
+        self.lagged = False
+
+    def push(self, event):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client resumes from its last event on reconnect, from the history while it still has it.
+            self.lagged = True
+
+
+class Channel:
+    def __init__(self, floor):
+        # Events of the channel after ``floor`` are all in ``history``.
+        self.floor = floor
+        self.history = deque(maxlen=settings.COMMENT_STREAM_HISTORY)
+        self.subscriptions = set()
+
+    def append(self, event_id, event):
+        if len(self.history) == self.history.maxlen:
+            self.floor = self.history[0][0]
+        self.history.append((event_id, event))
+
+
+class Broker:
+    """
+    In-process pub/sub of comment thread events, published from request threads and read by async streams.
+
+    Every channel keeps its last ``COMMENT_STREAM_HISTORY`` events to replay after ``Last-Event-ID``. Event ids
+    count up across channels and start with a token of this broker, so ids from another process or from before
+    a restart are recognized and answered with a ``reset`` instead of a wrong replay.
+    """
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex[:8]
+        self.last_id = 0
+        self.channels = OrderedDict()
+        self.lock = threading.Lock()
+
+    def channel(self, key):
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = self.channels[key] = Channel(self.last_id)
+            if len(self.channels) > settings.COMMENT_STREAM_CHANNELS:
+                idle = next((other for other, value in self.channels.items() if not value.subscriptions), None)
+                if idle is not None:
+                    del self.channels[idle]
+        self.channels.move_to_end(key)
+        return channel
+
+    def publish(self, key, kind, data):
+        with self.lock:
+            channel = self.channel(key)
+            self.last_id += 1
+            event = Event(f'{self.token}-{self.last_id}', kind, data)
+            channel.append(self.last_id, event)
+            by_loop = {}
+            for subscription in channel.subscriptions:
+                by_loop.setdefault(subscription.loop, []).append(subscription)
+        # One wake-up per event loop, however many streams it serves.
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, subscriptions, event)
+            except RuntimeError:
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+    def subscribe(self, key, last_event_id=None):
+        """
+        Register a stream on ``key`` from inside its event loop.
+
+        Returns the subscription and the events to send first: the ones after ``last_event_id`` or a single
+        ``reset`` event when they can't be replayed.
+        """
+        subscription = Subscription(key, asyncio.get_running_loop())
+        with self.lock:
+            channel = self.channel(key)
+            channel.subscriptions.add(subscription)
+            replay = [] if last_event_id is None else self.replay(channel, last_event_id)
+        return subscription, replay
+
+    def replay(self, channel, last_event_id):
+        token, _, number = last_event_id.partition('-')
+        if token == self.token and number.isdigit() and channel.floor <= int(number) <= self.last_id:
+            return [event for event_id, event in channel.history if event_id > int(number)]
+        return [Event(f'{self.token}-{self.last_id}', RESET, {})]
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            channel = self.channels.get(subscription.channel)
+            if channel is not None:
+                channel.subscriptions.discard(subscription)
+
+
+def deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.push(event)
+
+
+broker = Broker()
+
+
+def publish(key, kind, data):
+    broker.publish(key, kind, data)
+
+
+async def stream(key, last_event_id=None):
+    """Server-sent events of ``key``: the replay, then live events with a comment line as keep-alive."""
+    subscription, replay = broker.subscribe(key, last_event_id)
+    try:
+        yield f'retry: {settings.COMMENT_STREAM_RETRY}\n\n'.encode()
+        for event in replay:
+            yield event.encode()
+        while True:
+            if subscription.lagged and subscription.queue.empty():
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.COMMENT_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,26 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+
+from comments.models import TeamComment, PokemonComment, Vote
+
+
+def vote_count(content_type, is_upvote):
+    votes = Vote.objects.filter(content_type=content_type, object_id=OuterRef('pk'), is_upvote=is_upvote) \
+        .order_by().values('object_id').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized upvote/downvote counters of comments from the Vote table.'
+
+    def handle(self, *args, **options):
+        for model in (TeamComment, PokemonComment):
+            content_type = ContentType.objects.get_for_model(model)
+            with transaction.atomic():
+                updated = model.objects.update(upvote_count=vote_count(content_type, True),
+                                               downvote_count=vote_count(content_type, False))
+            self.stdout.write(f'{model.__name__}: recomputed counters of {updated} comments')
+        self.stdout.write(self.style.SUCCESS('Vote counters rebuilt.'))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='upvote',
+            name='pokemon_comment',
+        ),
+        migrations.RemoveField(
+            model_name='upvote',
+            name='team_comment',
+        ),
+        migrations.RemoveField(
+            model_name='upvote',
+            name='user',
+        ),
+        migrations.AlterField(
+            model_name='pokemoncomment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='teamcomment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='Vote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('is_upvote', models.BooleanField()),
+                ('content_type', models.ForeignKey(limit_choices_to={'model__in': ['teamcomment', 'pokemoncomment']}, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='Downvote',
+        ),
+        migrations.DeleteModel(
+            name='Upvote',
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def vote_count(apps, model, is_upvote):
+    content_type = apps.get_model('contenttypes', 'ContentType').objects.get_for_model(model)
+    votes = apps.get_model('comments', 'Vote').objects \
+        .filter(content_type=content_type, object_id=OuterRef('pk'), is_upvote=is_upvote) \
+        .order_by().values('object_id').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
+
+
+def count_votes(apps, schema_editor):
+    for name in ('TeamComment', 'PokemonComment'):
+        model = apps.get_model('comments', name)
+        model.objects.update(upvote_count=vote_count(apps, model, True),
+                             downvote_count=vote_count(apps, model, False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_vote'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('team_builder', '0006_remove_pokemoncomment_pokemon_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokemoncomment',
+            name='downvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pokemoncomment',
+            name='upvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamcomment',
+            name='downvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamcomment',
+            name='upvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='pokemoncomment',
+            index=models.Index(fields=['pokemon', '-upvote_count', '-id'], name='pokemoncomment_upvotes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemoncomment',
+            index=models.Index(fields=['pokemon', '-downvote_count', '-id'], name='pokemoncomment_downvotes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teamcomment',
+            index=models.Index(fields=['team', '-upvote_count', '-id'], name='teamcomment_upvotes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teamcomment',
+            index=models.Index(fields=['team', '-downvote_count', '-id'], name='teamcomment_downvotes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['content_type', 'object_id', 'is_upvote'], name='vote_comment_idx'),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
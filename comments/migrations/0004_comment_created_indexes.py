@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_comment_vote_counters'),
+        ('team_builder', '0006_remove_pokemoncomment_pokemon_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pokemoncomment',
+            index=models.Index(fields=['pokemon', 'created_at', 'id'], name='pokemoncomment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teamcomment',
+            index=models.Index(fields=['team', 'created_at', 'id'], name='teamcomment_created_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def vote_count(apps, model, is_upvote):
+    content_type = apps.get_model('contenttypes', 'ContentType').objects.get_for_model(model)
+    votes = apps.get_model('comments', 'Vote').objects \
+        .filter(content_type=content_type, object_id=OuterRef('pk'), is_upvote=is_upvote) \
+        .order_by().values('object_id').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep the latest vote of a user on a comment, then recount the comments that had several."""
+    Vote = apps.get_model('comments', 'Vote')
+    duplicates = Vote.objects.values('user', 'content_type', 'object_id').order_by() \
+        .annotate(latest=Max('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        Vote.objects.filter(user=duplicate['user'], content_type=duplicate['content_type'],
+                            object_id=duplicate['object_id']).exclude(id=duplicate['latest']).delete()
+    if duplicates:
+        for name in ('TeamComment', 'PokemonComment'):
+            model = apps.get_model('comments', name)
+            model.objects.update(upvote_count=vote_count(apps, model, True),
+                                 downvote_count=vote_count(apps, model, False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0004_comment_created_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='unique_vote'),
+        ),
+    ]
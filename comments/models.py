@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
 
 from team_builder.models import Team, Pokemon
 
@@ -11,6 +12,8 @@ class AbstractComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     votes = GenericRelation('Vote')
+    upvote_count = models.PositiveIntegerField(default=0)
+    downvote_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         abstract = True
@@ -19,6 +22,13 @@ class AbstractComment(models.Model):
 class TeamComment(AbstractComment):
     team = models.ForeignKey(Team, related_name='comments', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', 'created_at', 'id'], name='teamcomment_created_idx'),
+            models.Index(fields=['team', '-upvote_count', '-id'], name='teamcomment_upvotes_idx'),
+            models.Index(fields=['team', '-downvote_count', '-id'], name='teamcomment_downvotes_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.content}'
 
@@ -26,6 +36,13 @@ class TeamComment(AbstractComment):
 class PokemonComment(AbstractComment):
     pokemon = models.ForeignKey(Pokemon, related_name='comments', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pokemon', 'created_at', 'id'], name='pokemoncomment_created_idx'),
+            models.Index(fields=['pokemon', '-upvote_count', '-id'], name='pokemoncomment_upvotes_idx'),
+            models.Index(fields=['pokemon', '-downvote_count', '-id'], name='pokemoncomment_downvotes_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.content}'
 
@@ -36,3 +53,12 @@ class Vote(models.Model):
     object_id = models.PositiveIntegerField()
     comment = GenericForeignKey('content_type', 'object_id')
     is_upvote = models.BooleanField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'is_upvote'], name='vote_comment_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='unique_vote'),
+        ]
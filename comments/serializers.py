@@ -6,14 +6,14 @@ class TeamCommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TeamComment
         fields = '__all__'
-        read_only_fields = ['user', 'team']
+        read_only_fields = ['user', 'team', 'upvote_count', 'downvote_count']
 
 
 class PokemonCommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = PokemonComment
         fields = '__all__'
-        read_only_fields = ['user', 'pokemon']
+        read_only_fields = ['user', 'pokemon', 'upvote_count', 'downvote_count']
 
 
 class VoteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,29 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from team_builder.popularity import COMMENT, VOTE, record, retract
+from .models import TeamComment, Vote
+
+
+# Upvotes are recorded by the vote views next to the vote counters, so that deleting a vote stays a single
+# DELETE instead of going through the collector.
+@receiver(post_save, sender=TeamComment)
+def team_comment_added(sender, instance, created, **kwargs):
+    if created:
+        record(instance.team_id, COMMENT, instance.created_at)
+
+
+@receiver(pre_delete, sender=TeamComment)
+def team_comment_removing(sender, instance, **kwargs):
+    # The votes are deleted with the comment, before post_delete is sent.
+    upvotes = Vote.objects.filter(content_type=ContentType.objects.get_for_model(TeamComment),
+                                  object_id=instance.pk, is_upvote=True)
+    instance._upvoted_at = list(upvotes.values_list('created_at', flat=True))
+
+
+@receiver(post_delete, sender=TeamComment)
+def team_comment_removed(sender, instance, **kwargs):
+    retract(instance.team_id, COMMENT, instance.created_at)
+    for created_at in instance.__dict__.pop('_upvoted_at', ()):
+        retract(instance.team_id, VOTE, created_at)
@@ -1,3 +1,223 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from rest_framework.utils.urls import remove_query_param
+
+from PokemonTeamMaker.testing import FileDatabaseTestCase
+from team_builder.models import Type, Pokemon, Team
+from .models import TeamComment, PokemonComment, Vote
+from .views import CommentListCreate
+
+THREADS = 12
+
+
+def hammer(clients, request):
+    """Fire ``request(client)`` from one thread per client at the same moment and collect status codes."""
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def worker(client):
+        try:
+            barrier.wait()
+            statuses.append(request(client).status_code)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(statuses)
+
+
+class ConcurrentVoteTests(FileDatabaseTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire = Type.objects.create(name='Fire')
+        self.pokemon = Pokemon.objects.create(name='Charizard', primary_type=fire, hp=78, attack=84, defense=78,
+                                              sp_attack=109, sp_defense=85, speed=100)
+        team = Team.objects.create(name='Kanto', user=self.user)
+        self.comment = TeamComment.objects.create(content='Nice team!', user=self.user, team=team)
+
+    def logged_in_clients(self):
+        clients = []
+        for _ in range(THREADS):
+            client = Client(raise_request_exception=False)
+            client.force_login(self.user)
+            clients.append(client)
+        return clients
+
+    def test_same_user_voting_concurrently_counts_once(self):
+        statuses = hammer(self.logged_in_clients(),
+                          lambda client: client.post(f'/comments/comments/team/{self.comment.id}/upvote/'))
+
+        self.assertEqual(statuses, [201] + [400] * (THREADS - 1))
+        self.assertEqual(Vote.objects.count(), 1)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.upvote_count, 1)
+
+    def test_same_user_unvoting_concurrently_decrements_once(self):
+        self.client.force_login(self.user)
+        self.client.post(f'/comments/comments/team/{self.comment.id}/downvote/')
+
+        statuses = hammer(self.logged_in_clients(),
+                          lambda client: client.delete(f'/comments/comments/team/{self.comment.id}/unvote/'))
+
+        self.assertEqual(statuses.count(204), 1)
+        self.assertEqual(statuses.count(400), THREADS - 1)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.downvote_count, 0)
+
+
+class RebuildVoteCountsTests(TestCase):
+    def test_counters_are_recomputed_from_the_votes(self):
+        user_model = get_user_model()
+        users = [user_model.objects.create_user(username=f'trainer{number}', password='pikachu123',
+                                                email=f'trainer{number}@kanto.com') for number in range(3)]
+        fire = Type.objects.create(name='Fire')
+        pokemon = Pokemon.objects.create(name='Charizard', primary_type=fire, hp=78, attack=84, defense=78,
+                                         sp_attack=109, sp_defense=85, speed=100)
+        team = Team.objects.create(name='Kanto', user=users[0])
+        team_comment = TeamComment.objects.create(content='Nice team!', user=users[0], team=team)
+        pokemon_comment = PokemonComment.objects.create(content='Great Pokemon!', user=users[0], pokemon=pokemon)
+        unvoted = TeamComment.objects.create(content='First!', user=users[1], team=team)
+        for user, is_upvote in zip(users, (True, True, False)):
+            Vote.objects.create(user=user, comment=team_comment, is_upvote=is_upvote)
+        Vote.objects.create(user=users[1], comment=pokemon_comment, is_upvote=False)
+        TeamComment.objects.update(upvote_count=7, downvote_count=7)
+        PokemonComment.objects.update(upvote_count=7, downvote_count=7)
+
+        call_command('rebuild_vote_counts', stdout=StringIO())
+
+        for comment, counts in ((team_comment, (2, 1)), (pokemon_comment, (0, 1)), (unvoted, (0, 0))):
+            comment.refresh_from_db()
+            self.assertEqual((comment.upvote_count, comment.downvote_count), counts)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.team = Team.objects.create(name='Kanto', user=user)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for number in range(8):
+            comment = TeamComment.objects.create(content=f'Comment {number}', user=user, team=cls.team)
+            # Ties on every ordering, so pages must break them by id.
+            TeamComment.objects.filter(pk=comment.pk).update(
+                created_at=start + timedelta(hours=number // 2), upvote_count=number % 3, downvote_count=number % 2)
+
+    def url(self, **params):
+        query = '&'.join(f'{name}={value}' for name, value in params.items())
+        return f'{reverse("team_comment_list_create", args=[self.team.id])}?{query}'
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([comment['id'] for comment in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_pages_follow_each_ordering_forward_and_back(self):
+        for ordering, fields in CommentListCreate.orderings.items():
+            with self.subTest(ordering=ordering):
+                expected = list(TeamComment.objects.order_by(*fields).values_list('id', flat=True))
+                pages = self.walk(self.url(pagination='cursor', ordering=ordering, page_size=3), 'next')
+                self.assertEqual([len(page) for page in pages], [3, 3, 2])
+                self.assertEqual(sum(pages, []), expected)
+
+                last = self.client.get(self.url(pagination='cursor', ordering=ordering, page_size=3))
+                for _ in pages[1:]:
+                    last = self.client.get(last.data['next'])
+                self.assertEqual(self.walk(last.data['previous'], 'previous'), pages[-2::-1])
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('not-base64!', 'eyJwIjpbMV19', 'e30='):
+            self.assertEqual(self.client.get(self.url(cursor=cursor)).status_code, 404)
+
+    def test_previous_link_of_an_empty_page_stays_on_keyset_pagination(self):
+        first = self.client.get(self.url(pagination='cursor', page_size=4))
+        TeamComment.objects.filter(pk__in=[comment['id'] for comment in self.client.get(
+            first.data['next']).data['results']]).delete()
+
+        empty = self.client.get(remove_query_param(first.data['next'], 'pagination'))
+        self.assertEqual(empty.data['results'], [])
+        previous = self.client.get(empty.data['previous'])
+        self.assertNotIn('cursor=', empty.data['previous'])
+        self.assertEqual(previous.data['results'], first.data['results'])
+        self.assertIn('next', previous.data)
+        self.assertNotIn('count', previous.data)
+
+
+class CommentStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def comment(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('team_comment_list_create', args=[self.team.id]), {'content': content})
+
+    def upvote(self, pk):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/comments/comments/team/{pk}/upvote/')
+
+    async def open(self, **headers):
+        response = await self.async_client.get(reverse('team_comment_stream', args=[self.team.id]), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry: '))
+        return events
+
+    async def next_event(self, events):
+        fields = dict(line.split(': ', 1) for line in (await asyncio.wait_for(anext(events), 1)).decode().split('\n')
+                      if line)
+        return fields['id'], fields['event'], json.loads(fields['data'])
+
+    async def test_stream_pushes_comments_and_votes(self):
+        events = await self.open()
+        created = await sync_to_async(self.comment)('Nice team!')
+        self.assertEqual(created.status_code, 201)
+        _, kind, data = await self.next_event(events)
+        self.assertEqual((kind, data['id'], data['content']), ('comment', created.data['id'], 'Nice team!'))
+
+        await sync_to_async(self.upvote)(created.data['id'])
+        last_id, kind, data = await self.next_event(events)
+        self.assertEqual((kind, data), ('votes', {'id': created.data['id'], 'upvote_count': 1, 'downvote_count': 0}))
+        await events.aclose()
+
+    async def test_reconnect_resumes_after_last_event_id(self):
+        first = await sync_to_async(self.comment)('First')
+        events = await self.open()
+        await sync_to_async(self.upvote)(first.data['id'])
+        last_id, _, _ = await self.next_event(events)
+        await events.aclose()
+
+        second = await sync_to_async(self.comment)('Second')
+        events = await self.open(**{'Last-Event-ID': last_id})
+        _, kind, data = await self.next_event(events)
+        self.assertEqual((kind, data['id']), ('comment', second.data['id']))
+        await events.aclose()
+
+        events = await self.open(**{'Last-Event-ID': 'restarted-1'})
+        self.assertEqual((await self.next_event(events))[1], 'reset')
+        await events.aclose()
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get(reverse('team_comment_stream', args=[self.team.id]))
+        self.assertEqual(response.status_code, 501)
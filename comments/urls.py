@@ -1,12 +1,14 @@
 from django.urls import path
 from .views import TeamCommentListCreate, PokemonCommentListCreate, TeamCommentDetail, PokemonCommentDetail, CreateVote, \
-    DeleteVote
+    DeleteVote, TeamCommentStream, PokemonCommentStream
 
 urlpatterns = [
     path('team-comments/<int:pk>/', TeamCommentListCreate.as_view(), name='team_comment_list_create'),
+    path('team-comments/<int:pk>/stream/', TeamCommentStream.as_view(), name='team_comment_stream'),
     path('team-comment-details/<int:pk>/', TeamCommentDetail.as_view(), name='team_comment_detail'),
-    path('pokemon-comments/', PokemonCommentListCreate.as_view(), name='pokemon_comment_list_create'),
-    path('pokemon-comments/<int:pk>/', PokemonCommentDetail.as_view(), name='pokemon_comment_detail'),
+    path('pokemon-comments/<int:pk>/', PokemonCommentListCreate.as_view(), name='pokemon_comment_list_create'),
+    path('pokemon-comments/<int:pk>/stream/', PokemonCommentStream.as_view(), name='pokemon_comment_stream'),
+    path('pokemon-comment-details/<int:pk>/', PokemonCommentDetail.as_view(), name='pokemon_comment_detail'),
     path('comments/<str:comment_type>/<int:pk>/unvote/', DeleteVote.as_view(), name='delete_vote'),
     path('comments/<str:comment_type>/<int:pk>/<str:vote_type>/', CreateVote.as_view(), name='create_vote'),
 ]
@@ -1,13 +1,22 @@
 import django_filters
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Q, OuterRef, Subquery
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status, permissions
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from PokemonTeamMaker.instrumentation import InstrumentedViewMixin
+from team_builder.models import Team, Pokemon
+from team_builder.popularity import VOTE, record, retract
+from .events import COMMENT, VOTES, publish, stream
 from .models import TeamComment, PokemonComment, Vote
 from .serializers import TeamCommentSerializer, PokemonCommentSerializer, VoteSerializer
 from .filters import TeamCommentFilter, PokemonCommentFilter
+from .pagination import KeysetPagination
 from django.contrib.auth import get_user_model
 
 
@@ -25,37 +34,64 @@ class IsAuthenticatedToCreate(permissions.BasePermission):
         return True
 
 
+def thread_key(comment):
+    if isinstance(comment, TeamComment):
+        return 'team', comment.team_id
+    return 'pokemon', comment.pokemon_id
+
+
+def publish_votes(comment):
+    """Send the counters of ``comment`` as they are in the current transaction to its thread once committed."""
+    counts = type(comment).objects.values('id', 'upvote_count', 'downvote_count').get(pk=comment.pk)
+    transaction.on_commit(lambda: publish(thread_key(comment), VOTES, counts))
+
+
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
 
-class CommentListCreate(generics.ListCreateAPIView):
+class CommentListCreate(InstrumentedViewMixin, generics.ListCreateAPIView):
     serializer_class = None
     filter_backends = [DjangoFilterBackend]
     filterset_class = None
     pagination_class = CustomPagination
+    cursor_pagination_class = KeysetPagination
     permission_classes = [IsAuthenticatedToCreate]
+    parent_field = None
+    orderings = {
+        'upvotes': ('-upvote_count', '-id'),
+        'downvotes': ('-downvote_count', '-id'),
+        'date': ('created_at', 'id'),
+        '-date': ('-created_at', '-id'),
+    }
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params, pagination_class = self.request.query_params, self.cursor_pagination_class
+            if pagination_class.cursor_query_param in params or \
+                    params.get(pagination_class.pagination_query_param) == 'cursor':
+                self._paginator = pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_cursor_ordering(self):
+        return self.orderings.get(self.request.query_params.get('ordering'), self.orderings['-date'])
 
     def get_queryset(self):
-        team_id = self.kwargs['pk']
-        queryset = self.serializer_class.Meta.model.objects.filter(team_id=team_id)
-
-        order_by = self.request.query_params.get('ordering')
-
-        if order_by == 'upvotes':
-            queryset = queryset.annotate(upvotes_count=Count('votes', filter=Q(votes__is_upvote=True))).order_by(
-                '-upvotes_count')
-        elif order_by == 'downvotes':
-            queryset = queryset.annotate(downvotes_count=Count('votes', filter=Q(votes__is_upvote=False))).order_by(
-                '-downvotes_count')
-        elif order_by == 'date':
-            queryset = queryset.order_by('created_at')
-        else:
-            queryset = queryset.order_by('-created_at')
+        parent_id = self.kwargs['pk']
+        queryset = self.serializer_class.Meta.model.objects.filter(**{f'{self.parent_field}_id': parent_id})
+        return queryset.order_by(*self.get_cursor_ordering())
 
-        return queryset
+    def perform_create(self, serializer):
+        parent_model = self.serializer_class.Meta.model._meta.get_field(self.parent_field).related_model
+        parent = generics.get_object_or_404(parent_model, pk=self.kwargs['pk'])
+        comment = serializer.save(user=self.request.user, **{self.parent_field: parent})
+        data = serializer.data
+        transaction.on_commit(lambda: publish(thread_key(comment), COMMENT, data))
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -71,14 +107,51 @@ class CommentListCreate(generics.ListCreateAPIView):
 class TeamCommentListCreate(CommentListCreate):
     serializer_class = TeamCommentSerializer
     filterset_class = TeamCommentFilter
+    parent_field = 'team'
 
 
 class PokemonCommentListCreate(CommentListCreate):
     serializer_class = PokemonCommentSerializer
     filterset_class = PokemonCommentFilter
+    parent_field = 'pokemon'
+
+
+class CommentStream(View):
+    """
+    Server-sent events of a comment thread: ``comment`` for new comments and ``votes`` for counter changes.
+
+    Reconnecting clients get the events they missed after their ``Last-Event-ID``, or a ``reset`` event
+    when those are gone and the thread has to be reloaded from the list view.
+    """
+    parent_model = None
+    parent_field = None
 
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': 'Comment streams are only served by the ASGI application.'},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+        if not await self.parent_model.objects.filter(pk=pk).aexists():
+            raise Http404
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(stream((self.parent_field, pk), last_event_id),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keeps proxies such as nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+
+class TeamCommentStream(CommentStream):
+    parent_model = Team
+    parent_field = 'team'
+
+
+class PokemonCommentStream(CommentStream):
+    parent_model = Pokemon
+    parent_field = 'pokemon'
+
+
+class CommentDetail(InstrumentedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = None
     serializer_class = None
     permission_classes = [IsOwnerOrReadOnly]
@@ -134,13 +207,19 @@ class CreateVote(generics.CreateAPIView):
         comment = generics.get_object_or_404(comment_model, pk=comment_id)
         user = request.user
 
-        existing_vote = Vote.objects.filter(user=user, content_type_id=ContentType.objects.get_for_model(comment).id,
-                                            object_id=comment_id).first()
-        if existing_vote:
+        # Resolved before the transaction so that its first statement is the write.
+        content_type = ContentType.objects.get_for_model(comment)
+        try:
+            with transaction.atomic():
+                vote = Vote.objects.create(user=user, content_type=content_type, object_id=comment_id,
+                                           is_upvote=is_upvote)
+                counter = 'upvote_count' if is_upvote else 'downvote_count'
+                comment_model.objects.filter(pk=comment_id).update(**{counter: F(counter) + 1})
+                if is_upvote and comment_model is TeamComment:
+                    record(comment.team_id, VOTE, vote.created_at)
+                publish_votes(comment)
+        except IntegrityError:
             return Response({'detail': 'You have already voted for this comment.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        Vote.objects.create(user=user, content_type=ContentType.objects.get_for_model(comment), object_id=comment_id,
-                            is_upvote=is_upvote)
         return Response({'detail': 'Vote added successfully.'}, status=status.HTTP_201_CREATED)
 
 
@@ -166,5 +245,13 @@ class DeleteVote(generics.DestroyAPIView):
         if not existing_vote:
             return Response({'detail': 'You have not voted for this comment.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        existing_vote.delete()
+        with transaction.atomic():
+            deleted, _ = Vote.objects.filter(pk=existing_vote.pk).delete()
+            if not deleted:
+                return Response({'detail': 'You have not voted for this comment.'}, status=status.HTTP_400_BAD_REQUEST)
+            counter = 'upvote_count' if existing_vote.is_upvote else 'downvote_count'
+            comment_model.objects.filter(pk=comment_id, **{f'{counter}__gt': 0}).update(**{counter: F(counter) - 1})
+            if existing_vote.is_upvote and comment_model is TeamComment:
+                retract(comment.team_id, VOTE, existing_vote.created_at)
+            publish_votes(comment)
         return Response({'detail': 'Vote deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Pokemon, Move, Team, TeamPokemon, FavoriteTeam, FavoritePokemon, BuiltInTeamPokemon, BuiltInTeam, Type
+from .models import Pokemon, Move, Team, TeamPokemon, FavoriteTeam, FavoritePokemon, BuiltInTeamPokemon, BuiltInTeam, Type, CacheVersion, \
+    TeamPopularity
 
 admin.site.register(Pokemon)
 admin.site.register(Type)
@@ -10,3 +11,5 @@ admin.site.register(FavoritePokemon)
 admin.site.register(FavoriteTeam)
 admin.site.register(BuiltInTeamPokemon)
 admin.site.register(BuiltInTeam)
+admin.site.register(CacheVersion)
+admin.site.register(TeamPopularity)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from .models import TeamPokemon
+from .catalog import get_type_chart
+
+TEAM_SIZE = 6
+MOVES_PER_POKEMON = 4
+
+
+def load_team_arrays(team_ids, chart):
+    """
+    Pack the slots of ``team_ids`` into dense index arrays using two queries.
+
+    Returns ``(primary, secondary, move_types)`` shaped ``(t, 6)``, ``(t, 6)`` and ``(t, 6, 4)``;
+    empty slots and missing moves point at ``chart.NONE``.
+    """
+    row_of = {team_id: row for row, team_id in enumerate(team_ids)}
+    primary = np.full((len(team_ids), TEAM_SIZE), chart.NONE, dtype=np.int64)
+    secondary = np.full((len(team_ids), TEAM_SIZE), chart.NONE, dtype=np.int64)
+    move_types = np.full((len(team_ids), TEAM_SIZE, MOVES_PER_POKEMON), chart.NONE, dtype=np.int64)
+
+    slots = TeamPokemon.objects.filter(team_id__in=team_ids, slot__gte=1, slot__lte=TEAM_SIZE).values_list(
+        'id', 'team_id', 'slot', 'pokemon__primary_type_id', 'pokemon__secondary_type_id')
+    position = {}
+    for team_pokemon_id, team_id, slot, primary_type_id, secondary_type_id in slots:
+        row, col = row_of[team_id], slot - 1
+        position[team_pokemon_id] = (row, col)
+        primary[row, col] = chart.index.get(primary_type_id, chart.NONE)
+        secondary[row, col] = chart.index.get(secondary_type_id, chart.NONE)
+
+    if position:
+        moves = TeamPokemon.moves.through.objects.filter(
+            teampokemon_id__in=position.keys(), move__power__gt=0).values_list('teampokemon_id', 'move__type_id')
+        filled = {}
+        for team_pokemon_id, type_id in moves:
+            count = filled.get(team_pokemon_id, 0)
+            if count == MOVES_PER_POKEMON:
+                continue
+            row, col = position[team_pokemon_id]
+            move_types[row, col, count] = chart.index.get(type_id, chart.NONE)
+            filled[team_pokemon_id] = count + 1
+
+    return primary, secondary, move_types
+
+
+def analyze_arrays(chart, primary, secondary, move_types):
+    occupied = primary != chart.NONE
+
+    # (n_types, t, 6): damage multiplier each attacking type deals to each slot.
+    taken = chart.defensive_multipliers(primary, secondary)
+    weak = ((taken > 1.0) & occupied).sum(axis=2)
+    resist = ((taken < 1.0) & (taken > 0.0) & occupied).sum(axis=2)
+    immune = ((taken == 0.0) & occupied).sum(axis=2)
+
+    # (t, 6, 4, n_types) -> best multiplier any move on the team has against each single type.
+    dealt = chart.padded[move_types][..., :len(chart)]
+    coverage = dealt.reshape(dealt.shape[0], -1, len(chart)).max(axis=1, initial=0.0)
+
+    return {
+        'weak': weak.T,
+        'resist': resist.T,
+        'immune': immune.T,
+        'coverage': coverage,
+        'members': occupied.sum(axis=1),
+    }
+
+
+def analyze_teams(teams):
+    chart = get_type_chart()
+    team_ids = [team.id for team in teams]
+    arrays = analyze_arrays(chart, *load_team_arrays(team_ids, chart))
+
+    results = []
+    for row, team in enumerate(teams):
+        weak, resist, immune = arrays['weak'][row], arrays['resist'][row], arrays['immune'][row]
+        coverage = arrays['coverage'][row]
+        score = weak - resist - 2 * immune
+        results.append({
+            'team': team.id,
+            'name': team.name,
+            'members': int(arrays['members'][row]),
+            'defense': {
+                name: {
+                    'weak': int(weak[idx]),
+                    'resist': int(resist[idx]),
+                    'immune': int(immune[idx]),
+                    'score': int(score[idx]),
+                } for idx, name in enumerate(chart.names)
+            },
+            'offense': {name: float(coverage[idx]) for idx, name in enumerate(chart.names)},
+            'weaknesses': [name for idx, name in enumerate(chart.names) if score[idx] > 0],
+            'super_effective': [name for idx, name in enumerate(chart.names) if coverage[idx] > 1.0],
+            'uncovered': [name for idx, name in enumerate(chart.names) if coverage[idx] < 1.0],
+        })
+    return results
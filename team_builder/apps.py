@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TeambuilderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team_builder'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,113 @@
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+
+from .damage import get_damage_tables
+from .simulation import simulate
+
+CHUNK_SIZE = 250
+Z_95 = 1.959963984540054
+
+
+def build_setup(tables, team, opponent):
+    """Arrays ``simulate()`` needs for two ``DamageTables.members()`` layouts, side 0 being ``team``."""
+    sides = (team, opponent)
+    setup = {key: [] for key in ('damage', 'struggle', 'expected', 'accuracy', 'pp', 'speed', 'present')}
+    for side, (pokemons, moves) in enumerate(sides):
+        defenders, _ = sides[1 - side]
+        damage = tables.damage(pokemons[:, None, None], moves[:, :, None], defenders[None, None, :])
+        setup['damage'].append(damage)
+        setup['struggle'].append(tables.struggle(pokemons[:, None], defenders[None, :]))
+        setup['expected'].append(tables.summarize(damage, moves[:, :, None])['expected'])
+        setup['accuracy'].append(tables.accuracy[moves])
+        setup['pp'].append(tables.pp[moves])
+        setup['speed'].append(tables.speed[pokemons])
+        setup['present'].append(pokemons != tables.NO_POKEMON)
+    return {key: np.stack(values) for key, values in setup.items()}
+
+
+def wilson_interval(successes, trials):
+    """95% Wilson score interval of a proportion."""
+    if not trials:
+        return 0.0, 1.0
+    rate = successes / trials
+    denominator = 1 + Z_95 ** 2 / trials
+    centre = (rate + Z_95 ** 2 / (2 * trials)) / denominator
+    margin = Z_95 * math.sqrt(rate * (1 - rate) / trials + Z_95 ** 2 / (4 * trials ** 2)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool shared by all requests, started with ``spawn`` so workers don't inherit DB connections."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=settings.BATTLE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def run_battles(setup, battles, seed, budget):
+    """
+    Run ``battles`` in chunks of ``CHUNK_SIZE``, each seeded from ``seed``, for at most ``budget`` seconds.
+
+    Chunks run on the process pool, or inline when ``BATTLE_WORKERS`` is 0. Only the leading chunks that
+    finished in time are counted, so a result depends on the seed and the number of battles played and
+    not on how the chunks were scheduled. Returns ``(wins, losses, draws)``.
+    """
+    sizes = [min(CHUNK_SIZE, battles - start) for start in range(0, battles, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    deadline = time.monotonic() + budget
+    results = []
+
+    if not settings.BATTLE_WORKERS:
+        for size, chunk_seed in zip(sizes, seeds):
+            if results and time.monotonic() >= deadline:
+                break
+            results.append(simulate(setup, size, chunk_seed))
+    else:
+        pool = get_pool()
+        futures = [pool.submit(simulate, setup, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in futures:
+            if not future.done():
+                break
+            results.append(future.result())
+        for future in futures:
+            future.cancel()
+
+    return tuple(sum(values) for values in zip(*results)) if results else (0, 0, 0)
+
+
+def compare_teams(team, opponent, battles, seed):
+    """Win rate of ``team`` against ``opponent``, both ``[(pokemon_id, [move_ids])]`` layouts."""
+    tables = get_damage_tables()
+    setup = build_setup(tables, tables.members(team), tables.members(opponent))
+    started = time.perf_counter()
+    wins, losses, draws = run_battles(setup, battles, seed, settings.BATTLE_TIME_BUDGET)
+    played = wins + losses + draws
+    # A draw counts as half a win.
+    score = wins + draws / 2
+    low, high = wilson_interval(score, played)
+    return {
+        'requested': battles,
+        'battles': played,
+        'truncated': played < battles,
+        'seed': seed,
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'win_rate': score / played if played else None,
+        'confidence_interval': [low, high],
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,252 @@
+import threading
+import time
+from functools import cached_property
+
+import numpy as np
+from django import forms
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from PokemonTeamMaker.replicas import use_primary
+from .models import Type, Pokemon, Move
+from .serializers import FAVORITE_FIELDS, PokemonSerializer, MoveSerializer
+from .type_chart import TypeChart
+from .versioning import CATALOG, get_version
+
+json_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+STRING_LOOKUPS = {'exact', 'iexact', 'icontains'}
+NUMBER_LOOKUPS = {'exact', 'gt', 'gte', 'lt', 'lte'}
+
+
+def encode(value):
+    return json_encoder.encode(value).encode('utf-8')
+
+
+_filter_plans = {}
+
+
+def get_filter_plan(filterset_class):
+    """Filter names with their declared filter and form field; building a FilterSet form per request is slow."""
+    plan = _filter_plans.get(filterset_class)
+    if plan is None:
+        filterset = filterset_class(queryset=filterset_class._meta.model.objects.none())
+        plan = [(name, filterset.filters[name], form_field) for name, form_field in filterset.form.fields.items()]
+        _filter_plans[filterset_class] = plan
+    return plan
+
+
+def rank(values):
+    present = sorted({value for value in values if value is not None})
+    index = {value: position for position, value in enumerate(present)}
+    return np.array([index[value] if value is not None else -1 for value in values], dtype=np.int64)
+
+
+class CatalogTable:
+    """
+    Immutable, process-local copy of a catalog model.
+
+    Rows are kept as pre-serialized JSON fragments (one per serializer field) next to column arrays
+    used to evaluate the view's FilterSet lookups and ``ordering`` without touching the database.
+    ``overlay_fields`` change more often than the snapshot and are left out; views render them per request.
+    """
+
+    def __init__(self, model, serializer_class, instances, overlay_fields=()):
+        self.model = model
+        self.ids = np.array([instance.pk for instance in instances], dtype=np.int64)
+        self.position = {pk: idx for idx, pk in enumerate(self.ids.tolist())}
+
+        data = serializer_class(instances, many=True).data
+        self.field_names = [name for name in serializer_class().fields if name not in overlay_fields]
+        self.fragments = [tuple(encode(name) + b':' + encode(row[name]) for name in self.field_names)
+                          for row in data]
+        self.rows = [b'{' + b','.join(fragments) + b'}' for fragments in self.fragments]
+
+        self.strings = {}
+        self.numbers = {}
+        self.sort_keys = {}
+        for field in model._meta.fields:
+            if field.name in overlay_fields:
+                continue
+            values = [getattr(instance, field.attname) for instance in instances]
+            self.sort_keys[field.name] = rank(values)
+            if field.is_relation:
+                self.numbers[field.name] = self.number_column(values)
+                names = [getattr(getattr(instance, field.name), 'name', None) for instance in instances]
+                self.strings[f'{field.name}__name'] = names
+            elif field.get_internal_type() in ('CharField', 'TextField'):
+                self.strings[field.name] = values
+            else:
+                self.numbers[field.name] = self.number_column(values)
+        self.lowered = {path: [value.lower() if value is not None else None for value in values]
+                        for path, values in self.strings.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def number_column(values):
+        return np.array([float(value) if value is not None else np.nan for value in values], dtype=np.float64)
+
+    def match(self, path, lookup, value):
+        if path in self.strings and lookup in STRING_LOOKUPS:
+            if lookup == 'exact':
+                return np.fromiter((item == value for item in self.strings[path]), bool, len(self))
+            value = str(value).lower()
+            if lookup == 'iexact':
+                return np.fromiter((item == value for item in self.lowered[path]), bool, len(self))
+            return np.fromiter((item is not None and value in item for item in self.lowered[path]), bool, len(self))
+
+        if path in self.numbers and lookup in NUMBER_LOOKUPS:
+            column, value = self.numbers[path], float(value)
+            with np.errstate(invalid='ignore'):
+                if lookup == 'exact':
+                    return column == value
+                if lookup == 'gt':
+                    return column > value
+                if lookup == 'gte':
+                    return column >= value
+                if lookup == 'lt':
+                    return column < value
+                return column <= value
+        return None
+
+    def filter(self, filterset_class, params):
+        """
+        Validate ``params`` like ``filterset_class`` would and return the indices of matching rows.
+
+        Returns ``None`` when a lookup cannot be evaluated in memory.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        errors = {}
+        for name, declared, form_field in get_filter_plan(filterset_class):
+            raw = form_field.widget.value_from_datadict(params, {}, name)
+            try:
+                value = form_field.clean(raw)
+            except forms.ValidationError as error:
+                errors[name] = error.messages
+                continue
+            if value in (None, '') or errors:
+                continue
+            if declared.exclude or declared.method is not None:
+                return None
+            matched = self.match(declared.field_name, declared.lookup_expr, value)
+            if matched is None:
+                return None
+            mask &= matched
+
+        if errors:
+            raise ValidationError(errors)
+        return np.flatnonzero(mask)
+
+    def order(self, indices, ordering):
+        """Sort ``indices`` by ``ordering``; ``None`` when a term is not a snapshot column."""
+        if not ordering:
+            return indices
+        if any(term.lstrip('-') not in self.sort_keys for term in ordering):
+            return None
+        keys = [self.ids[indices]]
+        for term in reversed(ordering):
+            sort_key = self.sort_keys[term.lstrip('-')][indices]
+            keys.append(-sort_key if term.startswith('-') else sort_key)
+        return indices[np.lexsort(keys)]
+
+    def render(self, indices, overlay=None, fields=None):
+        """
+        JSON array of the rows at ``indices``; ``overlay(pk)`` returns extra JSON members for a row.
+
+        ``fields`` limits the rows to those serializer fields, in the order of ``field_names``.
+        """
+        if fields is not None:
+            positions = self.positions(fields)
+            ids = self.ids.tolist()
+            return b'[' + b','.join([self.render_subset(idx, ids[idx], positions, overlay) for idx in indices]) + b']'
+        rows = self.rows
+        if overlay is None:
+            return b'[' + b','.join([rows[idx] for idx in indices]) + b']'
+        ids = self.ids.tolist()
+        return b'[' + b','.join([rows[idx][:-1] + b',' + overlay(ids[idx]) + b'}' for idx in indices]) + b']'
+
+    def render_one(self, pk, overlay=None, fields=None):
+        idx = self.position.get(pk)
+        if idx is None:
+            return None
+        if fields is not None:
+            return self.render_subset(idx, pk, self.positions(fields), overlay)
+        return self.rows[idx] if overlay is None else self.rows[idx][:-1] + b',' + overlay(pk) + b'}'
+
+    def positions(self, fields):
+        fields = set(fields)
+        return [position for position, name in enumerate(self.field_names) if name in fields]
+
+    def render_subset(self, idx, pk, positions, overlay):
+        fragments = self.fragments[idx]
+        members = [fragments[position] for position in positions]
+        if overlay is not None:
+            members.append(overlay(pk))
+        return b'{' + b','.join(members) + b'}'
+
+
+class Catalog:
+    def __init__(self, version):
+        self.version = version
+        self.types = list(Type.objects.order_by('id'))
+        self.pokemons = CatalogTable(Pokemon, PokemonSerializer, list(
+            Pokemon.objects.select_related('primary_type', 'secondary_type').order_by('id')),
+            overlay_fields=FAVORITE_FIELDS)
+        self.moves = CatalogTable(Move, MoveSerializer, list(Move.objects.select_related('type').order_by('id')))
+
+        self._derived = {}
+
+    @cached_property
+    def type_chart(self):
+        return TypeChart(self.types)
+
+    def derive(self, key, build):
+        """Return ``build(self)`` memoized on this snapshot, so derived indexes are rebuilt with the catalog."""
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived.setdefault(key, build(self))
+        return value
+
+
+_catalog = None
+_checked_at = float('-inf')
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Return the current catalog snapshot, rebuilding it when the catalog version changed.
+
+    The version row is read at most once per ``CATALOG_VERSION_CHECK_INTERVAL`` seconds; local
+    changes call ``invalidate_catalog()`` so they are picked up on the next access.
+    """
+    global _catalog, _checked_at
+    catalog = _catalog
+    now = time.monotonic()
+    if catalog is not None and now - _checked_at < settings.CATALOG_VERSION_CHECK_INTERVAL:
+        return catalog
+
+    version = get_version(CATALOG)
+    if catalog is None or catalog.version != version:
+        with _lock:
+            if _catalog is None or _catalog.version != version:
+                # The version comes from the primary; a lagging replica could cache older rows under it.
+                with use_primary():
+                    _catalog = Catalog(version)
+            catalog = _catalog
+    _checked_at = now
+    return catalog
+
+
+def invalidate_catalog():
+    # Dropped rather than re-checked: a version number can repeat after its row was deleted (or rolled back).
+    global _catalog, _checked_at
+    _catalog = None
+    _checked_at = float('-inf')
+
+
+def get_type_chart():
+    return get_catalog().type_chart
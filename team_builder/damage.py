@@ -0,0 +1,193 @@
+import numpy as np
+
+from .analysis import TEAM_SIZE, MOVES_PER_POKEMON
+from .catalog import get_catalog
+from .models import TeamPokemon
+
+LEVEL = 50
+IV = 31
+STAB = 1.5
+STRUGGLE_POWER = 50
+DEFAULT_PP = 10
+# The 16 damage rolls, from 85% to 100%.
+ROLLS = np.arange(85, 101, dtype=np.float64) / 100
+
+
+def stat_at_level(base, hp=False):
+    """Stat of a level ``LEVEL`` Pokemon with perfect IVs, no EVs and a neutral nature."""
+    value = np.floor((2 * base + IV) * LEVEL / 100)
+    return value + LEVEL + 10 if hp else value + 5
+
+
+class DamageTables:
+    """
+    Stats of every Pokemon and power/category/accuracy/type of every move, indexed by catalog position.
+
+    Every array has one extra entry at the end standing for an empty slot: a Pokemon with no types and
+    1 in every stat, or a move without power.
+    """
+
+    def __init__(self, catalog):
+        chart = catalog.type_chart
+        self.chart = chart
+        pokemons, moves = catalog.pokemons, catalog.moves
+        self.pokemon_ids = pokemons.ids
+        self.move_ids = moves.ids
+        self.pokemon_position = pokemons.position
+        self.move_position = moves.position
+        self.NO_POKEMON, self.NO_MOVE = len(pokemons), len(moves)
+
+        def padded(values, fill):
+            return np.append(np.nan_to_num(values, nan=fill), fill)
+
+        def type_index(values):
+            return np.array([chart.index.get(int(value), chart.NONE) if not np.isnan(value) else chart.NONE
+                             for value in values] + [chart.NONE], dtype=np.int64)
+
+        self.hp = stat_at_level(padded(pokemons.numbers['hp'], 1.0), hp=True)
+        self.attack = stat_at_level(padded(pokemons.numbers['attack'], 1.0))
+        self.defense = stat_at_level(padded(pokemons.numbers['defense'], 1.0))
+        self.sp_attack = stat_at_level(padded(pokemons.numbers['sp_attack'], 1.0))
+        self.sp_defense = stat_at_level(padded(pokemons.numbers['sp_defense'], 1.0))
+        self.speed = stat_at_level(padded(pokemons.numbers['speed'], 1.0))
+        self.primary = type_index(pokemons.numbers['primary_type'])
+        self.secondary = type_index(pokemons.numbers['secondary_type'])
+
+        categories = [*moves.strings['category'], 'Status']
+        self.physical = np.array([category == 'Physical' for category in categories])
+        status = np.array([category == 'Status' for category in categories])
+        self.power = np.where(status, 0.0, padded(moves.numbers['power'], 0.0))
+        # Moves without accuracy never miss.
+        self.accuracy = padded(moves.numbers['accuracy'], 100.0) / 100
+        self.pp = np.append(np.nan_to_num(moves.numbers['pp'], nan=DEFAULT_PP), 0).astype(np.int64)
+        self.move_type = type_index(moves.numbers['type'])
+
+    def damage(self, attackers, moves, defenders):
+        """
+        Damage rolls in percent of the defender's HP, shape ``broadcast(attackers, moves, defenders) + (16,)``.
+
+        Arguments are arrays of catalog positions. Follows the main series formula with the physical/special
+        split, STAB and type effectiveness, rounding down after every factor like the games do.
+        """
+        physical = self.physical[moves]
+        attack = np.where(physical, self.attack[attackers], self.sp_attack[attackers])
+        defense = np.where(physical, self.defense[defenders], self.sp_defense[defenders])
+        move_type = self.move_type[moves]
+        stab = np.where((move_type == self.primary[attackers]) | (move_type == self.secondary[attackers]), STAB, 1.0)
+        chart = self.chart.padded
+        effectiveness = chart[move_type, self.primary[defenders]] * chart[move_type, self.secondary[defenders]]
+        return self.rolls(self.power[moves], attack, defense, stab, effectiveness, defenders)
+
+    def struggle(self, attackers, defenders):
+        """Damage rolls of Struggle, a typeless physical move used once no move has PP left."""
+        attack, defense = self.attack[attackers], self.defense[defenders]
+        return self.rolls(np.float64(STRUGGLE_POWER), attack, defense, 1.0, 1.0, defenders)
+
+    def rolls(self, power, attack, defense, stab, effectiveness, defenders):
+        base = np.floor(np.floor(np.floor(2 * LEVEL / 5 + 2) * power * attack / defense) / 50) + 2
+        rolls = np.floor(base[..., None] * ROLLS)
+        rolls = np.floor(rolls * np.asarray(stab)[..., None])
+        rolls = np.floor(rolls * np.asarray(effectiveness)[..., None])
+        rolls = np.where(np.asarray(power > 0)[..., None], rolls, 0.0)
+        return rolls * 100 / self.hp[defenders][..., None]
+
+    def summarize(self, rolls, moves):
+        """``min``/``max`` roll, ``expected`` damage (accuracy included) and ``ko`` chance of every roll set."""
+        accuracy = self.accuracy[moves]
+        return {
+            'min': rolls[..., 0],
+            'max': rolls[..., -1],
+            'expected': rolls.mean(axis=-1) * accuracy,
+            'ko': (rolls >= 100).mean(axis=-1) * accuracy,
+        }
+
+    def calculate(self, attacker, move, defender):
+        """Damage of a single attack, from catalog positions."""
+        rolls = self.damage(np.array(attacker), np.array(move), np.array(defender))
+        summary = self.summarize(rolls, np.array(move))
+        return {
+            'attacker': int(self.pokemon_ids[attacker]),
+            'move': int(self.move_ids[move]),
+            'defender': int(self.pokemon_ids[defender]),
+            'rolls': [round(roll, 1) for roll in rolls.tolist()],
+            'min': round(float(summary['min']), 1),
+            'max': round(float(summary['max']), 1),
+            'expected': round(float(summary['expected']), 1),
+            'ko_chance': round(float(summary['ko']), 3),
+        }
+
+    def members(self, slots):
+        """
+        Pack ``[(pokemon_id, [move_ids])]`` by slot into positions shaped ``(6,)`` and ``(6, 4)``.
+
+        Unknown ids and missing slots or moves point at the empty entries.
+        """
+        pokemons = np.full(TEAM_SIZE, self.NO_POKEMON, dtype=np.int64)
+        moves = np.full((TEAM_SIZE, MOVES_PER_POKEMON), self.NO_MOVE, dtype=np.int64)
+        for slot, (pokemon_id, move_ids) in enumerate(slots[:TEAM_SIZE]):
+            pokemons[slot] = self.pokemon_position.get(pokemon_id, self.NO_POKEMON)
+            for idx, move_id in enumerate(move_ids[:MOVES_PER_POKEMON]):
+                moves[slot, idx] = self.move_position.get(move_id, self.NO_MOVE)
+        return pokemons, moves
+
+    def matchup(self, attacking, defending):
+        """
+        Best move of every attacker against every defender, from one ``(6, 4, 6, 16)`` damage tensor.
+
+        ``attacking`` and ``defending`` are ``members()`` results. ``matrix[attacker][defender]`` is ``None``
+        where either slot is empty or the attacker has no move that damages the defender.
+        """
+        attackers, moves = attacking
+        defenders, _ = defending
+        rolls = self.damage(attackers[:, None, None], moves[:, :, None], defenders[None, None, :])
+        summary = self.summarize(rolls, moves[:, :, None])
+        best = summary['expected'].argmax(axis=1)
+
+        def pick(values):
+            return np.take_along_axis(values, best[:, None, :], axis=1)[:, 0, :]
+
+        expected, low, high, ko = (pick(summary[key]) for key in ('expected', 'min', 'max', 'ko'))
+        best_moves = np.take_along_axis(moves, best, axis=1)
+        matrix = []
+        for row in range(TEAM_SIZE):
+            cells = []
+            for col in range(TEAM_SIZE):
+                move = best_moves[row, col]
+                if attackers[row] == self.NO_POKEMON or defenders[col] == self.NO_POKEMON or high[row, col] <= 0:
+                    cells.append(None)
+                    continue
+                cells.append({
+                    'move': int(self.move_ids[move]),
+                    'min': round(float(low[row, col]), 1),
+                    'max': round(float(high[row, col]), 1),
+                    'expected': round(float(expected[row, col]), 1),
+                    'ko_chance': round(float(ko[row, col]), 3),
+                })
+            matrix.append(cells)
+        return {
+            'attackers': [self.pokemon_id(position) for position in attackers.tolist()],
+            'defenders': [self.pokemon_id(position) for position in defenders.tolist()],
+            'matrix': matrix,
+        }
+
+    def pokemon_id(self, position):
+        return int(self.pokemon_ids[position]) if position != self.NO_POKEMON else None
+
+
+def get_damage_tables():
+    return get_catalog().derive('damage', DamageTables)
+
+
+def load_slots(team_ids):
+    """``{team_id: [(pokemon_id, [move_ids])]}`` ordered by slot, read with two queries."""
+    slots = TeamPokemon.objects.filter(team_id__in=team_ids).order_by('team_id', 'slot') \
+        .values_list('id', 'team_id', 'pokemon_id')
+    members, moves = {}, {}
+    for team_pokemon_id, team_id, pokemon_id in slots:
+        move_ids = moves[team_pokemon_id] = []
+        members.setdefault(team_id, []).append((pokemon_id, move_ids))
+    if moves:
+        through = TeamPokemon.moves.through.objects.filter(teampokemon_id__in=moves.keys()).order_by('id')
+        for team_pokemon_id, move_id in through.values_list('teampokemon_id', 'move_id'):
+            moves[team_pokemon_id].append(move_id)
+    return {team_id: members.get(team_id, []) for team_id in team_ids}
@@ -0,0 +1,156 @@
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from PokemonTeamMaker.replicas import use_primary
+from PokemonTeamMaker.transactions import atomic_write
+from .models import Team, Pokemon, FavoriteTeam, FavoritePokemon
+from .popularity import FAVORITE, record_many, retract
+from .versioning import POKEMON_FAVORITES, get_version, bump_version
+
+
+class FavoriteKind:
+    def __init__(self, name, model, target_model, field):
+        self.name = name
+        self.model = model
+        self.target_model = target_model
+        self.field = field
+
+    def favorites(self, user, ids=None):
+        queryset = self.model.objects.filter(user=user)
+        return queryset if ids is None else queryset.filter(**{f'{self.field}_id__in': ids})
+
+    def new(self, user, target_id, created_at):
+        return self.model(user=user, created_at=created_at, **{f'{self.field}_id': target_id})
+
+
+TEAMS = FavoriteKind('teams', FavoriteTeam, Team, 'team')
+POKEMONS = FavoriteKind('pokemons', FavoritePokemon, Pokemon, 'pokemon')
+KINDS = {kind.target_model: kind for kind in (TEAMS, POKEMONS)}
+
+# Set while change_favorites() deletes favorites whose counters it adjusts itself.
+_changing = ContextVar('changing_favorites', default=False)
+
+
+def favorited_ids(user, model, ids=None):
+    """Ids among ``ids`` (all when ``None``) of ``model`` favorited by ``user``, with one query."""
+    if user is None or not user.is_authenticated or ids is not None and not ids:
+        return set()
+    kind = KINDS[model]
+    return set(kind.favorites(user, ids).values_list(f'{kind.field}_id', flat=True))
+
+
+def change_counts(kind, ids, delta):
+    counts = kind.target_model.objects.filter(pk__in=ids)
+    if delta < 0:
+        counts = counts.filter(favorite_count__gt=0)
+    changes = {'favorite_count': F('favorite_count') + delta}
+    if kind is TEAMS:
+        # The count is part of the team's payload, so its conditional GETs must not answer 304 anymore.
+        changes['revision'] = uuid.uuid4()
+    counts.update(**changes)
+
+
+def change_favorites(user, kind, ids, favorite=None, addable=None):
+    """
+    Add (``favorite=True``), remove (``False``) or toggle (``None``) the favorites of ``user`` for ``ids``.
+
+    Favorites and their counters are read and written with batched queries whatever the number of ids.
+    When ``addable`` is given, ids added must be in it. Returns ``{id: favorited}`` for the ids whose
+    state changed; raises ``IntegrityError`` when another request changed the same favorites concurrently.
+    """
+    field, now = kind.field, timezone.now()
+    with atomic_write():
+        existing = dict(kind.favorites(user, ids).values_list(f'{field}_id', 'created_at'))
+        removed = [pk for pk in ids if pk in existing and favorite is not True]
+        added = [pk for pk in ids if pk not in existing and favorite is not False]
+
+        if added and addable is not None:
+            missing = set(added) - set(addable.filter(pk__in=added).values_list('pk', flat=True))
+            if missing:
+                raise ValidationError({kind.name: [f'Invalid ids: {sorted(missing)}.']})
+
+        if removed:
+            token = _changing.set(True)
+            try:
+                deleted, _ = kind.favorites(user, removed).delete()
+            finally:
+                _changing.reset(token)
+            if deleted != len(removed):
+                raise IntegrityError('Favorites were removed by another request.')
+            change_counts(kind, removed, -1)
+        if added:
+            kind.model.objects.bulk_create([kind.new(user, pk, now) for pk in added])
+            change_counts(kind, added, 1)
+
+        if kind is TEAMS:
+            for pk in removed:
+                retract(pk, FAVORITE, existing[pk])
+            if added:
+                record_many(added, FAVORITE, now)
+        elif removed or added:
+            bump_version(POKEMON_FAVORITES)
+    if kind is POKEMONS and (removed or added):
+        invalidate_favorite_counts()
+    return {**{pk: False for pk in removed}, **{pk: True for pk in added}}
+
+
+def favorite_deleted(kind, favorite):
+    """Undo the counters of a favorite deleted outside ``change_favorites()``, e.g. in the admin or by a cascade."""
+    if _changing.get():
+        return
+    target_id = getattr(favorite, f'{kind.field}_id')
+    change_counts(kind, [target_id], -1)
+    if kind is TEAMS:
+        retract(target_id, FAVORITE, favorite.created_at)
+    else:
+        bump_version(POKEMON_FAVORITES)
+        transaction.on_commit(invalidate_favorite_counts)
+
+
+class FavoriteCounts:
+    """``favorite_count`` of every favorited Pokemon at one ``POKEMON_FAVORITES`` version, for the catalog snapshot."""
+
+    def __init__(self, version):
+        self.version = version
+        self.counts = dict(Pokemon.objects.filter(favorite_count__gt=0).values_list('id', 'favorite_count'))
+
+    def get(self, pk):
+        return self.counts.get(pk, 0)
+
+
+_counts = None
+_checked_at = float('-inf')
+_lock = threading.Lock()
+
+
+def get_favorite_counts():
+    """Like ``get_catalog()``: the version row is read at most once per ``CATALOG_VERSION_CHECK_INTERVAL``."""
+    global _counts, _checked_at
+    counts = _counts
+    now = time.monotonic()
+    if counts is not None and now - _checked_at < settings.CATALOG_VERSION_CHECK_INTERVAL:
+        return counts
+
+    version = get_version(POKEMON_FAVORITES)
+    if counts is None or counts.version != version:
+        with _lock:
+            if _counts is None or _counts.version != version:
+                with use_primary():
+                    _counts = FavoriteCounts(version)
+            counts = _counts
+    _checked_at = now
+    return counts
+
+
+def invalidate_favorite_counts():
+    global _counts, _checked_at
+    _counts = None
+    _checked_at = float('-inf')
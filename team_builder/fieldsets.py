@@ -0,0 +1,86 @@
+from rest_framework.exceptions import ValidationError
+
+FIELDS = 'fields'
+EXCLUDE = 'exclude'
+EXPAND = 'expand'
+
+
+class Expansion:
+    """A relation clients can embed with ``?expand=``, with what to load so that it costs no query per row."""
+
+    def __init__(self, serializer_class, many=False, select_related=(), prefetch_related=()):
+        self.serializer_class = serializer_class
+        self.many = many
+        self.select_related = list(select_related)
+        self.prefetch_related = list(prefetch_related)
+
+    def field(self):
+        return self.serializer_class(many=self.many, read_only=True)
+
+
+_columns = {}
+
+
+def get_columns(serializer_class):
+    """Field names of ``serializer_class`` mapped to the model field they read (``None`` if not a column)."""
+    columns = _columns.get(serializer_class)
+    if columns is None:
+        model_fields = {field.name for field in serializer_class.Meta.model._meta.concrete_fields}
+        columns = {name: field.source if field.source in model_fields else None
+                   for name, field in serializer_class().fields.items()}
+        _columns[serializer_class] = columns
+    return columns
+
+
+def split(params, name):
+    return [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+
+
+class Fieldset:
+    """
+    Fields of ``serializer_class`` asked for with ``?fields=``, ``?exclude=`` and ``?expand=``.
+
+    ``names`` is ``None`` when the default fields are wanted; expanded fields are always part of it.
+    """
+
+    def __init__(self, serializer_class, params):
+        self.serializer_class = serializer_class
+        self.columns = get_columns(serializer_class)
+        self.expandable = getattr(serializer_class, 'expandable_fields', {})
+        known = [*self.columns, *(name for name in self.expandable if name not in self.columns)]
+
+        fields, exclude, expand = split(params, FIELDS), split(params, EXCLUDE), split(params, EXPAND)
+        errors = {}
+        for param, names, allowed in ((FIELDS, fields, known), (EXCLUDE, exclude, known),
+                                      (EXPAND, expand, self.expandable)):
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                errors[param] = [f'Unknown fields: {", ".join(unknown)}.']
+        if errors:
+            raise ValidationError(errors)
+
+        self.expand = [name for name in self.expandable if name in expand]
+        self.names = None
+        if fields or exclude or any(name not in self.columns for name in self.expand):
+            wanted = set(fields or self.columns) | set(self.expand)
+            self.names = [name for name in known if name in wanted and name not in exclude]
+
+    @property
+    def is_default(self):
+        return self.names is None and not self.expand
+
+    def optimize(self, queryset):
+        """Select only the columns of the requested fields and join or prefetch the requested expansions."""
+        for name in self.expand:
+            expansion = self.expandable[name]
+            if expansion.select_related:
+                queryset = queryset.select_related(*expansion.select_related)
+            if expansion.prefetch_related:
+                queryset = queryset.prefetch_related(*expansion.prefetch_related)
+        if self.names is not None:
+            # Foreign keys followed by select_related() can't be deferred.
+            columns = {queryset.model._meta.pk.name, *(path.split('__')[0] for name in self.expand
+                                                        for path in self.expandable[name].select_related)}
+            columns.update(self.columns[name] for name in self.names if self.columns.get(name) is not None)
+            queryset = queryset.only(*columns)
+        return queryset
@@ -0,0 +1,182 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from PokemonTeamMaker.transactions import atomic_write
+from team_builder.models import Type, Pokemon, Move
+from team_builder.versioning import CATALOG, bump_version
+
+POKEMON_FIELDS = ['primary_type_id', 'secondary_type_id', 'hp', 'attack', 'defense', 'sp_attack', 'sp_defense',
+                  'speed', 'is_legendary', 'is_mythical']
+POKEMON_STATS = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
+MOVE_FIELDS = ['type_id', 'category', 'power', 'accuracy', 'pp']
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+
+def read_chunks(path, chunk_size):
+    path = Path(path)
+    if not path.exists():
+        raise CommandError(f'File "{path}" does not exist.')
+
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif suffix in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise CommandError('Reading Parquet files requires the "pyarrow" package.')
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas().astype(str).replace({'None': '', 'nan': '', '<NA>': ''})
+    else:
+        raise CommandError(f'Unsupported file type "{suffix}", expected .csv or .parquet.')
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else ''
+
+
+def to_int(value):
+    value = clean(value)
+    return int(float(value)) if value else None
+
+
+def to_bool(value):
+    return clean(value).lower() in TRUE_VALUES
+
+
+class Command(BaseCommand):
+    help = 'Bulk import types, Pokemon and moves from CSV or Parquet files, upserting rows by name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', help='File with a "name" column.')
+        parser.add_argument('--pokemon', help='File with name, primary_type, secondary_type, hp, attack, defense, '
+                                              'sp_attack, sp_defense, speed, is_legendary and is_mythical columns.')
+        parser.add_argument('--moves', help='File with name, type, category, power, accuracy and pp columns.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows read from the file at once.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk_create/bulk_update query.')
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('types', 'pokemon', 'moves')):
+            raise CommandError('Provide at least one of --types, --pokemon or --moves.')
+
+        self.chunk_size = options['chunk_size']
+        self.batch_size = options['batch_size']
+        self.type_ids = dict(Type.objects.values_list('name', 'id'))
+
+        started = time.perf_counter()
+        total = 0
+        try:
+            for label, path, importer in (('types', options['types'], self.import_types),
+                                          ('pokemon', options['pokemon'], self.import_pokemon),
+                                          ('moves', options['moves'], self.import_moves)):
+                if not path:
+                    continue
+                section_started = time.perf_counter()
+                # Names imported by earlier chunks: a repeated name overwrites its row but isn't counted again.
+                self.seen = set()
+                rows, skipped, created, updated = 0, 0, 0, 0
+                for chunk in read_chunks(path, self.chunk_size):
+                    with atomic_write():
+                        chunk_rows, chunk_created, chunk_updated = importer(chunk)
+                    rows += chunk_rows
+                    skipped += len(chunk) - chunk_rows
+                    created += chunk_created
+                    updated += chunk_updated
+                elapsed = time.perf_counter() - section_started
+                total += rows
+                self.stdout.write(f'{label}: {rows} rows, {created} created, {updated} updated, '
+                                  f'{rows - created - updated} unchanged, {skipped} skipped (blank or repeated name) '
+                                  f'in {elapsed:.2f}s ({(rows + skipped) / max(elapsed, 1e-9):.0f} rows/s)')
+        finally:
+            # bulk_create/bulk_update do not send model signals, so bump the catalog version once here, also when a
+            # later chunk fails after earlier ones were committed.
+            bump_version(CATALOG)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)'))
+
+    def create_types(self, names):
+        """Create the types of ``names`` that don't exist yet with one query, returning how many were new."""
+        new = [Type(name=name) for name in {clean(name) for name in names} - {''} if name not in self.type_ids]
+        for type_ in Type.objects.bulk_create(new, batch_size=self.batch_size):
+            self.type_ids[type_.name] = type_.id
+        return len(new)
+
+    def resolve_type(self, name):
+        return self.type_ids.get(clean(name))
+
+    def require_columns(self, chunk, columns):
+        missing = [column for column in columns if column not in chunk.columns]
+        if missing:
+            raise CommandError(f'Missing columns: {", ".join(missing)}.')
+
+    def count_new(self, names):
+        """Remember ``names`` as imported, returning how many weren't already by earlier chunks."""
+        new = set(names) - self.seen
+        self.seen.update(new)
+        return len(new)
+
+    def upsert(self, model, rows, fields):
+        current_rows = model.objects.filter(name__in=rows.keys()).values('id', 'name', *fields)
+        existing = {row.pop('name'): row for row in current_rows}
+        to_create, to_update, updated = [], [], 0
+        for name, values in rows.items():
+            current = existing.get(name)
+            if current is None:
+                to_create.append(model(name=name, **values))
+            elif any(current[field] != values[field] for field in fields):
+                to_update.append(model(id=current['id'], name=name, **values))
+                updated += name not in self.seen
+        model.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            model.objects.bulk_update(to_update, fields, batch_size=self.batch_size)
+        return self.count_new(rows), len(to_create), updated
+
+    def import_types(self, chunk):
+        self.require_columns(chunk, ['name'])
+        names = {clean(name) for name in chunk['name']} - {''}
+        # A type is only a name, so existing ones are never updated.
+        return self.count_new(names), self.create_types(names), 0
+
+    def import_pokemon(self, chunk):
+        self.require_columns(chunk, ['name', 'primary_type', *POKEMON_STATS])
+        self.create_types([*chunk['primary_type'], *chunk.get('secondary_type', [])])
+        rows = {}
+        for record in chunk.to_dict('records'):
+            name = clean(record['name'])
+            if not name:
+                continue
+            primary_type_id = self.resolve_type(record['primary_type'])
+            if primary_type_id is None:
+                raise CommandError(f'Pokemon "{name}" has no primary type.')
+            rows[name] = {
+                'primary_type_id': primary_type_id,
+                'secondary_type_id': self.resolve_type(record.get('secondary_type')),
+                **{stat: to_int(record[stat]) or 0 for stat in POKEMON_STATS},
+                'is_legendary': to_bool(record.get('is_legendary')),
+                'is_mythical': to_bool(record.get('is_mythical')),
+            }
+        return self.upsert(Pokemon, rows, POKEMON_FIELDS)
+
+    def import_moves(self, chunk):
+        self.require_columns(chunk, ['name', 'type', 'category'])
+        self.create_types(chunk['type'])
+        rows = {}
+        for record in chunk.to_dict('records'):
+            name = clean(record['name'])
+            if not name:
+                continue
+            type_id = self.resolve_type(record['type'])
+            if type_id is None:
+                raise CommandError(f'Move "{name}" has no type.')
+            rows[name] = {
+                'type_id': type_id,
+                'category': clean(record['category']),
+                'power': to_int(record.get('power')),
+                'accuracy': to_int(record.get('accuracy')),
+                'pp': to_int(record.get('pp')),
+            }
+        return self.upsert(Move, rows, MOVE_FIELDS)
@@ -0,0 +1,34 @@
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+
+from team_builder.favorites import TEAMS, POKEMONS, invalidate_favorite_counts
+from team_builder.versioning import POKEMON_FAVORITES, bump_version
+
+
+def favorite_count(kind):
+    favorites = kind.model.objects.filter(**{kind.field: OuterRef('pk')}).order_by().values(kind.field) \
+        .annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(favorites, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized favorite_count of teams and Pokemon from the favorite tables.'
+
+    def handle(self, *args, **options):
+        for kind in (TEAMS, POKEMONS):
+            with transaction.atomic():
+                stale = kind.target_model.objects.exclude(favorite_count=favorite_count(kind))
+                changes = {'favorite_count': favorite_count(kind)}
+                if kind is TEAMS:
+                    # The count is part of the team's payload; conditional GETs must not answer 304 anymore.
+                    changes['revision'] = uuid.uuid4()
+                updated = stale.update(**changes)
+                if kind is POKEMONS and updated:
+                    bump_version(POKEMON_FAVORITES)
+            self.stdout.write(f'{kind.target_model.__name__}: fixed the favorite count of {updated} rows')
+        invalidate_favorite_counts()
+        self.stdout.write(self.style.SUCCESS('Favorite counts rebuilt.'))
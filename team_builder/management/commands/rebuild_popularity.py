@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from PokemonTeamMaker.transactions import atomic_write
+from comments.models import TeamComment, Vote
+from team_builder.models import FavoriteTeam, Team, TeamPopularity, TeamRankNode
+from team_builder.popularity import EPOCH, FAVORITE, COMMENT, VOTE, WEIGHTS, aggregate_scores, decay_rate, \
+    rank_tree
+
+
+class Command(BaseCommand):
+    help = 'Recompute team popularity scores and their rank tree from favorites, team comments and upvotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched from the database at once.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create query.')
+
+    def events(self, kind, rows, chunk_size):
+        team_ids, values = [], []
+        for team_id, created_at in rows.iterator(chunk_size=chunk_size):
+            if team_id is not None:
+                team_ids.append(team_id)
+                values.append((created_at - EPOCH).total_seconds())
+        self.stdout.write(f'{kind}: {len(team_ids)} events')
+        return np.array(team_ids, dtype=np.int64), np.log(WEIGHTS[kind]) + decay_rate() * np.array(values)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunk_size = options['chunk_size']
+        upvotes = Vote.objects.filter(content_type=ContentType.objects.get_for_model(TeamComment), is_upvote=True) \
+            .annotate(team_id=Subquery(TeamComment.objects.filter(pk=OuterRef('object_id')).values('team_id'))) \
+            .values_list('team_id', 'created_at')
+        events = [
+            self.events(FAVORITE, FavoriteTeam.objects.values_list('team_id', 'created_at'), chunk_size),
+            self.events(COMMENT, TeamComment.objects.values_list('team_id', 'created_at'), chunk_size),
+            self.events(VOTE, upvotes, chunk_size),
+        ]
+        scores = aggregate_scores(np.concatenate([team_ids for team_ids, _ in events]),
+                                  np.concatenate([values for _, values in events]))
+
+        with atomic_write():
+            private = set(Team.objects.filter(is_private=True).values_list('id', flat=True))
+            TeamPopularity.objects.all().delete()
+            TeamPopularity.objects.bulk_create([TeamPopularity(team_id=team_id, score=score,
+                                                               is_private=team_id in private)
+                                                for team_id, score in scores.items()],
+                                               batch_size=options['batch_size'])
+            TeamRankNode.objects.all().delete()
+            TeamRankNode.objects.bulk_create(rank_tree([score for team_id, score in scores.items()
+                                                        if team_id not in private]),
+                                             batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt popularity of {len(scores)} teams in {elapsed:.2f}s'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite write-ahead log and refresh the query planner statistics with PRAGMA optimize.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to maintain.')
+        parser.add_argument('--checkpoint', choices=CHECKPOINT_MODES, default='TRUNCATE',
+                            help='wal_checkpoint mode; TRUNCATE also shrinks the WAL file back to zero bytes.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running every this many seconds instead of once.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'Database "{options["database"]}" is not an SQLite database.')
+
+        while True:
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode, = cursor.fetchone()
+                if journal_mode.lower() == 'wal':
+                    cursor.execute(f'PRAGMA wal_checkpoint({options["checkpoint"]})')
+                    busy, log_pages, checkpointed = cursor.fetchone()
+                    # busy means readers or a writer kept part of the log from being copied back.
+                    status = 'incomplete' if busy else 'complete'
+                    self.stdout.write(f'Checkpoint {status}: {checkpointed} of {log_pages} WAL pages copied')
+                else:
+                    self.stdout.write(f'Journal mode is {journal_mode}, no WAL to checkpoint')
+                cursor.execute('PRAGMA optimize')
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(f'Maintained "{options["database"]}" in {elapsed:.2f}s'))
+            if not options['interval']:
+                return
+            # Connections are per thread and persistent; don't hold this one between runs.
+            connection.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from PokemonTeamMaker.replicas import copy_database, replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to the DATABASE_REPLICAS files, to try replica reads locally.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every this many seconds instead of once.')
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError('No replica is configured, set DATABASE_REPLICAS.')
+        if any(connections[alias].vendor != 'sqlite' for alias in [DEFAULT_DB_ALIAS, *aliases]):
+            raise CommandError('Only SQLite databases can be copied; replicate other databases with their server.')
+
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        while True:
+            started = time.perf_counter()
+            for alias in aliases:
+                copy_database(source, connections[alias].settings_dict['NAME'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(f'Copied {source} to {len(aliases)} replicas in {elapsed:.2f}s'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -1,7 +1,18 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 
+class CacheVersion(models.Model):
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.key} (v{self.version})'
+
+
 class Type(models.Model):
     name = models.CharField(max_length=50)
 
@@ -22,6 +33,7 @@ class Pokemon(models.Model):
     speed = models.IntegerField()
     is_legendary = models.BooleanField(default=False)
     is_mythical = models.BooleanField(default=False)
+    favorite_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -44,10 +56,19 @@ class Team(models.Model):
     user = models.ForeignKey(get_user_model(), related_name='teams', on_delete=models.CASCADE)
     is_complete = models.BooleanField(default=False)
     is_private = models.BooleanField(default=False)
+    favorite_count = models.PositiveIntegerField(default=0)
+    revision = models.UUIDField(default=uuid.uuid4, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.revision = uuid.uuid4()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'revision' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'revision']
+        super().save(*args, **kwargs)
+
 
 class TeamPokemon(models.Model):
     team = models.ForeignKey(Team, related_name='pokemons', on_delete=models.CASCADE)
@@ -55,6 +76,11 @@ class TeamPokemon(models.Model):
     moves = models.ManyToManyField(Move, related_name='team_pokemons')
     slot = models.IntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team', 'slot'], name='unique_team_slot'),
+        ]
+
     def __str__(self):
         return f'{self.team.name} - {self.pokemon.name} (slot {self.slot})'
 
@@ -80,9 +106,55 @@ class BuiltInTeamPokemon(models.Model):
 class FavoriteTeam(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'team'], name='unique_favorite_team'),
+        ]
 
 
 class FavoritePokemon(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     pokemon = models.ForeignKey(Pokemon, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'pokemon'], name='unique_favorite_pokemon'),
+        ]
+
 
+class TeamPopularity(models.Model):
+    """
+    Time-decayed popularity of a team, stored as ``log(sum(weight * exp(rate * (t - epoch))))``.
+
+    Measuring every event against a fixed epoch keeps the order of teams identical to the order
+    of their decayed scores at any moment, so rows only change when an event is added or removed.
+    ``is_private`` is copied from the team so that ranks are counted on the index alone, without a join.
+    """
+    team = models.OneToOneField(Team, primary_key=True, related_name='popularity', on_delete=models.CASCADE)
+    is_private = models.BooleanField(default=False)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_private', '-score', 'team'], name='teampopularity_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.team_id} ({self.score:.3f})'
+
+
+class TeamRankNode(models.Model):
+    """
+    Node of a Fenwick tree counting the public ``TeamPopularity`` rows per score bucket.
+
+    Maintained next to the scores by team_builder.popularity, so that the rank of a team is the sum of at
+    most ``log2(RANK_BUCKETS)`` nodes plus the teams ahead of it in its own bucket.
+    """
+    node = models.PositiveIntegerField(primary_key=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.node}: {self.count}'
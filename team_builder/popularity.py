@@ -0,0 +1,194 @@
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q, Sum
+from django.utils import timezone as django_timezone
+
+from PokemonTeamMaker.transactions import atomic_write
+from .models import Team, TeamPopularity, TeamRankNode
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+FAVORITE = 'favorite'
+COMMENT = 'comment'
+VOTE = 'vote'
+WEIGHTS = {
+    FAVORITE: 3.0,
+    COMMENT: 2.0,
+    VOTE: 1.0,
+}
+
+# Ranks are counted on a Fenwick tree (TeamRankNode) of public teams per score bucket. Scores grow by
+# ln(2) per half-life, so 2 ** 20 buckets of 0.01 cover about 200 years with the default half-life;
+# scores past either end share the first or last bucket.
+RANK_BUCKETS = 2 ** 20
+RANK_BUCKET_WIDTH = 0.01
+
+
+def decay_rate():
+    return math.log(2) / (settings.POPULARITY_HALF_LIFE_DAYS * 86400)
+
+
+def event_score(kind, at):
+    """``log`` of the weight of an event, grown by the decay rate since ``EPOCH`` instead of decaying later."""
+    return math.log(WEIGHTS[kind]) + decay_rate() * (at - EPOCH).total_seconds()
+
+
+def current_value(score, now=None):
+    """Decayed popularity right now; only this needs the current time, never the stored scores."""
+    now = now or django_timezone.now()
+    return math.exp(score - decay_rate() * (now - EPOCH).total_seconds())
+
+
+def log_add_exp(score, value):
+    return max(score, value) + math.log1p(math.exp(-abs(score - value)))
+
+
+def record(team_id, kind, at):
+    """Add an event to the team's score."""
+    record_many([team_id], kind, at)
+
+
+def record_many(team_ids, kind, at):
+    """``record()`` the same event for several teams, with a fixed number of queries whatever their number."""
+    value = event_score(kind, at)
+    try:
+        with atomic_write():
+            add_event(team_ids, value)
+    except IntegrityError:
+        # Another transaction created the score of one of the teams first, so they all have one now.
+        with atomic_write():
+            add_event(team_ids, value)
+
+
+def add_event(team_ids, value):
+    rows = {team_id: (score, is_private) for team_id, score, is_private in TeamPopularity.objects
+            .select_for_update().filter(team_id__in=team_ids).values_list('team_id', 'score', 'is_private')}
+    updated = [TeamPopularity(team_id=team_id, score=log_add_exp(score, value), is_private=is_private)
+               for team_id, (score, is_private) in rows.items()]
+    TeamPopularity.objects.bulk_update(updated, ['score'])
+    created = [TeamPopularity(team_id=team_id, score=value, is_private=is_private) for team_id, is_private
+               in Team.objects.filter(pk__in=set(team_ids) - rows.keys()).values_list('id', 'is_private')]
+    TeamPopularity.objects.bulk_create(created)
+    move_ranks([(rows[row.team_id][0], row.score) for row in updated if not row.is_private]
+               + [(None, row.score) for row in created if not row.is_private])
+
+
+def retract(team_id, kind, at):
+    """Remove an earlier event; a score left with no events, or only float error, drops its row."""
+    value = event_score(kind, at)
+    with atomic_write():
+        row = TeamPopularity.objects.select_for_update().filter(team_id=team_id) \
+            .values_list('score', 'is_private').first()
+        if row is None:
+            return
+        score, is_private = row
+        if score > value + 1e-9:
+            new_score = score + math.log1p(-math.exp(value - score))
+            TeamPopularity.objects.filter(team_id=team_id).update(score=new_score)
+        else:
+            new_score = None
+            TeamPopularity.objects.filter(team_id=team_id).delete()
+        if not is_private:
+            move_ranks([(score, new_score)])
+
+
+def set_private(team_id, is_private):
+    """Copy the privacy of a team to its score, taking it off or putting it back on the rank tree."""
+    with atomic_write():
+        row = TeamPopularity.objects.select_for_update().filter(team_id=team_id) \
+            .exclude(is_private=is_private).values_list('score', flat=True).first()
+        if row is None:
+            return
+        TeamPopularity.objects.filter(team_id=team_id).update(is_private=is_private)
+        move_ranks([(row, None) if is_private else (None, row)])
+
+
+def rank_bucket(score):
+    """Bucket ``b`` with ``b * RANK_BUCKET_WIDTH <= score < (b + 1) * RANK_BUCKET_WIDTH``, within the tree."""
+    bucket = math.floor(score / RANK_BUCKET_WIDTH)
+    # The division may round across a bound; settle on the products that rank() compares in SQL.
+    if (bucket + 1) * RANK_BUCKET_WIDTH <= score:
+        bucket += 1
+    elif bucket * RANK_BUCKET_WIDTH > score:
+        bucket -= 1
+    return min(max(bucket, 0), RANK_BUCKETS - 1)
+
+
+def tree_position(score):
+    """1-based position of the bucket of ``score`` in the tree, the highest bucket first."""
+    return RANK_BUCKETS - rank_bucket(score)
+
+
+def move_ranks(changes):
+    """Apply ``(old score, new score)`` changes of public teams to the rank tree, ``None`` meaning no score."""
+    deltas = Counter()
+    for old_score, new_score in changes:
+        for score, delta in ((old_score, -1), (new_score, 1)):
+            if score is None:
+                continue
+            position = tree_position(score)
+            while position <= RANK_BUCKETS:
+                deltas[position] += delta
+                position += position & -position
+
+    # Moves within a bucket, and most nodes shared by nearby buckets, cancel out.
+    nodes_by_delta = defaultdict(list)
+    for node, delta in deltas.items():
+        if delta:
+            nodes_by_delta[delta].append(node)
+    for delta, nodes in nodes_by_delta.items():
+        if TeamRankNode.objects.filter(node__in=nodes).update(count=F('count') + delta) < len(nodes):
+            existing = set(TeamRankNode.objects.filter(node__in=nodes).values_list('node', flat=True))
+            TeamRankNode.objects.bulk_create([TeamRankNode(node=node, count=delta)
+                                              for node in nodes if node not in existing])
+
+
+def rank(team_id, score):
+    """
+    Leaderboard position of a public team: the public teams in higher buckets, summed over at most
+    ``log2(RANK_BUCKETS)`` tree nodes, plus those ahead of it in its own bucket, counted on the score index.
+    Teams with an equal score are ranked by id, matching the leaderboard order.
+    """
+    nodes, position = [], tree_position(score) - 1
+    while position > 0:
+        nodes.append(position)
+        position -= position & -position
+    ahead = TeamRankNode.objects.filter(node__in=nodes).aggregate(total=Sum('count'))['total'] or 0
+
+    same_bucket = TeamPopularity.objects.filter(is_private=False)
+    bucket = rank_bucket(score)
+    if bucket < RANK_BUCKETS - 1:
+        same_bucket = same_bucket.filter(score__lt=(bucket + 1) * RANK_BUCKET_WIDTH)
+    ahead += same_bucket.filter(Q(score__gt=score) | Q(score=score, team_id__lt=team_id)).count()
+    return ahead + 1
+
+
+def rank_tree(scores):
+    """``TeamRankNode`` rows of a tree holding ``scores``, to rebuild it in bulk."""
+    positions = np.array([tree_position(score) for score in scores], dtype=np.int64)
+    levels = []
+    while len(positions):
+        levels.append(positions)
+        positions = positions + (positions & -positions)
+        positions = positions[positions <= RANK_BUCKETS]
+    if not levels:
+        return []
+    nodes, counts = np.unique(np.concatenate(levels), return_counts=True)
+    return [TeamRankNode(node=node, count=count) for node, count in zip(nodes.tolist(), counts.tolist())]
+
+
+def aggregate_scores(team_ids, values):
+    """Log-sum-exp of ``values`` grouped by ``team_ids``, computed in one pass over sorted arrays."""
+    if not len(team_ids):
+        return {}
+    order = np.argsort(team_ids, kind='stable')
+    team_ids, values = team_ids[order], values[order]
+    starts = np.flatnonzero(np.r_[True, team_ids[1:] != team_ids[:-1]])
+    peaks = np.maximum.reduceat(values, starts)
+    sums = np.add.reduceat(np.exp(values - np.repeat(peaks, np.diff(np.r_[starts, len(values)]))), starts)
+    return dict(zip(team_ids[starts].tolist(), (peaks + np.log(sums)).tolist()))
@@ -0,0 +1,133 @@
+import numpy as np
+
+from .analysis import TEAM_SIZE
+from .catalog import get_catalog
+from .filters import PokemonFilter
+from .models import TeamPokemon
+
+STAT_FIELDS = ('hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')
+
+DEFENSE_WEIGHT = 1.0
+OFFENSE_WEIGHT = 1.0
+STATS_WEIGHT = 4.0
+
+
+class PokemonFeatures:
+    """
+    Per-Pokemon feature vectors over the rows of the catalog snapshot.
+
+    ``stats`` are the six base stats scaled by the dex maximum, ``profile`` is ``log2`` of the
+    multiplier taken from each attacking type (immunities clipped to -2) and ``stab`` is the best
+    multiplier the Pokemon's own types deal to each defending type.
+    """
+
+    def __init__(self, catalog):
+        table, chart = catalog.pokemons, catalog.type_chart
+        self.table = table
+
+        stats = np.nan_to_num(np.column_stack([table.numbers[field] for field in STAT_FIELDS]))
+        self.stats = stats / np.maximum(stats.max(axis=0, initial=0.0), 1.0)
+        self.target = np.percentile(self.stats, 75, axis=0) if len(table) else np.zeros(len(STAT_FIELDS))
+
+        self.primary = self.type_indices(chart, table.numbers['primary_type'])
+        self.secondary = self.type_indices(chart, table.numbers['secondary_type'])
+        taken = chart.defensive_multipliers(self.primary, self.secondary).T
+        with np.errstate(divide='ignore'):
+            self.profile = np.maximum(np.log2(taken), -2.0)
+        self.stab = np.maximum(chart.padded[self.primary, :len(chart)], chart.padded[self.secondary, :len(chart)])
+
+        moves = catalog.moves
+        self.move_types = self.type_indices(chart, moves.numbers['type'])
+        self.move_damaging = np.nan_to_num(moves.numbers['power']) > 0
+
+    @staticmethod
+    def type_indices(chart, type_ids):
+        return np.array([chart.index.get(int(type_id), chart.NONE) if not np.isnan(type_id) else chart.NONE
+                         for type_id in type_ids], dtype=np.int64)
+
+
+def get_features():
+    return get_catalog().derive('recommendations', PokemonFeatures)
+
+
+def load_members(team_id):
+    """Pokemon ids in the team's slots and the ids of their moves, in two queries."""
+    slots = dict(TeamPokemon.objects.filter(team_id=team_id, slot__gte=1, slot__lte=TEAM_SIZE).values_list(
+        'id', 'pokemon_id'))
+    move_ids = []
+    if slots:
+        move_ids = list(TeamPokemon.moves.through.objects.filter(teampokemon_id__in=slots.keys()).values_list(
+            'move_id', flat=True))
+    return [pokemon_id for pokemon_id in slots.values() if pokemon_id is not None], move_ids
+
+
+def score_candidates(features, chart, members, move_rows):
+    """
+    Score every Pokemon in the dex against the roster given as catalog row indices.
+
+    Returns the total score together with its defense, offense and stats components and the
+    type masks they were computed from, all vectorized over the whole dex.
+    """
+    profile = features.profile[members]
+    holes = np.maximum((profile > 0).sum(axis=0) - (profile < 0).sum(axis=0), 0)
+    # Resisting a type the team is exposed to counts more the deeper the hole; new weaknesses cost the same.
+    defense = -(np.minimum(features.profile, 0.0) @ holes) - np.maximum(features.profile, 0.0) @ (1 + holes)
+
+    best = np.ones(len(chart)) if not len(members) else features.stab[members].max(axis=0)
+    if len(move_rows):
+        damaging = move_rows[features.move_damaging[move_rows]]
+        best = np.maximum(best, chart.padded[features.move_types[damaging], :len(chart)].max(axis=0, initial=0.0))
+    uncovered = best <= 1.0
+    offense = (features.stab > 1.0) @ uncovered
+
+    team_stats = features.stats[members].mean(axis=0) if len(members) else np.zeros(len(STAT_FIELDS))
+    gaps = np.maximum(features.target - team_stats, 0.0)
+    stats = features.stats.mean(axis=1) + features.stats @ gaps
+
+    total = DEFENSE_WEIGHT * defense + OFFENSE_WEIGHT * offense + STATS_WEIGHT * stats
+    return total, defense, offense, stats, holes > 0, uncovered
+
+
+def recommend(team_id, params, limit):
+    """Top ``limit`` Pokemon for the open slots of a team, restricted by ``PokemonFilter`` lookups in ``params``."""
+    catalog = get_catalog()
+    features, chart, table = get_features(), catalog.type_chart, catalog.pokemons
+
+    pokemon_ids, move_ids = load_members(team_id)
+    members = np.array([table.position[pk] for pk in pokemon_ids if pk in table.position], dtype=np.int64)
+    move_rows = np.array([catalog.moves.position[pk] for pk in move_ids if pk in catalog.moves.position],
+                         dtype=np.int64)
+
+    candidates = table.filter(PokemonFilter, params)
+    candidates = candidates[~np.isin(candidates, members)]
+    total, defense, offense, stats, holes, uncovered = score_candidates(features, chart, members, move_rows)
+
+    scores = total[candidates]
+    if limit < len(candidates):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        candidates, scores = candidates[top], scores[top]
+    candidates = candidates[np.lexsort((table.ids[candidates], -scores))]
+
+    names = table.strings['name']
+    primary_names, secondary_names = table.strings['primary_type__name'], table.strings['secondary_type__name']
+    results = []
+    for row in candidates.tolist():
+        results.append({
+            'id': int(table.ids[row]),
+            'name': names[row],
+            'primary_type': primary_names[row],
+            'secondary_type': secondary_names[row],
+            'score': round(float(total[row]), 4),
+            'defense': round(float(defense[row]), 4),
+            'offense': int(offense[row]),
+            'stats': round(float(stats[row]), 4),
+            'patches': [chart.names[idx] for idx in np.flatnonzero(holes & (features.profile[row] < 0))],
+            'covers': [chart.names[idx] for idx in np.flatnonzero(uncovered & (features.stab[row] > 1.0))],
+        })
+    return {
+        'team': team_id,
+        'open_slots': TEAM_SIZE - len(pokemon_ids),
+        'weaknesses': [chart.names[idx] for idx in np.flatnonzero(holes)],
+        'uncovered': [chart.names[idx] for idx in np.flatnonzero(uncovered)],
+        'results': results,
+    }
@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .catalog import get_catalog
+
+PREFIX_BONUS = 1.0
+SUBSTRING_BONUS = 0.5
+MIN_SIMILARITY = 0.3
+# Entries scored between two checks of the search deadline.
+CHUNK_SIZE = 4096
+
+
+def trigrams(text):
+    """Trigrams of ``text`` padded so that the start of a word weighs more than its end."""
+    padded = f'  {text} '
+    return {padded[idx:idx + 3] for idx in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Posting lists from trigram to entry index over one list of names.
+
+    A query scores every entry at once: shared trigram counts come from a ``bincount`` over the
+    postings of the query's trigrams, giving a Jaccard similarity that tolerates typos, and exact
+    prefix/substring matches on the lowered names are added on top.
+    """
+
+    def __init__(self, ids, names):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = list(names)
+        self.lowered = np.array([name.lower() for name in self.names], dtype=str)
+
+        postings = {}
+        gram_counts = []
+        for idx, name in enumerate(self.lowered.tolist()):
+            grams = trigrams(name)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(idx)
+        self.postings = {gram: np.array(entries, dtype=np.int64) for gram, entries in postings.items()}
+        self.gram_counts = np.array(gram_counts, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def similarity(self, query):
+        grams = trigrams(query)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        shared = np.bincount(np.concatenate(hits), minlength=len(self)) if hits else np.zeros(len(self))
+        return shared / (self.gram_counts + len(grams) - shared)
+
+    def scores(self, query, similarity, start, stop):
+        lowered = self.lowered[start:stop]
+        prefix = np.char.startswith(lowered, query)
+        substring = np.char.find(lowered, query) >= 0
+        return similarity[start:stop] + PREFIX_BONUS * prefix + SUBSTRING_BONUS * substring
+
+    def search(self, query, limit, deadline=None):
+        """
+        Best ``limit`` matches among the entries scored, and whether all of them were: entries are scored
+        ``CHUNK_SIZE`` at a time, and no chunk is started once ``time.perf_counter()`` passed ``deadline``.
+        """
+        similarity = self.similarity(query)
+        indexes, scores = [], []
+        for start in range(0, len(self), CHUNK_SIZE):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            chunk = self.scores(query, similarity, start, start + CHUNK_SIZE)
+            matches = np.flatnonzero(chunk >= MIN_SIMILARITY)
+            indexes.append(start + matches)
+            scores.append(chunk[matches])
+        complete = len(indexes) * CHUNK_SIZE >= len(self)
+        if not indexes:
+            return [], complete
+        indexes, scores = np.concatenate(indexes), np.concatenate(scores)
+        if limit < len(indexes):
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            indexes, scores = indexes[best], scores[best]
+        return [(self.ids[idx], self.names[idx], score)
+                for idx, score in zip(indexes.tolist(), scores.tolist())], complete
+
+
+class SearchIndex:
+    kinds = ('pokemon', 'move', 'type')
+
+    def __init__(self, catalog):
+        pokemons, moves = catalog.pokemons, catalog.moves
+        self.indexes = {
+            'pokemon': TrigramIndex(pokemons.ids, pokemons.strings['name']),
+            'move': TrigramIndex(moves.ids, moves.strings['name']),
+            'type': TrigramIndex([type_.id for type_ in catalog.types], [type_.name for type_ in catalog.types]),
+        }
+
+
+def get_search_index():
+    return get_catalog().derive('search', SearchIndex)
+
+
+def search(query, kinds, limit):
+    """
+    Best ``limit`` matches for ``query`` across ``kinds``, searched in order.
+
+    Once ``SEARCH_LATENCY_BUDGET`` seconds have passed, the entries left, within a kind or in the
+    kinds after it, are skipped and the matches found so far are returned marked partial, so
+    autocomplete answers on time even when the catalog is large. Building the index after a
+    catalog change is not counted against the budget.
+    """
+    index = get_search_index()
+    deadline = time.perf_counter() + settings.SEARCH_LATENCY_BUDGET
+    query = query.strip().lower()
+
+    results = []
+    partial = False
+    for kind in kinds:
+        if time.perf_counter() > deadline:
+            partial = True
+            break
+        matches, complete = index.indexes[kind].search(query, limit, deadline)
+        partial = partial or not complete
+        results.extend({'kind': kind, 'id': int(pk), 'name': name, 'score': round(score, 4)}
+                       for pk, name, score in matches)
+
+    results.sort(key=lambda result: (-result['score'], len(result['name']), result['name']))
+    return {'query': query, 'partial': partial, 'results': results[:limit]}
@@ -1,28 +1,166 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Manager, Prefetch
 from rest_framework import serializers
-from .models import Team, Move, Pokemon, TeamPokemon
+from PokemonTeamMaker.transactions import atomic_write
+from .favorites import favorited_ids
+from .fieldsets import Expansion
+from .models import Type, Team, Move, Pokemon, TeamPokemon
+from .versioning import bump_team_revision
 
+FAVORITE_FIELDS = ('favorite_count', 'is_favorited')
+MAX_FAVORITE_TOGGLES = 100
+
+
+class FavoritedListSerializer(serializers.ListSerializer):
+    """Looks up ``is_favorited`` for all items with one query instead of one query per item."""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+        if 'is_favorited' not in self.child.fields:
+            return super().to_representation(items)
+        request = self.context.get('request')
+        self.child.favorited = favorited_ids(getattr(request, 'user', None), self.child.Meta.model,
+                                             [item.pk for item in items])
+        return super().to_representation(items)
+
+
+class FavoritedSerializerMixin(serializers.Serializer):
+    is_favorited = serializers.SerializerMethodField()
+    favorited = None
+
+    def get_is_favorited(self, obj):
+        favorited = self.favorited
+        if favorited is None:
+            request = self.context.get('request')
+            favorited = favorited_ids(getattr(request, 'user', None), type(obj), [obj.pk])
+        return obj.pk in favorited
+
+
+class TeamMovesSerializerMixin(serializers.Serializer):
+    """Checks the ``moves`` of a team slot, given as ids or ``Move`` instances."""
+
+    def validate_moves(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Each move must be different.")
+        if len(value) > 4:
+            raise serializers.ValidationError("A Pokemon cannot have more than 4 moves.")
+        return value
+
+
+class SparseFieldsetSerializerMixin(serializers.Serializer):
+    """
+    Narrows the fields to the ``fieldset`` of the serializer context and swaps in the requested ``expandable_fields``.
+
+    Only the serializer the fieldset was parsed for is affected, not the serializers nested in it.
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        if fieldset is None or fieldset.serializer_class is not type(self):
+            return fields
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return fields
+
+        for name in fieldset.expand:
+            fields[name] = self.expandable_fields[name].field()
+        if fieldset.names is not None:
+            fields = {name: fields[name] for name in fieldset.names}
+        return fields
+
+
+class TypeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Type
+        fields = ['id', 'name']
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ['id', 'username']
+
+
+class PokemonNestedSerializer(serializers.ModelSerializer):
+    primary_type = serializers.SlugRelatedField(slug_field='name', read_only=True)
+    secondary_type = serializers.SlugRelatedField(slug_field='name', read_only=True)
+
+    class Meta:
+        model = Pokemon
+        # Favorites change without bumping the revision of the teams the Pokemon is part of.
+        exclude = ['favorite_count']
+
+
+class MoveNestedSerializer(serializers.ModelSerializer):
+    type = serializers.SlugRelatedField(slug_field='name', read_only=True)
+
+    class Meta:
+        model = Move
+        fields = '__all__'
+
+
+class TeamPokemonFullSerializer(serializers.ModelSerializer):
+    pokemon = PokemonNestedSerializer(read_only=True)
+    moves = MoveNestedSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = TeamPokemon
+        fields = ['id', 'slot', 'pokemon', 'moves']
+
+
+class PokemonSerializer(SparseFieldsetSerializerMixin, FavoritedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'primary_type': Expansion(TypeSerializer, select_related=['primary_type']),
+        'secondary_type': Expansion(TypeSerializer, select_related=['secondary_type']),
+    }
 
-class PokemonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pokemon
         fields = '__all__'
+        read_only_fields = ['favorite_count']
+        list_serializer_class = FavoritedListSerializer
+
 
+class MoveSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'type': Expansion(TypeSerializer, select_related=['type']),
+    }
 
-class MoveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Move
         fields = '__all__'
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsetSerializerMixin, FavoritedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': Expansion(UserSummarySerializer, select_related=['user']),
+        'pokemons': Expansion(TeamPokemonFullSerializer, many=True, prefetch_related=[Prefetch(
+            'pokemons', queryset=TeamPokemon.objects.select_related('pokemon__primary_type', 'pokemon__secondary_type')
+            .prefetch_related(Prefetch('moves', queryset=Move.objects.select_related('type').order_by('id')))
+            .order_by('slot'))]),
+    }
+
     class Meta:
         model = Team
         fields = '__all__'
-        read_only_fields = ['user', 'is_complete']
+        read_only_fields = ['user', 'is_complete', 'favorite_count']
+        list_serializer_class = FavoritedListSerializer
 
 
-class TeamPokemonListSerializer(serializers.ModelSerializer):
-    slot = serializers.IntegerField(min_value=1, max_value=6, required=False)
+TEAM_POKEMON_EXPANSIONS = {
+    'pokemon': Expansion(PokemonNestedSerializer, select_related=['pokemon__primary_type', 'pokemon__secondary_type']),
+    'moves': Expansion(MoveNestedSerializer, many=True, prefetch_related=[
+        Prefetch('moves', queryset=Move.objects.select_related('type').order_by('id'))]),
+}
+
+
+class TeamPokemonListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = TEAM_POKEMON_EXPANSIONS
+    # Required: the column is NOT NULL, so a Pokemon added without a slot always failed to save.
+    slot = serializers.IntegerField(min_value=1, max_value=6)
 
     class Meta:
         model = TeamPokemon
@@ -34,12 +172,11 @@ class TeamPokemonListSerializer(serializers.ModelSerializer):
         if not team:
             raise serializers.ValidationError("Team was not provided - it might not exist.")
 
-        slot = validated_data.get('slot')
-        if slot is not None:
-            if TeamPokemon.objects.filter(team=team, slot=slot).exists():
-                raise serializers.ValidationError("Slot is already occupied.")
-
-        team_pokemon = TeamPokemon.objects.create(team=team, **validated_data)
+        try:
+            with transaction.atomic():
+                team_pokemon = TeamPokemon.objects.create(team=team, **validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError("Slot is already occupied.")
 
         if team.pokemons.count() == 6:
             team.is_complete = True
@@ -50,7 +187,8 @@ class TeamPokemonListSerializer(serializers.ModelSerializer):
         return team_pokemon
 
 
-class TeamPokemonDetailSerializer(serializers.ModelSerializer):
+class TeamPokemonDetailSerializer(SparseFieldsetSerializerMixin, TeamMovesSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = TEAM_POKEMON_EXPANSIONS
     moves = serializers.PrimaryKeyRelatedField(queryset=Move.objects.all(), required=False, many=True)
     slot = serializers.IntegerField(min_value=1, max_value=6, required=False)
 
@@ -59,20 +197,136 @@ class TeamPokemonDetailSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['team']
 
-    def validate_slot(self, value):
-        instance = self.instance
-        team_id = instance.team_id
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({'slot': ["Slot is already occupied."]})
 
-        team = Team.objects.get(pk=team_id)
-        if instance and instance.slot == value:
-            return value
-        if TeamPokemon.objects.filter(team=team, slot=value).exists():
-            raise serializers.ValidationError("Slot is already occupied.")
-        return value
 
-    def validate_moves(self, value):
-        if len(set(value)) != len(value):
-            raise serializers.ValidationError("Each move must be different.")
-        if len(value) > 4:
-            raise serializers.ValidationError("A Pokemon cannot have more than 4 moves.")
+class TeamFullSerializer(serializers.ModelSerializer):
+    pokemons = TeamPokemonFullSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'user', 'is_complete', 'is_private', 'pokemons']
+
+
+class TeamSlotWriteSerializer(TeamMovesSerializerMixin, serializers.Serializer):
+    slot = serializers.IntegerField(min_value=1, max_value=6)
+    pokemon = serializers.IntegerField(allow_null=True, required=False)
+    moves = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, attrs):
+        # PATCH makes the nested fields optional too, but a slot entry means nothing without its number.
+        if 'slot' not in attrs:
+            raise serializers.ValidationError({'slot': ["This field is required."]})
+        return attrs
+
+
+class TeamSlotsSerializer(serializers.Serializer):
+    """
+    Replaces (PUT) or patches (PATCH) the whole slot layout of a team in one transaction.
+
+    On PATCH, slots missing from the payload are kept, a missing ``moves`` keeps the current
+    moves and ``"pokemon": null`` empties the slot.
+    """
+    slots = TeamSlotWriteSerializer(many=True, max_length=6)
+
+    def validate_slots(self, value):
+        numbers = [entry['slot'] for entry in value]
+        if len(set(numbers)) != len(numbers):
+            raise serializers.ValidationError("Each slot can only be used once.")
+
+        occupied = set(self.instance.pokemons.values_list('slot', flat=True)) if self.partial else set()
+        for entry in value:
+            if entry.get('pokemon') is not None:
+                continue
+            if not self.partial or 'pokemon' not in entry and entry['slot'] not in occupied:
+                raise serializers.ValidationError(f"Slot {entry['slot']}: a pokemon is required.")
+
+        pokemon_ids = {entry['pokemon'] for entry in value if entry.get('pokemon') is not None}
+        missing = pokemon_ids - set(Pokemon.objects.filter(pk__in=pokemon_ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Invalid pokemon ids: {sorted(missing)}.")
+
+        move_ids = {move_id for entry in value for move_id in entry.get('moves', ())}
+        missing = move_ids - set(Move.objects.filter(pk__in=move_ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Invalid move ids: {sorted(missing)}.")
         return value
+
+    @atomic_write()
+    def update(self, instance, validated_data):
+        # Writing to the team row first locks it for concurrent layout writes.
+        bump_team_revision(instance.pk)
+        existing = {team_pokemon.slot: team_pokemon for team_pokemon in instance.pokemons.all()}
+        entries = {entry['slot']: entry for entry in validated_data['slots']}
+
+        removed = {}
+        for slot, team_pokemon in existing.items():
+            entry = entries.get(slot)
+            if entry is None and not self.partial or entry is not None and entry.get('pokemon', 0) is None:
+                removed[slot] = team_pokemon.pk
+
+        to_update, to_create = [], []
+        for slot, entry in entries.items():
+            pokemon_id = entry.get('pokemon')
+            if pokemon_id is None:
+                continue
+            team_pokemon = existing.get(slot)
+            if team_pokemon is None:
+                to_create.append(TeamPokemon(team=instance, slot=slot, pokemon_id=pokemon_id))
+            elif team_pokemon.pokemon_id != pokemon_id:
+                team_pokemon.pokemon_id = pokemon_id
+                to_update.append(team_pokemon)
+
+        through = TeamPokemon.moves.through
+        if removed:
+            TeamPokemon.objects.filter(pk__in=removed.values()).delete()
+        if to_update:
+            TeamPokemon.objects.bulk_update(to_update, ['pokemon'])
+        TeamPokemon.objects.bulk_create(to_create)
+
+        slot_ids = {team_pokemon.slot: team_pokemon.pk for team_pokemon in [*existing.values(), *to_create]
+                    if team_pokemon.slot not in removed}
+        with_moves = {slot_ids[slot]: entry['moves'] for slot, entry in entries.items()
+                      if 'moves' in entry and slot in slot_ids}
+        if with_moves:
+            through.objects.filter(teampokemon_id__in=with_moves.keys()).delete()
+            through.objects.bulk_create([through(teampokemon_id=team_pokemon_id, move_id=move_id)
+                                         for team_pokemon_id, move_ids in with_moves.items()
+                                         for move_id in move_ids])
+
+        instance.is_complete = len(existing) - len(removed) + len(to_create) == 6
+        instance.save(update_fields=['is_complete'])
+        return instance
+
+
+class FavoriteToggleSerializer(serializers.Serializer):
+    teams = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=MAX_FAVORITE_TOGGLES)
+    pokemons = serializers.ListField(child=serializers.IntegerField(), required=False,
+                                     max_length=MAX_FAVORITE_TOGGLES)
+
+    def validate(self, attrs):
+        if not attrs.get('teams') and not attrs.get('pokemons'):
+            raise serializers.ValidationError("Provide the teams or pokemons to toggle.")
+        return {name: list(dict.fromkeys(ids)) for name, ids in attrs.items()}
+
+
+class ShowdownImportSerializer(serializers.Serializer):
+    text = serializers.CharField(max_length=200000, trim_whitespace=False)
+    name = serializers.CharField(max_length=50, default='Imported team')
+    is_private = serializers.BooleanField(default=False)
+
+
+class MatchupMemberSerializer(serializers.Serializer):
+    pokemon = serializers.IntegerField()
+    moves = serializers.ListField(child=serializers.IntegerField(), max_length=4, default=list)
+
+
+class MatchupSerializer(serializers.Serializer):
+    """Two unsaved team layouts, so a matchup can be recomputed while moves are being edited."""
+    team = MatchupMemberSerializer(many=True, max_length=6)
+    opponent = MatchupMemberSerializer(many=True, max_length=6)
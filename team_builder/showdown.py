@@ -0,0 +1,161 @@
+import re
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .analysis import TEAM_SIZE, MOVES_PER_POKEMON
+from .catalog import get_catalog
+from .models import Team, TeamPokemon
+
+TEAM_HEADER = re.compile(r'^===\s*(?:\[[^\]]*\]\s*)?(.*?)\s*===$')
+GENDER = re.compile(r'\s*\((?:M|F)\)$')
+NICKNAMED = re.compile(r'^.*\((.+)\)$')
+MAX_TEAM_NAME = Team._meta.get_field('name').max_length
+
+
+def normalize(name):
+    """Showdown ids ignore case, spaces and punctuation (``Mr. Mime`` is ``mrmime``)."""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+class ShowdownNames:
+    """Lookup tables between catalog ids and normalized Showdown names, built once per catalog snapshot."""
+
+    def __init__(self, catalog):
+        self.pokemon_names = dict(zip(catalog.pokemons.ids.tolist(), catalog.pokemons.strings['name']))
+        self.move_names = dict(zip(catalog.moves.ids.tolist(), catalog.moves.strings['name']))
+        self.pokemon_ids = self.lookup(self.pokemon_names)
+        self.move_ids = self.lookup(self.move_names)
+
+    @staticmethod
+    def lookup(names):
+        ids = {}
+        for pk, name in names.items():
+            ids.setdefault(normalize(name), pk)
+        return ids
+
+
+def get_showdown_names():
+    return get_catalog().derive('showdown', ShowdownNames)
+
+
+def parse_species(line):
+    """Species of a ``Nickname (Species) (M) @ Item`` line; every part but the species is optional."""
+    line = GENDER.sub('', line.split(' @ ', 1)[0].strip())
+    match = NICKNAMED.match(line)
+    return (match.group(1) if match else line).strip()
+
+
+def parse_teams(text, default_name):
+    """
+    Parse Showdown text into ``[{'name': ..., 'pokemons': [{'pokemon': id, 'moves': [ids]}]}]``.
+
+    Teams start at ``=== [format] Name ===`` headers; text without headers is a single team. Lines other
+    than the species line and ``- Move`` lines (ability, EVs, nature...) are ignored since teams don't
+    store them. All problems are reported at once with their line numbers.
+    """
+    names = get_showdown_names()
+    teams, errors = [], []
+    team = member = None
+
+    def error(number, message):
+        errors.append(f'Line {number}: {message}')
+
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        header = TEAM_HEADER.match(line)
+        if header:
+            name = header.group(1) or default_name
+            if len(name) > MAX_TEAM_NAME:
+                error(number, f'Team names can have at most {MAX_TEAM_NAME} characters.')
+            team, member = {'name': name, 'pokemons': []}, None
+            teams.append(team)
+        elif not line:
+            member = None
+        elif member is None:
+            if team is None:
+                team = {'name': default_name, 'pokemons': []}
+                teams.append(team)
+            species = parse_species(line)
+            member = {'pokemon': names.pokemon_ids.get(normalize(species)), 'moves': []}
+            if member['pokemon'] is None:
+                error(number, f'Unknown Pokemon "{species}".')
+            if len(team['pokemons']) == TEAM_SIZE:
+                error(number, f'A team cannot have more than {TEAM_SIZE} Pokemon.')
+            team['pokemons'].append(member)
+        elif line.startswith('-'):
+            move = line[1:].strip()
+            move_id = names.move_ids.get(normalize(move))
+            if move_id is None:
+                error(number, f'Unknown move "{move}".')
+            elif move_id in member['moves']:
+                error(number, 'Each move must be different.')
+            elif len(member['moves']) == MOVES_PER_POKEMON:
+                error(number, f'A Pokemon cannot have more than {MOVES_PER_POKEMON} moves.')
+            member['moves'].append(move_id)
+
+    if errors:
+        raise ValidationError({'text': errors})
+    if not teams:
+        raise ValidationError({'text': ['No team found.']})
+    return teams
+
+
+@transaction.atomic
+def import_teams(user, teams, is_private=False):
+    """Create the parsed ``teams`` for ``user`` with one ``bulk_create`` per table."""
+    created = Team.objects.bulk_create([
+        Team(name=team['name'], user=user, is_private=is_private, is_complete=len(team['pokemons']) == TEAM_SIZE)
+        for team in teams
+    ])
+    slots = TeamPokemon.objects.bulk_create([
+        TeamPokemon(team=instance, slot=slot, pokemon_id=member['pokemon'])
+        for instance, team in zip(created, teams) for slot, member in enumerate(team['pokemons'], start=1)
+    ])
+    members = [member for team in teams for member in team['pokemons']]
+    through = TeamPokemon.moves.through
+    through.objects.bulk_create([through(teampokemon_id=slot.pk, move_id=move_id)
+                                 for slot, member in zip(slots, members) for move_id in member['moves']])
+    return created
+
+
+def export_chunk(teams, names):
+    """Showdown text of ``[(id, name)]`` teams, loading their slots and moves with two queries."""
+    team_ids = [team_id for team_id, _ in teams]
+    slots = {}
+    for slot_id, team_id, pokemon_id in TeamPokemon.objects.filter(team_id__in=team_ids).order_by('slot') \
+            .values_list('id', 'team_id', 'pokemon_id'):
+        slots.setdefault(team_id, []).append((slot_id, pokemon_id))
+    moves = {}
+    through = TeamPokemon.moves.through
+    for slot_id, move_id in through.objects.filter(teampokemon__team_id__in=team_ids).order_by('move_id') \
+            .values_list('teampokemon_id', 'move_id'):
+        moves.setdefault(slot_id, []).append(move_id)
+
+    texts = []
+    for team_id, name in teams:
+        lines = [f'=== {name} ===', '']
+        for slot_id, pokemon_id in slots.get(team_id, ()):
+            lines.append(names.pokemon_names.get(pokemon_id, ''))
+            lines.extend(f'- {names.move_names.get(move_id, "")}' for move_id in moves.get(slot_id, ()))
+            lines.append('')
+        texts.append('\n'.join(lines) + '\n')
+    return ''.join(texts)
+
+
+def export_teams(queryset, chunk_size):
+    """
+    Yield the Showdown text of ``queryset`` a chunk of teams at a time.
+
+    Teams are paged with ``iterator(chunk_size=...)`` and the slots and moves of each chunk are prefetched
+    as plain tuples, so memory use does not depend on the number of teams exported.
+    """
+    names = get_showdown_names()
+    chunk = []
+    for team in queryset.order_by('id').values_list('id', 'name').iterator(chunk_size=chunk_size):
+        chunk.append(team)
+        if len(chunk) == chunk_size:
+            yield export_chunk(chunk, names)
+            chunk = []
+    if chunk:
+        yield export_chunk(chunk, names)
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .favorites import TEAMS, POKEMONS, favorite_deleted
+from .models import Type, Pokemon, Move, Team, TeamPokemon, FavoriteTeam, FavoritePokemon
+from .popularity import set_private
+from .versioning import CATALOG, bump_version, bump_team_revision
+
+
+@receiver([post_save, post_delete], sender=Type)
+@receiver([post_save, post_delete], sender=Pokemon)
+@receiver([post_save, post_delete], sender=Move)
+def catalog_changed(sender, **kwargs):
+    bump_version(CATALOG)
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, created, update_fields, **kwargs):
+    # A new team has no popularity yet; record() copies its privacy on the first event.
+    if not created and (update_fields is None or 'is_private' in update_fields):
+        set_private(instance.pk, instance.is_private)
+
+
+@receiver(pre_delete, sender=Team)
+def team_deleting(sender, instance, **kwargs):
+    # Off the rank tree before the cascade; as a private score, retractions by the cascade leave the tree alone.
+    set_private(instance.pk, True)
+
+
+@receiver([post_save, post_delete], sender=TeamPokemon)
+def team_pokemon_changed(sender, instance, **kwargs):
+    bump_team_revision(instance.team_id)
+
+
+@receiver(m2m_changed, sender=TeamPokemon.moves.through)
+def team_pokemon_moves_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump_team_revision(instance.team_id)
+        return
+
+    # Changed from the Move side: pk_set holds TeamPokemon ids, except for clear() where it is None.
+    if action == 'pre_clear':
+        instance._cleared_team_ids = set(instance.team_pokemons.values_list('team_id', flat=True))
+    elif action == 'post_clear':
+        team_ids = instance.__dict__.pop('_cleared_team_ids', set())
+    elif action.startswith('post_'):
+        team_ids = set(TeamPokemon.objects.filter(pk__in=pk_set).values_list('team_id', flat=True))
+    if action.startswith('post_'):
+        for team_id in team_ids:
+            bump_team_revision(team_id)
+
+
+@receiver(post_delete, sender=FavoriteTeam)
+def favorite_team_deleted(sender, instance, **kwargs):
+    favorite_deleted(TEAMS, instance)
+
+
+@receiver(post_delete, sender=FavoritePokemon)
+def favorite_pokemon_deleted(sender, instance, **kwargs):
+    favorite_deleted(POKEMONS, instance)
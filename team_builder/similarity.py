@@ -0,0 +1,76 @@
+import numpy as np
+
+from .catalog import get_catalog
+from .recommendations import STAT_FIELDS
+
+
+class SimilarityIndex:
+    """
+    Brute-force nearest neighbours over z-scored base stats of the catalog snapshot.
+
+    Distances for a batch of queries come from a single matrix product; ``type_weight`` subtracts
+    the Jaccard overlap of the two Pokemon's types from the stat distance.
+    """
+
+    def __init__(self, catalog):
+        table = catalog.pokemons
+        self.table = table
+
+        stats = np.nan_to_num(np.column_stack([table.numbers[field] for field in STAT_FIELDS]))
+        std = stats.std(axis=0)
+        self.vectors = (stats - stats.mean(axis=0)) / np.where(std > 0, std, 1.0) if len(table) else stats
+        self.norms = (self.vectors ** 2).sum(axis=1)
+
+        # (n, n_types) membership matrix, so that overlaps for a batch are another matrix product.
+        chart = catalog.type_chart
+        self.types = np.zeros((len(table), len(chart)), dtype=np.float64)
+        for column in ('primary_type', 'secondary_type'):
+            for row, type_id in enumerate(table.numbers[column].tolist()):
+                if not np.isnan(type_id) and int(type_id) in chart.index:
+                    self.types[row, chart.index[int(type_id)]] = 1.0
+        self.type_counts = self.types.sum(axis=1)
+
+    def distances(self, rows, type_weight=0.0):
+        """Distance from each Pokemon in ``rows`` to every Pokemon in the dex, shape ``(len(rows), n)``."""
+        squared = self.norms[rows, None] + self.norms[None, :] - 2.0 * (self.vectors[rows] @ self.vectors.T)
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        if type_weight:
+            shared = self.types[rows] @ self.types.T
+            union = self.type_counts[rows, None] + self.type_counts[None, :] - shared
+            distances -= type_weight * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        distances[np.arange(len(rows)), rows] = np.inf
+        return distances
+
+    def neighbours(self, pokemon_ids, limit, type_weight=0.0):
+        """Map each known id in ``pokemon_ids`` to its ``limit`` nearest Pokemon as ``(row, distance)`` pairs."""
+        position = self.table.position
+        known = [pk for pk in pokemon_ids if pk in position]
+        if not known:
+            return {}
+        rows = np.array([position[pk] for pk in known], dtype=np.int64)
+        distances = self.distances(rows, type_weight)
+
+        limit = min(limit, len(self.table) - 1)
+        if limit <= 0:
+            return {pk: [] for pk in known}
+        top = np.argpartition(distances, limit - 1, axis=1)[:, :limit]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.lexsort((self.table.ids[top], top_distances), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        return {pk: list(zip(top[idx].tolist(), top_distances[idx].tolist())) for idx, pk in enumerate(known)}
+
+
+def get_similarity_index():
+    return get_catalog().derive('similarity', SimilarityIndex)
+
+
+def similar_pokemons(pokemon_ids, limit, type_weight=0.0):
+    index = get_similarity_index()
+    names = index.table.strings['name']
+    neighbours = index.neighbours(pokemon_ids, limit, type_weight)
+    return {
+        pk: [{'id': int(index.table.ids[row]), 'name': names[row], 'distance': round(distance, 4)}
+             for row, distance in rows]
+        for pk, rows in neighbours.items()
+    }
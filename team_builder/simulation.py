@@ -0,0 +1,72 @@
+"""
+Simplified turn-based battles between two teams, run many at once with NumPy.
+
+This module only depends on NumPy so that process pool workers can import it without setting up Django.
+"""
+import numpy as np
+
+MAX_TURNS = 300
+TEAM_SIZE = 6
+
+
+def simulate(setup, battles, seed):
+    """
+    Play ``battles`` seeded battles in lock-step and return ``(wins, losses, draws)`` of side 0.
+
+    ``setup`` holds per side arrays (first axis is the side): ``damage`` ``(2, 6, 4, 6, 16)`` and
+    ``struggle`` ``(2, 6, 6, 16)`` in percent of the defender's HP, ``expected`` ``(2, 6, 4, 6)``,
+    ``accuracy`` and ``pp`` ``(2, 6, 4)``, ``speed`` and ``present`` ``(2, 6)``.
+
+    Every turn each active Pokemon uses the move with the best expected damage that has PP left
+    (Struggle once none has), the faster one first with speed ties broken at random; a fainted
+    Pokemon is replaced by the next one in slot order. Battles still running after ``MAX_TURNS``
+    are draws.
+    """
+    rng = np.random.default_rng(seed)
+    damage, struggle, expected = setup['damage'], setup['struggle'], setup['expected']
+    accuracy, speed = setup['accuracy'], setup['speed']
+
+    rows = np.arange(battles)
+    hp = np.where(setup['present'], 100.0, 0.0)[None].repeat(battles, axis=0)
+    pp = setup['pp'][None].repeat(battles, axis=0)
+    active = np.zeros((battles, 2), dtype=np.int64)
+    for side in (0, 1):
+        active[:, side] = np.argmax(hp[:, side] > 0, axis=1)
+    running = (hp[:, 0] > 0).any(axis=1) & (hp[:, 1] > 0).any(axis=1)
+
+    for _ in range(MAX_TURNS):
+        if not running.any():
+            break
+        moves = np.zeros((battles, 2), dtype=np.int64)
+        struggling = np.zeros((battles, 2), dtype=bool)
+        for side in (0, 1):
+            attacker, defender = active[:, side], active[:, 1 - side]
+            available = pp[rows, side, attacker] > 0
+            choice = np.where(available, expected[side, attacker, :, defender], -1.0)
+            moves[:, side] = choice.argmax(axis=1)
+            struggling[:, side] = ~available.any(axis=1)
+
+        own, other = speed[0, active[:, 0]], speed[1, active[:, 1]]
+        first = np.where(own == other, rng.integers(0, 2, battles), np.where(own > other, 0, 1))
+        for side in (first, 1 - first):
+            attacker, defender = active[rows, side], active[rows, 1 - side]
+            move = moves[rows, side]
+            acting = running & (hp[rows, side, attacker] > 0) & (hp[rows, 1 - side, defender] > 0)
+
+            roll = rng.integers(0, 16, battles)
+            hit = rng.random(battles) < accuracy[side, attacker, move]
+            dealt = np.where(struggling[rows, side], struggle[side, attacker, defender, roll],
+                             damage[side, attacker, move, defender, roll] * hit)
+            hp[rows, 1 - side, defender] -= np.where(acting, dealt, 0.0)
+            pp[rows, side, attacker, move] -= (acting & ~struggling[rows, side]).astype(np.int64)
+
+        alive = hp > 0
+        for side in (0, 1):
+            fainted = ~alive[rows, side, active[:, side]]
+            active[:, side] = np.where(fainted, np.argmax(alive[:, side], axis=1), active[:, side])
+        running &= alive[:, 0].any(axis=1) & alive[:, 1].any(axis=1)
+
+    alive = (hp > 0).any(axis=2)
+    wins = int((alive[:, 0] & ~alive[:, 1]).sum())
+    losses = int((alive[:, 1] & ~alive[:, 0]).sum())
+    return wins, losses, battles - wins - losses
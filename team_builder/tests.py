@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from PokemonTeamMaker.compression import CODINGS, CompressionMiddleware, negotiate
+from PokemonTeamMaker.fastjson import FastJSONParser, FastJSONRenderer
+from PokemonTeamMaker.instrumentation import InstrumentationMiddleware, route_stats
+from PokemonTeamMaker.replicas import ReplicaPinningMiddleware, use_primary
+from PokemonTeamMaker.testing import FileDatabaseTestCase
+from PokemonTeamMaker.transactions import atomic_write
+from comments.models import TeamComment
+from .favorites import TEAMS, POKEMONS, change_favorites, get_favorite_counts
+from .models import Type, Pokemon, Move, Team, TeamPokemon, TeamPopularity, TeamRankNode, FavoriteTeam, CacheVersion
+from .popularity import COMMENT, FAVORITE, VOTE, EPOCH, rank_bucket, rank_tree, record, retract
+from .search import TrigramIndex
+from .versioning import CATALOG, get_version
+
+
+class FullTeamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire, flying, water = (Type.objects.create(name=name) for name in ('Fire', 'Flying', 'Water'))
+        cls.pokemons = [
+            Pokemon.objects.create(name=f'Pokemon {number}', primary_type=fire if number % 2 else water,
+                                   secondary_type=flying if number % 3 == 0 else None, hp=78, attack=84,
+                                   defense=78, sp_attack=109, sp_defense=85, speed=100)
+            for number in range(6)
+        ]
+        cls.moves = [Move.objects.create(name=f'Move {number}', type=fire, category='Special', power=90,
+                                         accuracy=100, pp=15) for number in range(4)]
+
+    def create_team(self, size):
+        team = Team.objects.create(name=f'Team of {size}', user=self.user)
+        for slot in range(1, size + 1):
+            team_pokemon = TeamPokemon.objects.create(team=team, pokemon=self.pokemons[slot - 1], slot=slot)
+            team_pokemon.moves.set(self.moves)
+        return team
+
+    def test_full_team_is_nested(self):
+        team = self.create_team(2)
+
+        response = self.client.get(reverse('team-full', args=[team.id]))
+
+        self.assertEqual(response.status_code, 200)
+        first_slot = response.data['pokemons'][0]
+        self.assertEqual(first_slot['slot'], 1)
+        self.assertEqual(first_slot['pokemon']['primary_type'], 'Water')
+        self.assertEqual(first_slot['pokemon']['secondary_type'], 'Flying')
+        self.assertEqual(response.data['pokemons'][1]['pokemon']['secondary_type'], None)
+        self.assertEqual([move['type'] for move in first_slot['moves']], ['Fire'] * 4)
+
+    def test_full_team_query_count_does_not_depend_on_team_size(self):
+        for size in (1, 6):
+            team = self.create_team(size)
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('team-full', args=[team.id]))
+            self.assertEqual(len(response.data['pokemons']), size)
+
+    def test_bulk_full_teams_use_fixed_number_of_queries(self):
+        teams = [self.create_team(size) for size in (1, 3, 6)]
+        ids = ','.join(str(team.id) for team in reversed(teams))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('teams-full'), {'ids': ids})
+
+        self.assertEqual([team['id'] for team in response.data], [team.id for team in reversed(teams)])
+
+    def test_private_teams_are_hidden_from_other_users(self):
+        team = self.create_team(1)
+        team.is_private = True
+        team.save()
+
+        self.assertEqual(self.client.get(reverse('team-full', args=[team.id])).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('team-full', args=[team.id])).status_code, 200)
+
+
+class AnalysisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.user = user_model.objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.other = user_model.objects.create_user(username='gary', password='eevee1234', email='gary@kanto.com')
+        fire, water, grass, electric, flying, ground = (
+            Type.objects.create(name=name) for name in ('Fire', 'Water', 'Grass', 'Electric', 'Flying', 'Ground'))
+        charizard = Pokemon.objects.create(name='Charizard', primary_type=fire, secondary_type=flying, hp=78,
+                                           attack=84, defense=78, sp_attack=109, sp_defense=85, speed=100)
+        blastoise = Pokemon.objects.create(name='Blastoise', primary_type=water, hp=79, attack=83, defense=100,
+                                           sp_attack=85, sp_defense=105, speed=78)
+        flamethrower = Move.objects.create(name='Flamethrower', type=fire, category='Special', power=90,
+                                           accuracy=100, pp=15)
+        surf = Move.objects.create(name='Surf', type=water, category='Special', power=90, accuracy=100, pp=15)
+        # Status moves deal no damage, so they add no coverage.
+        thunder_wave = Move.objects.create(name='Thunder Wave', type=electric, category='Status', power=None,
+                                           accuracy=90, pp=20)
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+        TeamPokemon.objects.create(team=cls.team, pokemon=charizard, slot=1).moves.set([flamethrower, thunder_wave])
+        TeamPokemon.objects.create(team=cls.team, pokemon=blastoise, slot=2).moves.set([surf])
+        cls.private = Team.objects.create(name='Secret', user=cls.other, is_private=True)
+        TeamPokemon.objects.create(team=cls.private, pokemon=blastoise, slot=1)
+        cls.empty = Team.objects.create(name='Empty', user=cls.user)
+
+    def test_team_analysis(self):
+        response = self.client.get(reverse('team-analysis', args=[self.team.id]))
+        self.assertEqual(response.status_code, 200)
+        analysis = response.data
+        self.assertEqual(analysis['members'], 2)
+        self.assertEqual(analysis['defense']['Electric'], {'weak': 2, 'resist': 0, 'immune': 0, 'score': 2})
+        self.assertEqual(analysis['defense']['Ground'], {'weak': 0, 'resist': 0, 'immune': 1, 'score': -2})
+        self.assertEqual(analysis['defense']['Fire'], {'weak': 0, 'resist': 2, 'immune': 0, 'score': -2})
+        self.assertEqual(analysis['defense']['Water'], {'weak': 1, 'resist': 1, 'immune': 0, 'score': 0})
+        self.assertEqual(analysis['weaknesses'], ['Electric'])
+        self.assertEqual(analysis['offense'],
+                         {'Fire': 2.0, 'Water': 0.5, 'Grass': 2.0, 'Electric': 1.0, 'Flying': 1.0, 'Ground': 2.0})
+        self.assertEqual(analysis['super_effective'], ['Fire', 'Grass', 'Ground'])
+        self.assertEqual(analysis['uncovered'], ['Water'])
+
+        empty = self.client.get(reverse('team-analysis', args=[self.empty.id])).data
+        self.assertEqual((empty['members'], empty['weaknesses'], empty['super_effective']), (0, [], []))
+
+    def test_private_teams_are_only_analyzed_for_their_owner(self):
+        self.assertEqual(self.client.get(reverse('team-analysis', args=[self.private.id])).status_code, 404)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('team-analysis', args=[self.private.id])).data['members'], 1)
+
+    def test_batch_analysis(self):
+        ids = [self.empty.id, self.private.id, self.team.id, 0, self.empty.id]
+        response = self.client.get(reverse('teams-analysis'), {'ids': ','.join(map(str, ids))})
+        self.assertEqual([analysis['team'] for analysis in response.data], [self.empty.id, self.team.id])
+        single = self.client.get(reverse('team-analysis', args=[self.team.id])).data
+        self.assertEqual(response.data[1], single)
+
+        for ids, message in (('', 'This parameter is required.'),
+                             ('1,two', 'Expected a comma separated list of integers.'),
+                             (','.join(map(str, range(1, 52))), 'At most 50 ids can be requested at once.')):
+            response = self.client.get(reverse('teams-analysis'), {'ids': ids})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['ids'], [message])
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire, water, grass, rock = (Type.objects.create(name=name) for name in ('Fire', 'Water', 'Grass', 'Rock'))
+        stats = dict(hp=80, attack=80, defense=80, sp_attack=80, sp_defense=80, speed=80)
+        cls.charizard = Pokemon.objects.create(name='Charizard', primary_type=fire, **stats)
+        cls.blastoise = Pokemon.objects.create(name='Blastoise', primary_type=water, **stats)
+        cls.kyogre = Pokemon.objects.create(name='Kyogre', primary_type=water, is_legendary=True, **stats)
+        cls.venusaur = Pokemon.objects.create(name='Venusaur', primary_type=grass, **stats)
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+        TeamPokemon.objects.create(team=cls.team, pokemon=cls.charizard, slot=1)
+
+    def test_candidates_patch_team_weaknesses(self):
+        response = self.client.get(reverse('team-recommendations', args=[self.team.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['weaknesses'], ['Water', 'Rock'])
+        names = [result['name'] for result in response.data['results']]
+        self.assertNotIn('Charizard', names)
+        self.assertEqual(names[:2], ['Blastoise', 'Kyogre'])
+        self.assertEqual(response.data['results'][0]['patches'], ['Water'])
+
+    def test_filters_mirror_pokemon_filter(self):
+        response = self.client.get(reverse('team-recommendations', args=[self.team.id]),
+                                   {'is_legendary': 'false', 'limit': 1})
+
+        self.assertEqual([result['name'] for result in response.data['results']], ['Blastoise'])
+
+    def test_complete_team_is_rejected(self):
+        self.team.is_complete = True
+        self.team.save()
+
+        response = self.client.get(reverse('team-recommendations', args=[self.team.id]))
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SimilarityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        fire, water = Type.objects.create(name='Fire'), Type.objects.create(name='Water')
+        cls.pokemons = [
+            Pokemon.objects.create(name=name, primary_type=primary_type, hp=hp, attack=hp, defense=60, sp_attack=60,
+                                   sp_defense=60, speed=60)
+            for name, primary_type, hp in (('Charmander', fire, 40), ('Squirtle', water, 45),
+                                           ('Vulpix', fire, 55), ('Charizard', fire, 100))
+        ]
+
+    def test_nearest_neighbours_by_stats(self):
+        response = self.client.get(reverse('pokemon-similar', args=[self.pokemons[0].id]), {'limit': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['name'] for result in response.data['results']], ['Squirtle', 'Vulpix'])
+
+    def test_type_weight_prefers_shared_types(self):
+        response = self.client.get(reverse('pokemon-similar', args=[self.pokemons[0].id]),
+                                   {'limit': 1, 'type_weight': 5})
+
+        self.assertEqual(response.data['results'][0]['name'], 'Vulpix')
+
+    def test_batch_answers_every_known_pokemon(self):
+        ids = f'{self.pokemons[3].id},0,{self.pokemons[1].id}'
+        response = self.client.get(reverse('pokemons-similar'), {'ids': ids, 'limit': 3})
+
+        self.assertEqual([item['pokemon'] for item in response.data], [self.pokemons[3].id, self.pokemons[1].id])
+        self.assertEqual(len(response.data[0]['results']), 3)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        fire, dragon = Type.objects.create(name='Fire'), Type.objects.create(name='Dragon')
+        for name in ('Charmander', 'Charmeleon', 'Charizard', 'Dragonite'):
+            Pokemon.objects.create(name=name, primary_type=fire, hp=60, attack=60, defense=60, sp_attack=60,
+                                   sp_defense=60, speed=60)
+        Move.objects.create(name='Dragon Claw', type=dragon, category='Physical', power=80, accuracy=100, pp=15)
+
+    def search(self, **params):
+        response = self.client.get(reverse('search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(result['kind'], result['name']) for result in response.data['results']]
+
+    def test_prefix_matches_across_kinds(self):
+        self.assertEqual(self.search(q='drag'), [('type', 'Dragon'), ('pokemon', 'Dragonite'), ('move', 'Dragon Claw')])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.search(q='charizrd')[0], ('pokemon', 'Charizard'))
+
+    def test_kinds_restrict_results(self):
+        self.assertEqual(self.search(q='drag', kinds='move'), [('move', 'Dragon Claw')])
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'drag', 'kinds': 'item'}).status_code, 400)
+
+    def test_deadline_is_checked_within_a_kind(self):
+        index = TrigramIndex([1, 2, 3], ['Charmander', 'Charmeleon', 'Charizard'])
+        self.assertEqual(len(index.search('char', 5)[0]), 3)
+
+        with mock.patch('team_builder.search.CHUNK_SIZE', 2), mock.patch('team_builder.search.time') as clock:
+            clock.perf_counter.side_effect = [0.0, 1.0]
+            matches, complete = index.search('char', 5, deadline=0.5)
+        self.assertEqual(sorted(name for _, name, _ in matches), ['Charmander', 'Charmeleon'])
+        self.assertFalse(complete)
+
+
+@override_settings(INSTRUMENTATION=True, INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=3)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+        for number in range(4):
+            Team.objects.create(name=f'Team {number}', user=cls.user)
+
+    def setUp(self):
+        route_stats.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('team-details', args=[self.team.id]))
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, '
+                                                    r'render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_queries_repeated_per_row_are_flagged(self):
+        def looped(request):
+            for team in Team.objects.all():
+                list(team.pokemons.all())
+            return HttpResponse()
+
+        def prefetched(request):
+            for team in Team.objects.prefetch_related('pokemons'):
+                list(team.pokemons.all())
+            return HttpResponse()
+
+        with self.assertNoLogs('PokemonTeamMaker.instrumentation', 'WARNING'):
+            InstrumentationMiddleware(prefetched)(RequestFactory().get('/'))
+        self.assertEqual(route_stats.snapshot()['GET <unresolved>']['n_plus_one'], {})
+
+        with self.assertLogs('PokemonTeamMaker.instrumentation', 'WARNING') as logs:
+            InstrumentationMiddleware(looped)(RequestFactory().get('/'))
+        [(sql, count)] = route_stats.snapshot()['GET <unresolved>']['n_plus_one'].items()
+        self.assertEqual(count, 5)
+        self.assertIn('team_builder_teampokemon', sql)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Possible N+1 on GET <unresolved>: query ran 5 times', logs.output[0])
+
+    def test_route_stats_are_staff_only(self):
+        self.client.get(reverse('team-details', args=[self.team.id]))
+        self.assertEqual(self.client.get(reverse('request-stats')).status_code, 401)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        stats = self.client.get(reverse('request-stats')).data['GET /team-builder/team-details/<int:pk>/']
+
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(set(stats['total']), {'p50', 'p95', 'p99'})
+        self.assertEqual(stats['n_plus_one'], {})
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire = Type.objects.create(name='Fire')
+        cls.pokemon = Pokemon.objects.create(name='Charizard', primary_type=fire, hp=78, attack=84, defense=78,
+                                             sp_attack=109, sp_defense=85, speed=100)
+        cls.move = Move.objects.create(name='Flamethrower', type=fire, category='Special', power=90, accuracy=100,
+                                       pp=15)
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+        cls.team_pokemon = TeamPokemon.objects.create(team=cls.team, pokemon=cls.pokemon, slot=1)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_matching_etag_is_not_modified(self):
+        url = reverse('team-details', args=[self.team.id])
+        etag = self.etag(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        self.assertNotEqual(self.etag(f'{url}?fields=name'), etag)
+
+    def test_team_slot_and_move_changes_give_a_new_etag(self):
+        url = reverse('team-details', args=[self.team.id])
+        etags = [self.etag(url)]
+
+        def changed(change):
+            change()
+            etags.append(self.etag(url))
+            self.assertNotIn(etags[-1], etags[:-1])
+
+        changed(lambda: Team.objects.get(pk=self.team.pk).save())
+        changed(lambda: TeamPokemon.objects.create(team=self.team, pokemon=self.pokemon, slot=2))
+        changed(lambda: self.team_pokemon.moves.add(self.move))
+        changed(lambda: self.move.team_pokemons.clear())
+        changed(lambda: TeamPokemon.objects.get(team=self.team, slot=2).delete())
+        self.assertEqual(self.etag(url), etags[-1])
+
+    def test_cache_control_is_private_for_private_or_per_user_payloads(self):
+        team_url = reverse('team-details', args=[self.team.id])
+        pokemon_url = reverse('pokemon-detail', args=[self.pokemon.id])
+        self.assertIn('public', self.client.get(team_url)['Cache-Control'])
+        self.assertIn('public', self.client.get(pokemon_url)['Cache-Control'])
+
+        self.client.force_login(self.user)
+        for url in (team_url, pokemon_url):
+            cache_control = self.client.get(url)['Cache-Control']
+            self.assertIn('private', cache_control)
+            self.assertNotIn('public', cache_control)
+
+        # A private team's slots are never cached by shared caches, whoever asks.
+        self.client.logout()
+        team_pokemons_url = reverse('teampokemon-list-create', args=[self.team.id])
+        self.assertIn('public', self.client.get(team_pokemons_url)['Cache-Control'])
+        Team.objects.filter(pk=self.team.pk).update(is_private=True)
+        cache_control = self.client.get(team_pokemons_url)['Cache-Control']
+        self.assertIn('private', cache_control)
+        self.assertNotIn('public', cache_control)
+
+
+@override_settings(REPLICA_ALIASES=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, request, write=False):
+        routes = {}
+
+        def view(request):
+            routes['before'] = router.db_for_read(Pokemon), router.db_for_read(FavoriteTeam)
+            if write:
+                router.db_for_write(Team)
+            routes['after'] = router.db_for_read(Pokemon), router.db_for_read(TeamPokemon.moves.through)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(request)
+        return routes, response
+
+    def test_safe_reads_of_replicated_models_use_the_replica(self):
+        routes, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(routes['before'], ('replica_1', 'default'))
+        self.assertEqual(routes['after'], ('replica_1', 'replica_1'))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_read(Pokemon), 'default')
+
+    def test_cache_versions_and_the_snapshots_built_for_them_use_the_primary(self):
+        routes = {}
+
+        def view(request):
+            routes['version'] = router.db_for_read(CacheVersion)
+            with use_primary():
+                routes['snapshot'] = router.db_for_read(Pokemon)
+            routes['after'] = router.db_for_read(Pokemon)
+            return HttpResponse()
+
+        ReplicaPinningMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(routes, {'version': 'default', 'snapshot': 'default', 'after': 'replica_1'})
+
+    def test_writes_pin_the_request_and_the_client_to_the_primary(self):
+        routes, response = self.route(RequestFactory().get('/'), write=True)
+        self.assertEqual(routes['after'], ('default', 'default'))
+        pin = response.cookies[settings.REPLICA_PIN_COOKIE].value
+
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = pin
+        self.assertEqual(self.route(request)[0]['before'], ('default', 'default'))
+        self.assertEqual(self.route(RequestFactory().post('/'))[0]['before'], ('default', 'default'))
+
+
+class ResponseEncodingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        water = Type.objects.create(name='Water')
+        for number in range(20):
+            Pokemon.objects.create(name=f'Pokemon {number}', primary_type=water, hp=44, attack=48, defense=65,
+                                   sp_attack=50, sp_defense=64, speed=43)
+
+    def test_fast_renderer_matches_the_drf_renderer(self):
+        data = {'when': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc), 'day': date(2024, 5, 1),
+                'price': Decimal('1.50'), 'label': gettext_lazy('Water'), 'text': 'line\u2028break', 1: [None, True],
+                'values': np.arange(3)}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_fast_parser(self):
+        self.assertEqual(FastJSONParser().parse(BytesIO('{"name":"Pokémon"}'.encode())), {'name': 'Pokémon'})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"name":'))
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate('br;q=0.5, gzip;q=0.8'), 'gzip')
+        self.assertEqual(negotiate('*'), CODINGS[0])
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate('gzip;q=0, *;q=0'))
+
+    def test_large_json_responses_are_compressed(self):
+        url = reverse('pokemon-list')
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], f'W/{plain["ETag"]}')
+        not_modified = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        pokemon = Pokemon.objects.first()
+        small = self.client.get(reverse('pokemon-detail', args=[pokemon.id]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', small)
+
+    def test_event_streams_are_not_compressed(self):
+        def view(request):
+            return StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream')
+
+        response = CompressionMiddleware(view)(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class PopularityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.users = [user_model.objects.create_user(username=f'trainer{number}', password='pikachu123',
+                                                    email=f'trainer{number}@kanto.com') for number in range(3)]
+        cls.teams = [Team.objects.create(name=f'Team {number}', user=cls.users[0]) for number in range(3)]
+
+    def leaderboard(self):
+        return [row['team'] for row in self.client.get(reverse('teams-popular')).data]
+
+    def rank_nodes(self):
+        return dict(TeamRankNode.objects.exclude(count=0).values_list('node', 'count'))
+
+    def test_events_update_the_leaderboard_incrementally(self):
+        first, second, third = self.teams
+        change_favorites(self.users[1], TEAMS, [second.id])
+        TeamComment.objects.create(user=self.users[1], team=third, content='Nice')
+        self.assertEqual(self.leaderboard(), [second.id, third.id])
+
+        change_favorites(self.users[2], TEAMS, [third.id])
+        self.assertEqual(self.leaderboard(), [third.id, second.id])
+
+        change_favorites(self.users[1], TEAMS, [second.id], favorite=False)
+        self.assertEqual(self.leaderboard(), [third.id])
+        self.assertFalse(TeamPopularity.objects.filter(team=second).exists())
+
+        comment = TeamComment.objects.create(user=self.users[1], team=first, content='Great')
+        self.client.force_login(self.users[2])
+        self.client.post(f'/comments/comments/team/{comment.id}/upvote/')
+        self.assertEqual(self.leaderboard(), [third.id, first.id])
+        self.assertAlmostEqual(self.client.get(reverse('team-rank', args=[first.id])).data['score'], 3, places=3)
+
+        self.client.delete(f'/comments/comments/team/{comment.id}/unvote/')
+        self.assertAlmostEqual(self.client.get(reverse('team-rank', args=[first.id])).data['score'], 2, places=3)
+
+    def test_deleting_an_upvoted_comment_retracts_its_votes(self):
+        team = self.teams[0]
+        comment = TeamComment.objects.create(user=self.users[0], team=team, content='Great')
+        for user in self.users[1:]:
+            self.client.force_login(user)
+            self.client.post(f'/comments/comments/team/{comment.id}/upvote/')
+        self.assertAlmostEqual(self.client.get(reverse('team-rank', args=[team.id])).data['score'], 4, places=3)
+
+        comment.delete()
+
+        self.assertFalse(TeamPopularity.objects.filter(team=team).exists())
+
+    def test_rank_lookup_and_private_teams(self):
+        first, second, third = self.teams
+        for user in self.users:
+            change_favorites(user, TEAMS, [first.id])
+        change_favorites(self.users[0], TEAMS, [second.id])
+
+        response = self.client.get(reverse('team-rank', args=[second.id]))
+        self.assertEqual((response.data['rank'], round(response.data['score'])), (2, 3))
+        self.assertIsNone(self.client.get(reverse('team-rank', args=[third.id])).data['rank'])
+
+        first.is_private = True
+        first.save()
+        self.assertEqual(self.leaderboard(), [second.id])
+        self.assertEqual(self.client.get(reverse('team-rank', args=[first.id])).status_code, 404)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('team-rank', args=[second.id])).data['rank'], 1)
+        self.assertFalse(any('JOIN' in query['sql'] for query in queries.captured_queries))
+
+        first.is_private = False
+        first.save(update_fields=['is_private'])
+        self.assertEqual(self.leaderboard(), [first.id, second.id])
+
+    def test_rebuild_matches_incremental_scores(self):
+        self.teams[1].is_private = True
+        self.teams[1].save()
+        for user in self.users:
+            change_favorites(user, TEAMS, [self.teams[0].id])
+            TeamComment.objects.create(user=user, team=self.teams[1], content='Nice')
+        incremental = {team_id: (score, is_private) for team_id, score, is_private
+                       in TeamPopularity.objects.values_list('team_id', 'score', 'is_private')}
+        self.assertEqual(incremental[self.teams[1].id][1], True)
+        rank_nodes = self.rank_nodes()
+
+        call_command('rebuild_popularity', stdout=open(os.devnull, 'w'))
+
+        rebuilt = TeamPopularity.objects.values_list('team_id', 'score', 'is_private')
+        self.assertEqual({team_id for team_id, _, _ in rebuilt}, incremental.keys())
+        for team_id, score, is_private in rebuilt:
+            self.assertAlmostEqual(score, incremental[team_id][0], places=6)
+            self.assertEqual(is_private, incremental[team_id][1])
+        self.assertEqual(self.rank_nodes(), rank_nodes)
+
+    def test_ranks_are_counted_on_the_tree(self):
+        teams = self.teams + [Team.objects.create(name=f'Team {number}', user=self.users[0]) for number in range(3, 9)]
+        # Events weeks apart spread the scores over many buckets.
+        for number, team in enumerate(teams[:6]):
+            for day in range(number % 3 + 1):
+                record(team.id, FAVORITE if day % 2 else COMMENT, EPOCH + timedelta(days=7 * number + day))
+        # Equal scores, ranked by id, and a score just above them in the same bucket.
+        for team in teams[6:]:
+            record(team.id, COMMENT, EPOCH + timedelta(days=70))
+        record(teams[8].id, VOTE, EPOCH)
+        scores = dict(TeamPopularity.objects.values_list('team_id', 'score'))
+        self.assertEqual(len({rank_bucket(scores[team.id]) for team in teams[6:]}), 1)
+        retract(teams[2].id, COMMENT, EPOCH + timedelta(days=14))
+        teams[3].is_private = True
+        teams[3].save()
+        teams[4].delete()
+
+        leaderboard = self.leaderboard()
+        self.assertEqual(leaderboard[:3], [teams[8].id, teams[6].id, teams[7].id])
+        self.assertEqual(len(leaderboard), 7)
+        for position, team_id in enumerate(leaderboard, start=1):
+            with self.assertNumQueries(4):
+                self.assertEqual(self.client.get(reverse('team-rank', args=[team_id])).data['rank'], position)
+
+        public_scores = TeamPopularity.objects.filter(is_private=False).values_list('score', flat=True)
+        self.assertEqual(self.rank_nodes(), {node.node: node.count for node in rank_tree(public_scores)})
+
+
+class FavoriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.user = user_model.objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.other = user_model.objects.create_user(username='misty', password='pikachu123', email='misty@kanto.com')
+        cls.teams = [Team.objects.create(name=f'Team {number}', user=cls.user) for number in range(4)]
+        water = Type.objects.create(name='Water')
+        cls.pokemons = [Pokemon.objects.create(name=name, primary_type=water, hp=44, attack=48, defense=65,
+                                               sp_attack=50, sp_defense=64, speed=43)
+                        for name in ('Squirtle', 'Psyduck', 'Staryu')]
+
+    def test_favorite_and_unfavorite_keep_the_count(self):
+        team = self.teams[0]
+        self.client.force_login(self.other)
+
+        self.assertEqual(self.client.post(reverse('favorite-team', args=[team.id])).status_code, 201)
+        self.assertEqual(self.client.post(reverse('favorite-team', args=[team.id])).status_code, 400)
+        team.refresh_from_db()
+        self.assertEqual(team.favorite_count, 1)
+
+        self.assertEqual(self.client.delete(reverse('favorite-team', args=[team.id])).status_code, 204)
+        self.assertEqual(self.client.delete(reverse('favorite-team', args=[team.id])).status_code, 400)
+        team.refresh_from_db()
+        self.assertEqual(team.favorite_count, 0)
+
+    def test_only_the_same_change_made_concurrently_counts_as_a_duplicate(self):
+        first, second, third = self.teams[:3]
+        self.client.force_login(self.other)
+
+        def concurrently(change):
+            def change_favorites_after(*args, **kwargs):
+                change()
+                raise IntegrityError
+            return mock.patch('team_builder.views.change_favorites', side_effect=change_favorites_after)
+
+        with concurrently(lambda: change_favorites(self.other, TEAMS, [first.id])):
+            self.assertEqual(self.client.post(reverse('favorite-team', args=[first.id])).status_code, 400)
+        with concurrently(second.delete):
+            self.assertEqual(self.client.post(reverse('favorite-team', args=[second.id])).status_code, 404)
+        with concurrently(lambda: None):
+            self.assertEqual(self.client.post(reverse('favorite-team', args=[third.id])).status_code, 409)
+            self.assertEqual(self.client.delete(reverse('favorite-team', args=[first.id])).status_code, 409)
+
+    def test_favorites_deleted_outside_the_api_update_the_counts(self):
+        team, pokemon = self.teams[0], self.pokemons[0]
+        for user in (self.user, self.other):
+            change_favorites(user, TEAMS, [team.id])
+            change_favorites(user, POKEMONS, [pokemon.id])
+        change_favorites(self.user, TEAMS, [team.id], favorite=False)
+        team.refresh_from_db()
+        self.assertEqual(team.favorite_count, 1)
+
+        # Like a delete in the admin, then a cascade from the user.
+        FavoriteTeam.objects.get(user=self.other, team=team).delete()
+        self.other.delete()
+
+        team.refresh_from_db()
+        pokemon.refresh_from_db()
+        self.assertEqual((team.favorite_count, pokemon.favorite_count), (0, 1))
+        self.assertFalse(TeamPopularity.objects.filter(team=team).exists())
+        self.assertEqual(get_favorite_counts().get(pokemon.id), 1)
+
+    def test_rebuild_favorite_counts(self):
+        change_favorites(self.other, POKEMONS, [self.pokemons[1].id])
+        Team.objects.filter(pk=self.teams[0].pk).update(favorite_count=5)
+        Pokemon.objects.filter(pk=self.pokemons[1].pk).update(favorite_count=0)
+
+        call_command('rebuild_favorite_counts', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(Team.objects.get(pk=self.teams[0].pk).favorite_count, 0)
+        self.assertEqual(Pokemon.objects.get(pk=self.pokemons[1].pk).favorite_count, 1)
+
+    def test_is_favorited_is_looked_up_once_per_page(self):
+        change_favorites(self.user, TEAMS, [self.teams[1].id, self.teams[3].id])
+        self.client.force_login(self.user)
+        self.client.get(reverse('team-create'))
+
+        # Session, user, teams and one favorites lookup, whatever the number of teams.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('team-create'))
+        self.assertEqual({row['id'] for row in response.data if row['is_favorited']},
+                         {self.teams[1].id, self.teams[3].id})
+
+    def test_bulk_toggle(self):
+        self.client.force_login(self.other)
+        self.client.post(reverse('favorite-pokemon', args=[self.pokemons[0].id]))
+
+        ids = [pokemon.id for pokemon in self.pokemons]
+        response = self.client.post(reverse('favorites'), {'pokemons': ids, 'teams': [self.teams[2].id]},
+                                    content_type='application/json')
+
+        self.assertEqual(response.data['pokemons'], {'added': ids[1:], 'removed': ids[:1]})
+        self.assertEqual(response.data['teams'], {'added': [self.teams[2].id], 'removed': []})
+        self.assertEqual(self.client.get(reverse('favorites')).data,
+                         {'teams': [self.teams[2].id], 'pokemons': ids[1:]})
+        self.assertEqual(list(Pokemon.objects.order_by('id').values_list('favorite_count', flat=True)), [0, 1, 1])
+
+    def test_private_teams_cannot_be_favorited(self):
+        self.teams[0].is_private = True
+        self.teams[0].save()
+        self.client.force_login(self.other)
+
+        self.assertEqual(self.client.post(reverse('favorite-team', args=[self.teams[0].id])).status_code, 404)
+        response = self.client.post(reverse('favorites'), {'teams': [self.teams[0].id]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_catalog_snapshot_overlays_favorites(self):
+        pokemon = self.pokemons[1]
+        self.client.force_login(self.user)
+        etag = self.client.get(reverse('pokemon-list'))['ETag']
+
+        self.client.post(reverse('favorite-pokemon', args=[pokemon.id]))
+
+        response = self.client.get(reverse('pokemon-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        rows = {row['id']: row for row in json.loads(response.content)}
+        self.assertEqual((rows[pokemon.id]['favorite_count'], rows[pokemon.id]['is_favorited']), (1, True))
+        self.assertFalse(rows[self.pokemons[0].id]['is_favorited'])
+        detail = json.loads(self.client.get(reverse('pokemon-detail', args=[pokemon.id])).content)
+        self.assertTrue(detail['is_favorited'])
+
+
+SHOWDOWN_TEAM = '''=== [gen9ou] Mimes ===
+
+Jester (Mr. Mime) (M) @ Light Clay
+Ability: Filter
+EVs: 252 HP / 4 Def / 252 SpD
+Calm Nature
+- Psychic
+- Reflect
+
+Farfetch'd @ Leek
+- Leaf Blade
+'''
+
+
+class CatalogSnapshotTests(TestCase):
+    POKEMON_QUERIES = [
+        {}, {'name__icontains': 'CHAR'}, {'name__iexact': 'pikachu'}, {'primary_type__name__iexact': 'fire'},
+        {'secondary_type__name__icontains': 'fly'}, {'hp__gt': '60', 'speed__lte': '100'}, {'attack__exact': '84'},
+        {'is_legendary': 'true'}, {'is_mythical': 'false', 'sp_attack__gte': '100'},
+        {'ordering': '-attack'}, {'ordering': 'attack,-name'}, {'ordering': 'secondary_type'},
+        {'ordering': '-secondary_type,id'}, {'ordering': 'is_legendary,-speed'},
+        {'hp__gt': 'many'}, {'ordering': 'unknown'},
+    ]
+    MOVE_QUERIES = [
+        {}, {'category__iexact': 'special'}, {'type__name__icontains': 'ir'}, {'power__gte': '80'},
+        {'accuracy__lt': '100'}, {'pp__exact': '15'}, {'ordering': '-power'}, {'ordering': 'accuracy,name'},
+        {'ordering': '-accuracy'}, {'ordering': 'type,-pp'},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        fire, flying, electric = (Type.objects.create(name=name) for name in ('Fire', 'Flying', 'Electric'))
+        for name, primary, secondary, attack, speed, legendary in (
+                ('Charmander', fire, None, 52, 65, False), ('Charizard', fire, flying, 84, 100, False),
+                ('Pikachu', electric, None, 55, 90, False), ('Zapdos', electric, flying, 90, 100, True),
+                ('Moltres', fire, flying, 100, 90, True), ('Pidgey', flying, None, 45, 56, False)):
+            Pokemon.objects.create(name=name, primary_type=primary, secondary_type=secondary, hp=attack + 10,
+                                   attack=attack, defense=60, sp_attack=attack + 20, sp_defense=60, speed=speed,
+                                   is_legendary=legendary)
+        for name, type_, category, power, accuracy, pp in (
+                ('Ember', fire, 'Special', 40, 100, 25), ('Fire Blast', fire, 'Special', 110, 85, 5),
+                ('Fly', flying, 'Physical', 90, 95, 15), ('Roost', flying, 'Status', None, None, 5),
+                ('Thunder Wave', electric, 'Status', None, 90, 20), ('Spark', electric, 'Physical', 65, 100, 20)):
+            Move.objects.create(name=name, type=type_, category=category, power=power, accuracy=accuracy, pp=pp)
+
+    def get(self, url, params, snapshot):
+        with override_settings(CATALOG_SNAPSHOT=snapshot):
+            response = self.client.get(url, params)
+        return response.status_code, json.loads(response.content)
+
+    def test_snapshot_filters_and_orders_like_the_database(self):
+        for url, queries in ((reverse('pokemon-list'), self.POKEMON_QUERIES),
+                             (reverse('moves-list'), self.MOVE_QUERIES)):
+            for params in queries:
+                with self.subTest(url=url, params=params):
+                    self.assertEqual(self.get(url, params, True), self.get(url, params, False))
+
+    def test_snapshot_answers_without_querying_the_catalog(self):
+        self.get(reverse('pokemon-list'), {}, True)
+        with CaptureQueriesContext(connection) as queries:
+            status_code, payload = self.get(reverse('pokemon-list'), {'ordering': '-secondary_type,id'}, True)
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(payload), 6)
+        self.assertFalse(any('team_builder_pokemon' in query['sql'] for query in queries.captured_queries))
+
+
+class FieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire, flying = Type.objects.create(name='Fire'), Type.objects.create(name='Flying')
+        cls.pokemons = [Pokemon.objects.create(name=f'Pokemon {number}', primary_type=fire, secondary_type=flying,
+                                               hp=78, attack=84, defense=78, sp_attack=109, sp_defense=85, speed=100)
+                        for number in range(3)]
+        cls.move = Move.objects.create(name='Flamethrower', type=fire, category='Special', power=90, accuracy=100,
+                                       pp=15)
+        cls.team = Team.objects.create(name='Kanto', user=cls.user)
+        for slot, pokemon in enumerate(cls.pokemons, start=1):
+            TeamPokemon.objects.create(team=cls.team, pokemon=pokemon, slot=slot).moves.set([cls.move])
+
+    def test_fields_and_exclude_narrow_the_payload(self):
+        for snapshot in (True, False):
+            with self.subTest(snapshot=snapshot), override_settings(CATALOG_SNAPSHOT=snapshot):
+                response = self.client.get(reverse('pokemon-list'), {'fields': 'name,id'})
+                self.assertEqual(json.loads(response.content)[0], {'id': self.pokemons[0].id, 'name': 'Pokemon 0'})
+
+                response = self.client.get(reverse('pokemon-detail', args=[self.pokemons[1].id]),
+                                           {'exclude': 'is_favorited,hp'})
+                payload = json.loads(response.content)
+                self.assertNotIn('hp', payload)
+                self.assertNotIn('is_favorited', payload)
+                self.assertIn('favorite_count', payload)
+
+    @override_settings(CATALOG_SNAPSHOT=False)
+    def test_only_requested_columns_are_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('pokemon-list'), {'fields': 'id,name'})
+        # No favorites lookup either, is_favorited wasn't asked for.
+        [query] = [query['sql'] for query in queries if 'team_builder_pokemon' in query['sql']]
+        self.assertNotIn('"attack"', query)
+        self.assertIn('"name"', query)
+
+    def test_expand_embeds_relations_without_extra_queries(self):
+        response = self.client.get(reverse('moves-list'), {'expand': 'type', 'fields': 'name,type'})
+        self.assertEqual(response.data[0], {'name': 'Flamethrower', 'type': {'id': self.move.type_id, 'name': 'Fire'}})
+
+        self.client.force_login(self.user)
+        url = reverse('teampokemon-list-create', args=[self.team.id])
+        self.client.get(url)
+        # Session, user, team revision, team and slots, then one prefetch of the moves and their types.
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {'expand': 'pokemon,moves'})
+        self.assertEqual(response.data[0]['pokemon']['secondary_type'], 'Flying')
+        self.assertEqual(response.data[2]['moves'][0]['type'], 'Fire')
+
+        response = self.client.get(reverse('team-details', args=[self.team.id]), {'expand': 'user,pokemons'})
+        self.assertEqual(response.data['user'], {'id': self.user.id, 'username': 'ash'})
+        self.assertEqual([slot['slot'] for slot in response.data['pokemons']], [1, 2, 3])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('pokemon-list'), {'fields': 'name,nickname', 'expand': 'hp'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'fields': ['Unknown fields: nickname.'], 'expand': ['Unknown fields: hp.']})
+
+    def test_writes_use_all_fields(self):
+        self.client.force_login(self.user)
+        response = self.client.patch(reverse('team-details', args=[self.team.id]) + '?fields=id',
+                                     {'name': 'Johto'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Johto')
+
+
+class ImportDexTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def import_dex(self, **files):
+        stdout = StringIO()
+        call_command('import_dex', chunk_size=2, stdout=stdout,
+                     **{name: self.write(f'{name}.csv', lines) for name, lines in files.items()})
+        return stdout.getvalue().splitlines()
+
+    def test_import_creates_then_updates_rows(self):
+        Type.objects.create(name='Fire')
+        output = self.import_dex(
+            types=['name', 'Fire', 'Water', '" "', 'Water'],
+            pokemon=['name,primary_type,secondary_type,hp,attack,defense,sp_attack,sp_defense,speed,is_legendary',
+                     'Charizard,Fire,Flying,78,84,78,109,85,100,false',
+                     ',Fire,,1,1,1,1,1,1,false',
+                     'Mewtwo,Psychic,,106,110,90,154,90,130,true',
+                     'Mewtwo,Psychic,,106,110,90,154,90,130,true'],
+            moves=['name,type,category,power,accuracy,pp', 'Ember,Fire,Special,40,100,25'])
+        self.assertTrue(output[0].startswith('types: 2 rows, 1 created, 0 updated, 1 unchanged, 2 skipped'))
+        self.assertTrue(output[1].startswith('pokemon: 2 rows, 2 created, 0 updated, 0 unchanged, 2 skipped'))
+        self.assertTrue(output[2].startswith('moves: 1 rows, 1 created, 0 updated, 0 unchanged, 0 skipped'))
+        self.assertEqual(set(Type.objects.values_list('name', flat=True)), {'Fire', 'Water', 'Flying', 'Psychic'})
+        mewtwo = Pokemon.objects.get(name='Mewtwo')
+        self.assertEqual((mewtwo.primary_type.name, mewtwo.sp_attack, mewtwo.is_legendary), ('Psychic', 154, True))
+
+        output = self.import_dex(
+            pokemon=['name,primary_type,secondary_type,hp,attack,defense,sp_attack,sp_defense,speed',
+                     'Charizard,Fire,Dragon,78,130,111,130,85,100',
+                     'Mewtwo,Psychic,,106,110,90,154,90,130'])
+        self.assertTrue(output[0].startswith('pokemon: 2 rows, 0 created, 2 updated, 0 unchanged, 0 skipped'))
+        charizard = Pokemon.objects.get(name='Charizard')
+        self.assertEqual((charizard.secondary_type.name, charizard.attack), ('Dragon', 130))
+        self.assertFalse(Pokemon.objects.get(name='Mewtwo').is_legendary)
+
+    def test_new_types_of_a_chunk_are_created_with_one_query(self):
+        path = self.write('moves.csv', ['name,type,category,power,accuracy,pp', 'Ember,Fire,Special,40,100,25',
+                                        'Surf,Water,Special,90,100,15', 'Tackle,Normal,Physical,40,100,35'])
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_dex', moves=path, stdout=StringIO())
+        inserts = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT INTO "team_builder_type"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Type.objects.count(), 3)
+
+    def test_catalog_version_moves_when_a_later_chunk_fails(self):
+        version = get_version(CATALOG)
+        with self.assertRaisesMessage(CommandError, 'Move "Surf" has no type.'):
+            self.import_dex(moves=['name,type,category,power,accuracy,pp', 'Ember,Fire,Special,40,100,25',
+                                   'Tackle,Normal,Physical,40,100,35', 'Surf,,Special,90,100,15'])
+        self.assertEqual(list(Move.objects.order_by('name').values_list('name', flat=True)), ['Ember', 'Tackle'])
+        self.assertGreater(get_version(CATALOG), version)
+
+
+class ShowdownTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        psychic, normal = Type.objects.create(name='Psychic'), Type.objects.create(name='Normal')
+        for name, type_ in (('Mr. Mime', psychic), ("Farfetch'd", normal)):
+            Pokemon.objects.create(name=name, primary_type=type_, hp=40, attack=45, defense=65, sp_attack=100,
+                                   sp_defense=120, speed=90)
+        for name, type_ in (('Psychic', psychic), ('Reflect', psychic), ('Leaf Blade', normal)):
+            Move.objects.create(name=name, type=type_, category='Special', power=90, accuracy=100, pp=10)
+
+    def import_text(self, text, **data):
+        self.client.force_login(self.user)
+        return self.client.post(reverse('team-import'), {'text': text, **data}, content_type='application/json')
+
+    def test_import_then_export_round_trips(self):
+        response = self.import_text(SHOWDOWN_TEAM)
+        self.assertEqual(response.status_code, 201)
+        team = Team.objects.get(pk=response.data[0]['id'])
+        self.assertEqual(team.name, 'Mimes')
+
+        exported = self.client.get(reverse('team-export', args=[team.id])).content.decode()
+        self.assertEqual(exported, '=== Mimes ===\n\nMr. Mime\n- Psychic\n- Reflect\n\nFarfetch\'d\n- Leaf Blade\n\n')
+        self.assertEqual(self.import_text(exported).status_code, 201)
+
+    def test_unknown_names_are_reported_by_line(self):
+        response = self.import_text('Mewtwo\n- Psychic\n- Hyper Beam\n')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['text'],
+                         ['Line 1: Unknown Pokemon "Mewtwo".', 'Line 3: Unknown move "Hyper Beam".'])
+        self.assertFalse(Team.objects.exists())
+
+    def test_bulk_export_streams_public_teams_in_fixed_queries(self):
+        self.import_text(SHOWDOWN_TEAM * 4, name='Public')
+        self.import_text('Mr. Mime', name='Hidden', is_private=True)
+        self.client.logout()
+        self.client.get(reverse('team-export', args=[Team.objects.first().id]))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('teams-export'), {'scope': 'public'})
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('=== Mimes ==='), 4)
+        self.assertNotIn('Hidden', content)
+        self.assertEqual(self.client.get(reverse('teams-export')).status_code, 401)
+
+
+class DamageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire, grass, ghost, normal = (Type.objects.create(name=name) for name in ('Fire', 'Grass', 'Ghost', 'Normal'))
+        stats = {'hp': 80, 'attack': 80, 'defense': 80, 'sp_attack': 80, 'sp_defense': 80, 'speed': 80}
+        cls.charizard = Pokemon.objects.create(name='Charizard', primary_type=fire, **{**stats, 'sp_attack': 110})
+        cls.venusaur = Pokemon.objects.create(name='Venusaur', primary_type=grass, **stats)
+        cls.snorlax = Pokemon.objects.create(name='Snorlax', primary_type=normal, **stats)
+        cls.gengar = Pokemon.objects.create(name='Gengar', primary_type=ghost, **stats)
+        cls.flamethrower = Move.objects.create(name='Flamethrower', type=fire, category='Special', power=90,
+                                               accuracy=100, pp=15)
+        cls.tackle = Move.objects.create(name='Tackle', type=normal, category='Physical', power=40, accuracy=100,
+                                         pp=35)
+        cls.growl = Move.objects.create(name='Growl', type=normal, category='Status', power=None, accuracy=100,
+                                        pp=40)
+
+    def damage(self, attacker, move, defender):
+        response = self.client.get(reverse('damage'), {'attacker': attacker.id, 'move': move.id,
+                                                       'defender': defender.id})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def team(self, name, members):
+        team = Team.objects.create(name=name, user=self.user)
+        for slot, (pokemon, moves) in enumerate(members, start=1):
+            TeamPokemon.objects.create(team=team, pokemon=pokemon, slot=slot).moves.set(moves)
+        return team
+
+    def test_stab_and_type_effectiveness(self):
+        neutral = self.damage(self.charizard, self.flamethrower, self.snorlax)
+        super_effective = self.damage(self.charizard, self.flamethrower, self.venusaur)
+
+        self.assertEqual(len(neutral['rolls']), 16)
+        self.assertLess(neutral['min'], neutral['max'])
+        self.assertAlmostEqual(super_effective['max'] / neutral['max'], 2.0, delta=0.05)
+        self.assertEqual(self.damage(self.snorlax, self.tackle, self.gengar)['max'], 0)
+        self.assertEqual(self.damage(self.snorlax, self.growl, self.venusaur)['max'], 0)
+
+    def test_team_matchup_matches_live_layout(self):
+        team = self.team('Fire', [(self.charizard, [self.tackle, self.flamethrower]), (self.snorlax, [self.tackle])])
+        opponent = self.team('Mixed', [(self.venusaur, [self.growl]), (self.gengar, [])])
+
+        with self.assertNumQueries(3):
+            saved = self.client.get(reverse('team-matchup', args=[team.id, opponent.id])).data
+        offense = saved['offense']
+        self.assertEqual(offense['attackers'][:3], [self.charizard.id, self.snorlax.id, None])
+        self.assertEqual(offense['matrix'][0][0]['move'], self.flamethrower.id)
+        self.assertIsNone(offense['matrix'][1][1])
+        self.assertTrue(all(cell is None for row in saved['defense']['matrix'] for cell in row))
+
+        live = self.client.post(reverse('matchup'), {
+            'team': [{'pokemon': self.charizard.id, 'moves': [self.tackle.id, self.flamethrower.id]},
+                     {'pokemon': self.snorlax.id, 'moves': [self.tackle.id]}],
+            'opponent': [{'pokemon': self.venusaur.id, 'moves': [self.growl.id]}, {'pokemon': self.gengar.id}],
+        }, content_type='application/json')
+        self.assertEqual(live.data['offense'], offense)
+
+
+
+@override_settings(BATTLE_WORKERS=0, BATTLE_TIME_BUDGET=60.0)
+class BattleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire, grass, normal = (Type.objects.create(name=name) for name in ('Fire', 'Grass', 'Normal'))
+        stats = {'hp': 80, 'attack': 80, 'defense': 80, 'sp_attack': 80, 'sp_defense': 80, 'speed': 80}
+        charizard = Pokemon.objects.create(name='Charizard', primary_type=fire, **stats)
+        venusaur = Pokemon.objects.create(name='Venusaur', primary_type=grass, **stats)
+        snorlax = Pokemon.objects.create(name='Snorlax', primary_type=normal, **stats)
+        flamethrower = Move.objects.create(name='Flamethrower', type=fire, category='Special', power=90,
+                                           accuracy=100, pp=15)
+        tackle = Move.objects.create(name='Tackle', type=normal, category='Physical', power=40, accuracy=100, pp=35)
+        cls.fire = cls.team('Fire', [(charizard, [flamethrower])] * 2)
+        cls.grass = cls.team('Grass', [(venusaur, [tackle])] * 2)
+        cls.normal = cls.team('Normal', [(snorlax, [tackle])] * 2)
+
+    @classmethod
+    def team(cls, name, members):
+        team = Team.objects.create(name=name, user=cls.user)
+        for slot, (pokemon, moves) in enumerate(members, start=1):
+            TeamPokemon.objects.create(team=team, pokemon=pokemon, slot=slot).moves.set(moves)
+        return team
+
+    def battle(self, team, opponent, **params):
+        response = self.client.get(reverse('team-battle', args=[team.id, opponent.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stronger_team_wins(self):
+        result = self.battle(self.fire, self.grass, battles=500)
+        self.assertEqual(result['battles'], 500)
+        self.assertGreater(result['win_rate'], 0.95)
+        low, high = result['confidence_interval']
+        self.assertLessEqual(low, result['win_rate'])
+        self.assertLessEqual(result['win_rate'], high)
+
+    def test_results_are_deterministic_per_seed(self):
+        first = self.battle(self.normal, self.grass, battles=600, seed=7)
+        self.assertEqual(first['wins'] + first['losses'] + first['draws'], 600)
+        for key in ('wins', 'losses', 'draws'):
+            self.assertEqual(self.battle(self.normal, self.grass, battles=600, seed=7)[key], first[key])
+        with override_settings(BATTLE_WORKERS=2):
+            pooled = self.battle(self.normal, self.grass, battles=600, seed=7)
+        self.assertEqual([pooled[key] for key in ('wins', 'losses', 'draws')],
+                         [first[key] for key in ('wins', 'losses', 'draws')])
+
+    @override_settings(BATTLE_TIME_BUDGET=0.0)
+    def test_time_budget_truncates(self):
+        result = self.battle(self.normal, self.grass, battles=1000)
+        self.assertTrue(result['truncated'])
+        self.assertEqual(result['requested'], 1000)
+        self.assertLess(result['battles'], 1000)
+
+    def test_invalid_parameters(self):
+        url = reverse('team-battle', args=[self.fire.id, self.grass.id])
+        self.assertEqual(self.client.get(url, {'battles': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'seed': 'x'}).status_code, 400)
+        Team.objects.filter(pk=self.grass.pk).update(is_private=True)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+def hammer(clients, request):
+    """Fire ``request(client)`` from one thread per client at the same moment and collect status codes."""
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def worker(client):
+        try:
+            barrier.wait()
+            statuses.append(request(client).status_code)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(statuses)
+
+
+class TeamSlotsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.user = user_model.objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        cls.other = user_model.objects.create_user(username='misty', password='pikachu123', email='misty@kanto.com')
+        fire = Type.objects.create(name='Fire')
+        cls.pokemons = [Pokemon.objects.create(name=f'Pokemon {number}', primary_type=fire, hp=78, attack=84,
+                                               defense=78, sp_attack=109, sp_defense=85, speed=100)
+                        for number in range(6)]
+        cls.moves = [Move.objects.create(name=f'Move {number}', type=fire, category='Special', power=90,
+                                         accuracy=100, pp=15) for number in range(4)]
+
+    def setUp(self):
+        self.team = Team.objects.create(name='Kanto', user=self.user)
+        for slot in (1, 2):
+            team_pokemon = TeamPokemon.objects.create(team=self.team, pokemon=self.pokemons[slot - 1], slot=slot)
+            team_pokemon.moves.set(self.moves[:2])
+        self.url = reverse('team-slots', args=[self.team.id])
+        self.client.force_login(self.user)
+
+    def write(self, method, slots):
+        return getattr(self.client, method)(self.url, {'slots': slots}, content_type='application/json')
+
+    def layout(self):
+        return {team_pokemon.slot: (team_pokemon.pokemon_id, sorted(move.id for move in team_pokemon.moves.all()))
+                for team_pokemon in self.team.pokemons.all()}
+
+    def test_put_replaces_the_layout(self):
+        slots = [{'slot': slot, 'pokemon': self.pokemons[slot].id, 'moves': [self.moves[3].id]} for slot in range(1, 6)]
+        slots.append({'slot': 6, 'pokemon': self.pokemons[0].id})
+
+        response = self.write('put', slots)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['slot'] for slot in response.data['pokemons']], [1, 2, 3, 4, 5, 6])
+        layout = self.layout()
+        self.assertEqual(layout[1], (self.pokemons[1].id, [self.moves[3].id]))
+        self.assertEqual(layout[6], (self.pokemons[0].id, []))
+        self.team.refresh_from_db()
+        self.assertTrue(self.team.is_complete)
+
+    def test_put_requires_a_pokemon_in_every_slot(self):
+        response = self.write('put', [{'slot': 1, 'pokemon': None}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.layout()), 2)
+
+    def test_patch_changes_only_the_given_slots(self):
+        response = self.write('patch', [{'slot': 1, 'moves': [self.moves[2].id]}, {'slot': 2, 'pokemon': None},
+                                        {'slot': 4, 'pokemon': self.pokemons[4].id}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.layout(), {1: (self.pokemons[0].id, [self.moves[2].id]), 4: (self.pokemons[4].id, [])})
+
+    def test_patch_requires_the_slot_number(self):
+        response = self.write('patch', [{'pokemon': self.pokemons[3].id}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['slots'][0]['slot'], ['This field is required.'])
+
+    def test_invalid_layouts_are_rejected(self):
+        for slots in ([{'slot': 1, 'pokemon': self.pokemons[0].id}, {'slot': 1, 'pokemon': self.pokemons[1].id}],
+                      [{'slot': 3, 'pokemon': 0}],
+                      [{'slot': 3, 'pokemon': self.pokemons[3].id, 'moves': [self.moves[0].id] * 2}]):
+            with self.subTest(slots=slots):
+                self.assertEqual(self.write('patch', slots).status_code, 400)
+        self.assertEqual(len(self.layout()), 2)
+
+    def test_only_the_owner_can_write(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.write('patch', [{'slot': 3, 'pokemon': self.pokemons[3].id}]).status_code, 403)
+
+    def test_single_slot_endpoints_apply_the_same_checks(self):
+        response = self.client.post(reverse('teampokemon-list-create', args=[self.team.id]),
+                                    {'pokemon': self.pokemons[3].id})
+        self.assertEqual((response.status_code, response.data['slot']), (400, ['This field is required.']))
+
+        moves = [self.moves[0].id] * 2
+        bulk = self.write('patch', [{'slot': 1, 'moves': moves}])
+        single = self.client.patch(reverse('team-pokemon-detail', args=[self.team.pokemons.get(slot=1).id]),
+                                   {'moves': moves}, content_type='application/json')
+        self.assertEqual((single.status_code, single.data['moves']), (400, bulk.data['slots'][0]['moves']))
+
+
+class ConcurrentSlotTests(FileDatabaseTestCase):
+    threads = 12
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+        fire = Type.objects.create(name='Fire')
+        self.pokemon = Pokemon.objects.create(name='Charizard', primary_type=fire, hp=78, attack=84, defense=78,
+                                              sp_attack=109, sp_defense=85, speed=100)
+        self.team = Team.objects.create(name='Kanto', user=self.user)
+
+    def logged_in_clients(self):
+        clients = []
+        for _ in range(self.threads):
+            client = Client(raise_request_exception=False)
+            client.force_login(self.user)
+            clients.append(client)
+        return clients
+
+    def test_concurrent_inserts_into_the_same_slot_create_one_row(self):
+        url = reverse('teampokemon-list-create', args=[self.team.id])
+
+        statuses = hammer(self.logged_in_clients(),
+                          lambda client: client.post(url, {'pokemon': self.pokemon.id, 'slot': 1}))
+
+        self.assertEqual(statuses, [201] + [400] * (self.threads - 1))
+        self.assertEqual(TeamPokemon.objects.filter(team=self.team, slot=1).count(), 1)
+
+    def test_concurrent_bulk_layouts_never_duplicate_slots(self):
+        url = reverse('team-slots', args=[self.team.id])
+        payload = json.dumps({'slots': [{'slot': slot, 'pokemon': self.pokemon.id} for slot in range(1, 7)]})
+
+        statuses = hammer(self.logged_in_clients(),
+                          lambda client: client.patch(url, payload, content_type='application/json'))
+
+        self.assertEqual(set(statuses) - {200, 400}, set())
+        self.assertEqual(sorted(self.team.pokemons.values_list('slot', flat=True)), [1, 2, 3, 4, 5, 6])
+
+
+class SqliteProfileTests(FileDatabaseTestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite' or not settings.SQLITE_PROFILE:
+            self.skipTest('Needs the tuned SQLite backend.')
+
+    def test_connections_apply_the_pragmas(self):
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size', 'mmap_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS[name])
+
+    def test_only_write_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Type.objects.count()
+            with atomic_write():
+                Type.objects.count()
+                with atomic_write():
+                    Type.objects.create(name='Fire')
+            with transaction.atomic():
+                Type.objects.count()
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('BEGIN')],
+                         ['BEGIN DEFERRED', 'BEGIN IMMEDIATE', 'BEGIN DEFERRED'])
+
+    def test_maintenance(self):
+        out = StringIO()
+        call_command('sqlite_maintenance', stdout=out)
+        self.assertIn('Maintained "default"', out.getvalue())
\ No newline at end of file
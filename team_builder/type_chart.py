@@ -0,0 +1,66 @@
+import numpy as np
+
+
+# Attacking type -> {defending type: multiplier}. Every pair not listed is neutral (1.0).
+TYPE_EFFECTIVENESS = {
+    'normal': {'rock': 0.5, 'ghost': 0.0, 'steel': 0.5},
+    'fire': {'fire': 0.5, 'water': 0.5, 'grass': 2.0, 'ice': 2.0, 'bug': 2.0, 'rock': 0.5, 'dragon': 0.5,
+             'steel': 2.0},
+    'water': {'fire': 2.0, 'water': 0.5, 'grass': 0.5, 'ground': 2.0, 'rock': 2.0, 'dragon': 0.5},
+    'electric': {'water': 2.0, 'electric': 0.5, 'grass': 0.5, 'ground': 0.0, 'flying': 2.0, 'dragon': 0.5},
+    'grass': {'fire': 0.5, 'water': 2.0, 'grass': 0.5, 'poison': 0.5, 'ground': 2.0, 'flying': 0.5, 'bug': 0.5,
+              'rock': 2.0, 'dragon': 0.5, 'steel': 0.5},
+    'ice': {'fire': 0.5, 'water': 0.5, 'grass': 2.0, 'ice': 0.5, 'ground': 2.0, 'flying': 2.0, 'dragon': 2.0,
+            'steel': 0.5},
+    'fighting': {'normal': 2.0, 'ice': 2.0, 'poison': 0.5, 'flying': 0.5, 'psychic': 0.5, 'bug': 0.5, 'rock': 2.0,
+                 'ghost': 0.0, 'dark': 2.0, 'steel': 2.0, 'fairy': 0.5},
+    'poison': {'grass': 2.0, 'poison': 0.5, 'ground': 0.5, 'rock': 0.5, 'ghost': 0.5, 'steel': 0.0, 'fairy': 2.0},
+    'ground': {'fire': 2.0, 'electric': 2.0, 'grass': 0.5, 'poison': 2.0, 'flying': 0.0, 'bug': 0.5, 'rock': 2.0,
+               'steel': 2.0},
+    'flying': {'electric': 0.5, 'grass': 2.0, 'fighting': 2.0, 'bug': 2.0, 'rock': 0.5, 'steel': 0.5},
+    'psychic': {'fighting': 2.0, 'poison': 2.0, 'psychic': 0.5, 'dark': 0.0, 'steel': 0.5},
+    'bug': {'fire': 0.5, 'grass': 2.0, 'fighting': 0.5, 'poison': 0.5, 'flying': 0.5, 'psychic': 2.0, 'ghost': 0.5,
+            'dark': 2.0, 'steel': 0.5, 'fairy': 0.5},
+    'rock': {'fire': 2.0, 'ice': 2.0, 'fighting': 0.5, 'ground': 0.5, 'flying': 2.0, 'bug': 2.0, 'steel': 0.5},
+    'ghost': {'normal': 0.0, 'psychic': 2.0, 'ghost': 2.0, 'dark': 0.5},
+    'dragon': {'dragon': 2.0, 'steel': 0.5, 'fairy': 0.0},
+    'dark': {'fighting': 0.5, 'psychic': 2.0, 'ghost': 2.0, 'dark': 0.5, 'fairy': 0.5},
+    'steel': {'fire': 0.5, 'water': 0.5, 'electric': 0.5, 'ice': 2.0, 'rock': 2.0, 'steel': 0.5, 'fairy': 2.0},
+    'fairy': {'fire': 0.5, 'fighting': 2.0, 'poison': 0.5, 'dragon': 2.0, 'dark': 2.0, 'steel': 0.5},
+}
+
+
+class TypeChart:
+    """
+    Effectiveness matrix over the rows of ``Type``, indexed ``[attacking, defending]``.
+
+    ``padded`` has one extra row and column at index ``NONE``: as a defender it is neutral to
+    everything (a missing secondary type), as an attacker it hits nothing (an empty move slot).
+    """
+
+    def __init__(self, types):
+        self.type_ids = np.array([type_.id for type_ in types], dtype=np.int64)
+        self.names = [type_.name for type_ in types]
+        self.index = {type_id: idx for idx, type_id in enumerate(self.type_ids.tolist())}
+
+        keys = [name.strip().lower() for name in self.names]
+        size = len(keys)
+        matrix = np.ones((size, size), dtype=np.float64)
+        for row, attacking in enumerate(keys):
+            for col, defending in enumerate(keys):
+                matrix[row, col] = TYPE_EFFECTIVENESS.get(attacking, {}).get(defending, 1.0)
+        self.matrix = matrix
+
+        self.NONE = size
+        padded = np.ones((size + 1, size + 1), dtype=np.float64)
+        padded[:size, :size] = matrix
+        padded[size, :] = 0.0
+        self.padded = padded
+
+    def __len__(self):
+        return len(self.names)
+
+    def defensive_multipliers(self, primary, secondary):
+        """Multipliers taken by defenders with the given type indices, shape ``(n_types, *primary.shape)``."""
+        return self.padded[:len(self), primary] * self.padded[:len(self), secondary]
+
@@ -1,14 +1,38 @@
 from django.urls import path
 from .views import TeamDetail, TeamPokemonDetail, MoveList, PokemonList, TeamListCreate, PokemonDetailView, \
-    TeamPokemonListCreate
+    TeamPokemonListCreate, TeamAnalysis, TeamAnalysisBatch, TeamFullDetail, TeamFullList, TeamSlots, \
+    TeamRecommendations, PokemonSimilar, PokemonSimilarBatch, Search, TeamLeaderboard, TeamRank, TeamFavorite, \
+    PokemonFavorite, Favorites, TeamImport, TeamExport, TeamExportBulk, Damage, TeamMatchup, Matchup, \
+    TeamBattle
 
 urlpatterns = [
 
     path('moves-list/', MoveList.as_view(), name='moves-list'),
     path('pokemons-list/', PokemonList.as_view(), name='pokemon-list'),
     path('pokemon-details/<int:pk>/', PokemonDetailView.as_view(), name='pokemon-detail'),
+    path('pokemon-similar/<int:pk>/', PokemonSimilar.as_view(), name='pokemon-similar'),
+    path('pokemons-similar/', PokemonSimilarBatch.as_view(), name='pokemons-similar'),
+    path('search/', Search.as_view(), name='search'),
     path('team-create/', TeamListCreate.as_view(), name='team-create'),
     path('team-details/<int:pk>/', TeamDetail.as_view(), name='team-details'),
+    path('team-full/<int:pk>/', TeamFullDetail.as_view(), name='team-full'),
+    path('teams-full/', TeamFullList.as_view(), name='teams-full'),
+    path('team-analysis/<int:pk>/', TeamAnalysis.as_view(), name='team-analysis'),
+    path('teams-analysis/', TeamAnalysisBatch.as_view(), name='teams-analysis'),
+    path('team-recommendations/<int:pk>/', TeamRecommendations.as_view(), name='team-recommendations'),
+    path('damage/', Damage.as_view(), name='damage'),
+    path('team-matchup/<int:pk>/<int:opponent>/', TeamMatchup.as_view(), name='team-matchup'),
+    path('matchup/', Matchup.as_view(), name='matchup'),
+    path('team-battle/<int:pk>/<int:opponent>/', TeamBattle.as_view(), name='team-battle'),
+    path('teams-popular/', TeamLeaderboard.as_view(), name='teams-popular'),
+    path('team-rank/<int:pk>/', TeamRank.as_view(), name='team-rank'),
+    path('team-import/', TeamImport.as_view(), name='team-import'),
+    path('team-export/<int:pk>/', TeamExport.as_view(), name='team-export'),
+    path('teams-export/', TeamExportBulk.as_view(), name='teams-export'),
+    path('favorite-team/<int:pk>/', TeamFavorite.as_view(), name='favorite-team'),
+    path('favorite-pokemon/<int:pk>/', PokemonFavorite.as_view(), name='favorite-pokemon'),
+    path('favorites/', Favorites.as_view(), name='favorites'),
     path('teampokemons-list/<int:team_id>/', TeamPokemonListCreate.as_view(), name='teampokemon-list-create'),
+    path('team-slots/<int:team_id>/', TeamSlots.as_view(), name='team-slots'),
     path('teampokemon-details/<int:pk>/', TeamPokemonDetail.as_view(), name='team-pokemon-detail'),
 ]
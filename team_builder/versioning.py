@@ -0,0 +1,38 @@
+import hashlib
+import uuid
+
+from django.db.models import F
+from django.utils.http import parse_etags
+
+from .models import CacheVersion, Team
+
+CATALOG = 'catalog'
+POKEMON_FAVORITES = 'pokemon-favorites'
+
+
+def get_version(key):
+    return CacheVersion.objects.filter(key=key).values_list('version', flat=True).first() or 0
+
+
+def bump_version(key):
+    if not CacheVersion.objects.filter(key=key).update(version=F('version') + 1):
+        _, created = CacheVersion.objects.get_or_create(key=key, defaults={'version': 1})
+        if not created:
+            CacheVersion.objects.filter(key=key).update(version=F('version') + 1)
+
+
+def bump_team_revision(team_id):
+    Team.objects.filter(pk=team_id).update(revision=uuid.uuid4())
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b(':'.join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or etag in (tag.removeprefix('W/') for tag in etags)
@@ -1,11 +1,51 @@
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q, Prefetch
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, generics, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
-from .models import Team, TeamPokemon, Move, Pokemon
-from .serializers import TeamSerializer, TeamPokemonDetailSerializer, \
-    PokemonSerializer, MoveSerializer, TeamPokemonListSerializer
+from rest_framework.views import APIView
+from PokemonTeamMaker.instrumentation import InstrumentedViewMixin
+from PokemonTeamMaker.transactions import atomic_write
+from .models import Team, TeamPokemon, Move, Pokemon, TeamPopularity
+from .serializers import FAVORITE_FIELDS, TeamSerializer, TeamPokemonDetailSerializer, PokemonSerializer, \
+    MoveSerializer, TeamPokemonListSerializer, TeamFullSerializer, TeamSlotsSerializer, FavoriteToggleSerializer, \
+    ShowdownImportSerializer, MatchupSerializer
 from .filters import PokemonFilter, MoveFilter, TeamFilter, TeamPokemonFilter
+from .analysis import analyze_teams
+from .recommendations import recommend
+from .similarity import similar_pokemons
+from .search import SearchIndex, search
+from .popularity import current_value, rank
+from .favorites import TEAMS, POKEMONS, KINDS, change_favorites, favorited_ids, get_favorite_counts
+from .showdown import parse_teams, import_teams, export_teams
+from .damage import get_damage_tables, load_slots
+from .battle import compare_teams
+from .catalog import get_catalog
+from .fieldsets import Fieldset
+from .versioning import CATALOG, POKEMON_FAVORITES, get_version, make_etag, etag_matches
+
+MAX_BATCH_TEAMS = 50
+DEFAULT_RECOMMENDATIONS = 10
+MAX_RECOMMENDATIONS = 50
+DEFAULT_SIMILAR = 10
+MAX_SIMILAR = 50
+MAX_BATCH_POKEMONS = 100
+MAX_TYPE_WEIGHT = 10.0
+MAX_SEARCH_LENGTH = 64
+DEFAULT_SEARCH_RESULTS = 10
+MAX_SEARCH_RESULTS = 50
+DEFAULT_LEADERBOARD = 10
+MAX_LEADERBOARD = 100
+MAX_IMPORT_TEAMS = 100
+EXPORT_CHUNK_SIZE = 500
+DEFAULT_BATTLES = 1000
+MAX_SEED = 2 ** 32 - 1
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -29,7 +69,156 @@ class IsAuthenticatedToCreate(permissions.BasePermission):
         return True
 
 
-class PokemonList(generics.ListAPIView):
+class ConditionalGetMixin:
+    """
+    Answer ``If-None-Match`` with 304 before any serializer runs.
+
+    Views return the version their payload depends on from ``get_etag_version()`` (``None``
+    skips the check, e.g. for a missing object) and may mark it private via ``etag_is_private``.
+    Payloads that differ per user (``etag_varies_by_user``) get a private ETag for logged in users.
+    """
+    etag_is_private = False
+    etag_varies_by_user = False
+
+    def get_etag_version(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_etag_version(request)
+        if version is None:
+            return super().get(request, *args, **kwargs)
+
+        query = sorted(request.query_params.lists())
+        parts = [type(self).__name__, self.kwargs, version, query, request.accepted_renderer.format]
+        if self.etag_varies_by_user and request.user.is_authenticated:
+            parts.append(request.user.pk)
+            self.etag_is_private = True
+        etag = make_etag(*parts)
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if self.etag_is_private:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+    def get_etag_version(self, request):
+        if settings.CATALOG_SNAPSHOT:
+            return get_catalog().version
+        return get_version(CATALOG)
+
+
+class PokemonConditionalGetMixin(CatalogConditionalGetMixin):
+    etag_varies_by_user = True
+
+    def get_etag_version(self, request):
+        if settings.CATALOG_SNAPSHOT:
+            favorites = get_favorite_counts().version
+        else:
+            favorites = get_version(POKEMON_FAVORITES)
+        return f'{super().get_etag_version(request)}.{favorites}'
+
+
+class TeamConditionalGetMixin(ConditionalGetMixin):
+    team_lookup_kwarg = 'pk'
+
+    def get_etag_version(self, request):
+        team = Team.objects.filter(pk=self.kwargs[self.team_lookup_kwarg]).values('revision', 'is_private').first()
+        if team is None:
+            return None
+        self.etag_is_private = team['is_private']
+        return team['revision']
+
+
+class SparseFieldsetMixin:
+    """
+    Let reads pick fields with ``?fields=`` / ``?exclude=`` and embed relations with ``?expand=``.
+
+    The queryset then loads only the columns of those fields and joins or prefetches only what is expanded.
+    """
+    fieldset = None
+
+    def get_fieldset(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        if self.fieldset is None:
+            self.fieldset = Fieldset(self.get_serializer_class(), self.request.query_params)
+        return self.fieldset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_fieldset()
+        return fieldset.optimize(queryset) if fieldset is not None else queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+
+class CatalogSnapshotMixin(SparseFieldsetMixin):
+    catalog_table = None
+
+    def get_overlay(self, request, ids=None, fields=None):
+        return None
+
+    def get_catalog_table(self, request):
+        # Expanded relations aren't part of the snapshot rows.
+        if not settings.CATALOG_SNAPSHOT or request.accepted_renderer.format != 'json' or self.get_fieldset().expand:
+            return None
+        return getattr(get_catalog(), self.catalog_table)
+
+    def list(self, request, *args, **kwargs):
+        table = self.get_catalog_table(request)
+        indices = table.filter(self.filterset_class, request.query_params) if table is not None else None
+        if indices is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = OrderingFilter().get_ordering(request, self.get_queryset(), self)
+        indices = table.order(indices, ordering)
+        if indices is None:
+            return super().list(request, *args, **kwargs)
+        fields = self.get_fieldset().names
+        return HttpResponse(table.render(indices, self.get_overlay(request, fields=fields), fields),
+                            content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        table = self.get_catalog_table(request)
+        if table is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        fields = self.get_fieldset().names
+        row = table.render_one(self.kwargs['pk'], self.get_overlay(request, [self.kwargs['pk']], fields), fields)
+        if row is None:
+            raise Http404
+        return HttpResponse(row, content_type='application/json')
+
+
+class FavoriteOverlayMixin(CatalogSnapshotMixin):
+    """Render ``favorite_count`` and the user's ``is_favorited`` over the Pokemon rows of the catalog snapshot."""
+
+    def get_overlay(self, request, ids=None, fields=None):
+        fields = FAVORITE_FIELDS if fields is None else fields
+        counts = get_favorite_counts() if 'favorite_count' in fields else None
+        favorited = favorited_ids(request.user, Pokemon, ids) if 'is_favorited' in fields else None
+        if favorited is None:
+            return (lambda pk: b'"favorite_count":%d' % counts.get(pk)) if counts is not None else None
+        if counts is None:
+            return lambda pk: b'"is_favorited":%s' % (b'true' if pk in favorited else b'false')
+        return lambda pk: b'"favorite_count":%d,"is_favorited":%s' % (
+            counts.get(pk), b'true' if pk in favorited else b'false')
+
+
+class PokemonList(PokemonConditionalGetMixin, FavoriteOverlayMixin, InstrumentedViewMixin, generics.ListAPIView):
+    catalog_table = 'pokemons'
     queryset = Pokemon.objects.all()
     serializer_class = PokemonSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -37,12 +226,50 @@ class PokemonList(generics.ListAPIView):
     ordering_fields = '__all__'
 
 
-class PokemonDetailView(generics.RetrieveAPIView):
+class PokemonDetailView(PokemonConditionalGetMixin, FavoriteOverlayMixin, InstrumentedViewMixin,
+                        generics.RetrieveAPIView):
+    catalog_table = 'pokemons'
     queryset = Pokemon.objects.all()
     serializer_class = PokemonSerializer
 
 
-class MoveList(generics.ListAPIView):
+class PokemonSimilar(APIView):
+    def get(self, request, pk):
+        limit = parse_limit(request, DEFAULT_SIMILAR, MAX_SIMILAR)
+        results = similar_pokemons([pk], limit, parse_type_weight(request))
+        if pk not in results:
+            raise Http404
+        return Response({'pokemon': pk, 'results': results[pk]})
+
+
+class PokemonSimilarBatch(APIView):
+    def get(self, request):
+        ids = parse_ids(request, MAX_BATCH_POKEMONS)
+        limit = parse_limit(request, DEFAULT_SIMILAR, MAX_SIMILAR)
+        results = similar_pokemons(ids, limit, parse_type_weight(request))
+        return Response([{'pokemon': pk, 'results': results[pk]} for pk in ids if pk in results])
+
+
+class Search(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This parameter is required.']})
+        if len(query) > MAX_SEARCH_LENGTH:
+            raise ValidationError({'q': [f'Ensure this value has at most {MAX_SEARCH_LENGTH} characters.']})
+
+        kinds = request.query_params.get('kinds')
+        kinds = [kind.strip() for kind in kinds.split(',') if kind.strip()] if kinds else SearchIndex.kinds
+        unknown = [kind for kind in kinds if kind not in SearchIndex.kinds]
+        if unknown:
+            raise ValidationError({'kinds': [f'Unknown kinds: {", ".join(unknown)}.']})
+
+        limit = parse_limit(request, DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS)
+        return Response(search(query, kinds, limit))
+
+
+class MoveList(CatalogConditionalGetMixin, CatalogSnapshotMixin, InstrumentedViewMixin, generics.ListAPIView):
+    catalog_table = 'moves'
     queryset = Move.objects.all()
     serializer_class = MoveSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -50,7 +277,7 @@ class MoveList(generics.ListAPIView):
     ordering_fields = '__all__'
 
 
-class TeamListCreate(generics.ListCreateAPIView):
+class TeamListCreate(SparseFieldsetMixin, InstrumentedViewMixin, generics.ListCreateAPIView):
     serializer_class = TeamSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = TeamFilter
@@ -68,13 +295,325 @@ class TeamListCreate(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class TeamDetail(generics.RetrieveUpdateDestroyAPIView):
+class TeamDetail(TeamConditionalGetMixin, SparseFieldsetMixin, InstrumentedViewMixin,
+                 generics.RetrieveUpdateDestroyAPIView):
+    etag_varies_by_user = True
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
 
-class TeamPokemonListCreate(generics.ListCreateAPIView):
+def visible_teams(request):
+    queryset = Team.objects.all()
+    if request.user.is_authenticated:
+        return queryset.filter(Q(is_private=False) | Q(user=request.user))
+    return queryset.filter(is_private=False)
+
+
+def parse_ids(request, limit):
+    raw = request.query_params.get('ids', '')
+    try:
+        ids = list(dict.fromkeys(int(value) for value in raw.split(',') if value.strip()))
+    except ValueError:
+        raise ValidationError({'ids': ['Expected a comma separated list of integers.']})
+    if not ids:
+        raise ValidationError({'ids': ['This parameter is required.']})
+    if len(ids) > limit:
+        raise ValidationError({'ids': [f'At most {limit} ids can be requested at once.']})
+    return ids
+
+
+def parse_int(request, name, default, minimum, maximum):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+    if not minimum <= value <= maximum:
+        raise ValidationError({name: [f'Ensure this value is between {minimum} and {maximum}.']})
+    return value
+
+
+def parse_limit(request, default, maximum):
+    return parse_int(request, 'limit', default, 1, maximum)
+
+
+def parse_type_weight(request):
+    try:
+        type_weight = float(request.query_params.get('type_weight', 0.0))
+    except ValueError:
+        raise ValidationError({'type_weight': ['A valid number is required.']})
+    if not 0.0 <= type_weight <= MAX_TYPE_WEIGHT:
+        raise ValidationError({'type_weight': [f'Ensure this value is between 0 and {MAX_TYPE_WEIGHT:g}.']})
+    return type_weight
+
+
+def with_full_team(queryset):
+    slots = TeamPokemon.objects.select_related('pokemon__primary_type', 'pokemon__secondary_type').prefetch_related(
+        Prefetch('moves', queryset=Move.objects.select_related('type').order_by('id'))).order_by('slot')
+    return queryset.prefetch_related(Prefetch('pokemons', queryset=slots))
+
+
+class TeamFullDetail(InstrumentedViewMixin, generics.RetrieveAPIView):
+    serializer_class = TeamFullSerializer
+
+    def get_queryset(self):
+        return with_full_team(visible_teams(self.request))
+
+
+class TeamFullList(APIView):
+    def get(self, request):
+        ids = parse_ids(request, MAX_BATCH_TEAMS)
+        teams = with_full_team(visible_teams(request)).in_bulk(ids)
+        serializer = TeamFullSerializer([teams[team_id] for team_id in ids if team_id in teams], many=True)
+        return Response(serializer.data)
+
+
+class TeamAnalysis(APIView):
+    def get(self, request, pk):
+        team = generics.get_object_or_404(visible_teams(request), pk=pk)
+        return Response(analyze_teams([team])[0])
+
+
+class TeamAnalysisBatch(APIView):
+    def get(self, request):
+        ids = parse_ids(request, MAX_BATCH_TEAMS)
+        teams = visible_teams(request).in_bulk(ids)
+        return Response(analyze_teams([teams[team_id] for team_id in ids if team_id in teams]))
+
+
+class TeamRecommendations(APIView):
+    def get(self, request, pk):
+        team = generics.get_object_or_404(visible_teams(request), pk=pk)
+        if team.is_complete:
+            return Response({'detail': 'Team is already complete.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_limit(request, DEFAULT_RECOMMENDATIONS, MAX_RECOMMENDATIONS)
+        return Response(recommend(team.id, request.query_params, limit))
+
+
+def public_popularity():
+    return TeamPopularity.objects.filter(is_private=False)
+
+
+def parse_catalog_id(request, name, positions):
+    try:
+        pk = int(request.query_params[name])
+    except KeyError:
+        raise ValidationError({name: ['This parameter is required.']})
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+    if pk not in positions:
+        raise ValidationError({name: [f'Invalid id {pk}.']})
+    return positions[pk]
+
+
+class Damage(APIView):
+    def get(self, request):
+        tables = get_damage_tables()
+        attacker = parse_catalog_id(request, 'attacker', tables.pokemon_position)
+        move = parse_catalog_id(request, 'move', tables.move_position)
+        defender = parse_catalog_id(request, 'defender', tables.pokemon_position)
+        return Response(tables.calculate(attacker, move, defender))
+
+
+class TeamMatchup(APIView):
+    def get(self, request, pk, opponent):
+        teams = visible_teams(request).in_bulk([pk, opponent])
+        if pk not in teams or opponent not in teams:
+            raise Http404
+        tables = get_damage_tables()
+        slots = load_slots([pk, opponent])
+        team, other = tables.members(slots[pk]), tables.members(slots[opponent])
+        return Response({
+            'team': pk,
+            'opponent': opponent,
+            'offense': tables.matchup(team, other),
+            'defense': tables.matchup(other, team),
+        })
+
+
+class Matchup(APIView):
+    def post(self, request):
+        serializer = MatchupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tables = get_damage_tables()
+        errors = {}
+        for side in ('team', 'opponent'):
+            members = serializer.validated_data[side]
+            unknown = sorted({member['pokemon'] for member in members} - tables.pokemon_position.keys())
+            unknown += sorted({pk for member in members for pk in member['moves']} - tables.move_position.keys())
+            if unknown:
+                errors[side] = [f'Invalid ids: {unknown}.']
+        if errors:
+            raise ValidationError(errors)
+
+        team, other = (tables.members([(member['pokemon'], member['moves'])
+                                       for member in serializer.validated_data[side]])
+                       for side in ('team', 'opponent'))
+        return Response({'offense': tables.matchup(team, other), 'defense': tables.matchup(other, team)})
+
+
+class TeamBattle(APIView):
+    def get(self, request, pk, opponent):
+        teams = visible_teams(request).in_bulk([pk, opponent])
+        if pk not in teams or opponent not in teams:
+            raise Http404
+        battles = parse_int(request, 'battles', DEFAULT_BATTLES, 1, settings.BATTLE_MAX_BATTLES)
+        seed = parse_int(request, 'seed', 0, 0, MAX_SEED)
+        slots = load_slots([pk, opponent])
+        result = compare_teams(slots[pk], slots[opponent], battles, seed)
+        if not result['battles']:
+            return Response({'detail': 'No battle could be simulated in time, try again later.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'team': pk, 'opponent': opponent, **result})
+
+
+class TeamLeaderboard(APIView):
+    def get(self, request):
+        limit = parse_limit(request, DEFAULT_LEADERBOARD, MAX_LEADERBOARD)
+        rows = public_popularity().order_by('-score', 'team_id').values_list(
+            'team_id', 'team__name', 'team__user_id', 'score')[:limit]
+        now = timezone.now()
+        return Response([
+            {'rank': rank, 'team': team_id, 'name': name, 'user': user_id, 'score': current_value(score, now)}
+            for rank, (team_id, name, user_id, score) in enumerate(rows, start=1)
+        ])
+
+
+class TeamRank(APIView):
+    def get(self, request, pk):
+        team = generics.get_object_or_404(Team, pk=pk, is_private=False)
+        score = TeamPopularity.objects.filter(team=team).values_list('score', flat=True).first()
+        if score is None:
+            return Response({'team': team.id, 'rank': None, 'score': 0.0})
+        return Response({'team': team.id, 'rank': rank(team.id, score), 'score': current_value(score)})
+
+
+class Favorite(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    kind = None
+
+    def get_addable(self, request):
+        return self.kind.target_model.objects.all()
+
+    def change(self, request, pk, favorite):
+        """``change_favorites()`` for one id, or ``None`` when another request got in the way."""
+        try:
+            return change_favorites(request.user, self.kind, [pk], favorite=favorite)
+        except IntegrityError:
+            # Another request making the same change leaves nothing to do. Anything else, like the foreign key
+            # of a favorite whose target was deleted meanwhile, is not a duplicate.
+            if self.kind.favorites(request.user, [pk]).exists() == favorite:
+                return {}
+            generics.get_object_or_404(self.kind.target_model, pk=pk)
+            return None
+
+    def post(self, request, pk):
+        generics.get_object_or_404(self.get_addable(request), pk=pk)
+        changed = self.change(request, pk, True)
+        if changed is None:
+            return self.conflict()
+        if not changed:
+            return Response({'detail': 'This is already one of your favorites.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'detail': 'Favorite added successfully.'}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        changed = self.change(request, pk, False)
+        if changed is None:
+            return self.conflict()
+        if not changed:
+            return Response({'detail': 'This is not one of your favorites.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'detail': 'Favorite removed successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
+    def conflict(self):
+        return Response({'detail': 'This favorite was changed by another request, please retry.'},
+                        status=status.HTTP_409_CONFLICT)
+
+
+class TeamFavorite(Favorite):
+    kind = TEAMS
+
+    def get_addable(self, request):
+        return visible_teams(request)
+
+
+class PokemonFavorite(Favorite):
+    kind = POKEMONS
+
+
+class Favorites(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({kind.name: sorted(favorited_ids(request.user, model)) for model, kind in KINDS.items()})
+
+    def post(self, request):
+        """Toggle every listed team and Pokemon in one transaction."""
+        serializer = FavoriteToggleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        addable = {TEAMS: visible_teams(request), POKEMONS: Pokemon.objects.all()}
+        result = {}
+        try:
+            with atomic_write():
+                for kind in KINDS.values():
+                    changed = change_favorites(request.user, kind, serializer.validated_data.get(kind.name, []),
+                                               addable=addable[kind])
+                    result[kind.name] = {
+                        'added': [pk for pk, favorited in changed.items() if favorited],
+                        'removed': [pk for pk, favorited in changed.items() if not favorited],
+                    }
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': [
+                'Your favorites were changed by another request, please retry.']})
+        return Response(result)
+
+
+class TeamImport(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = ShowdownImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        teams = parse_teams(serializer.validated_data['text'], serializer.validated_data['name'])
+        if len(teams) > MAX_IMPORT_TEAMS:
+            raise ValidationError({'text': [f'At most {MAX_IMPORT_TEAMS} teams can be imported at once.']})
+
+        created = import_teams(request.user, teams, serializer.validated_data['is_private'])
+        return Response([{'id': team.id, 'name': team.name} for team in created], status=status.HTTP_201_CREATED)
+
+
+class TeamExport(APIView):
+    def get(self, request, pk):
+        teams = visible_teams(request).filter(pk=pk)
+        text = ''.join(export_teams(teams, 1))
+        if not text:
+            raise Http404
+        return HttpResponse(text, content_type='text/plain; charset=utf-8')
+
+
+class TeamExportBulk(APIView):
+    """Stream every team of the user (``?scope=mine``, the default) or every public team (``?scope=public``)."""
+
+    def get(self, request):
+        scope = request.query_params.get('scope', 'mine')
+        if scope == 'public':
+            teams = Team.objects.filter(is_private=False)
+        elif scope == 'mine':
+            if not request.user.is_authenticated:
+                self.permission_denied(request)
+            teams = Team.objects.filter(user=request.user)
+        else:
+            raise ValidationError({'scope': ['Expected "mine" or "public".']})
+
+        response = StreamingHttpResponse(export_teams(teams, EXPORT_CHUNK_SIZE),
+                                         content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="teams-{scope}.txt"'
+        return response
+
+
+class TeamPokemonListCreate(TeamConditionalGetMixin, SparseFieldsetMixin, InstrumentedViewMixin,
+                            generics.ListCreateAPIView):
+    team_lookup_kwarg = 'team_id'
     serializer_class = TeamPokemonListSerializer
     permission_classes = [IsPokemonTeamOwner]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -92,7 +631,33 @@ class TeamPokemonListCreate(generics.ListCreateAPIView):
         serializer.save(team=team)
 
 
-class TeamPokemonDetail(generics.RetrieveUpdateDestroyAPIView):
+class TeamSlots(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_team(self, request, team_id):
+        team = generics.get_object_or_404(Team, id=team_id)
+        if team.user_id != request.user.id:
+            self.permission_denied(request)
+        return team
+
+    def write(self, request, team_id, partial):
+        team = self.get_team(request, team_id)
+        serializer = TeamSlotsSerializer(team, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise ValidationError({'slots': ['The team was changed by another request, please retry.']})
+        return Response(TeamFullSerializer(with_full_team(Team.objects.all()).get(pk=team.pk)).data)
+
+    def put(self, request, team_id):
+        return self.write(request, team_id, partial=False)
+
+    def patch(self, request, team_id):
+        return self.write(request, team_id, partial=True)
+
+
+class TeamPokemonDetail(SparseFieldsetMixin, InstrumentedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = TeamPokemon.objects.all()
     serializer_class = TeamPokemonDetailSerializer
     permission_classes = [IsPokemonTeamOwner]
@@ -0,0 +1,73 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Process-local ``key -> (user, token)`` map with a TTL, bounded to ``TOKEN_CACHE_SIZE`` entries.
+
+    Entries are dropped on logout, token deletion and user changes in this process. Other processes keep
+    their entries, so a token revoked or a user deactivated elsewhere still authenticates there for up to
+    ``TOKEN_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, credentials):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.TOKEN_CACHE_TTL, credentials)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None, user_id=None):
+        with self.lock:
+            if key is not None:
+                self.entries.pop(key, None)
+            if user_id is not None:
+                for cached_key in [cached_key for cached_key, (_, (user, _)) in self.entries.items()
+                                   if user.pk == user_id]:
+                    del self.entries[cached_key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``Authorization: Token <key>`` authentication that skips the token and user queries on cache hits.
+
+    Each request gets its own copies of the cached user and token, so what a view sets on them stays local.
+    """
+
+    def authenticate_credentials(self, key):
+        if settings.TOKEN_CACHE_TTL <= 0:
+            return super().authenticate_credentials(key)
+
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        user, token = credentials
+        return copy.copy(user), copy.copy(token)
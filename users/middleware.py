@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+
+REFRESHED_AT = '_refreshed_at'
+
+
+class SessionRefreshMiddleware:
+    """
+    Extend the expiry of an existing session at most once per ``SESSION_REFRESH_INTERVAL`` seconds.
+
+    With ``SESSION_SAVE_EVERY_REQUEST`` off, reads no longer write the session row on every request;
+    views that need the session saved anyway can still set ``request.session.modified = True``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if session is None or session.session_key is None or settings.SESSION_SAVE_EVERY_REQUEST:
+            return response
+        refreshed_at = session.get(REFRESHED_AT, 0)
+        # A stale session cookie loads as an empty session, which must not be saved as a new row.
+        if session.is_empty():
+            return response
+        now = int(time.time())
+        if now - refreshed_at >= settings.SESSION_REFRESH_INTERVAL:
+            session[REFRESHED_AT] = now
+        return response
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    token_cache.invalidate(key=instance.key)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def forget_user_tokens(sender, instance, **kwargs):
+    token_cache.invalidate(user_id=instance.pk)
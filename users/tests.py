@@ -1,3 +1,89 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from .authentication import CachedTokenAuthentication, token_cache
+
+
+class TokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def test_cached_token_skips_authentication_queries(self):
+        self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 200)
+
+        # Only the team list itself is queried once the token is cached.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 200)
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get(reverse('team-create'), **self.auth)
+
+        self.client.post(reverse('logout'), **self.auth)
+
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse('team-create'), **self.auth)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 401)
+
+    def test_each_request_gets_its_own_user(self):
+        authentication = CachedTokenAuthentication()
+        user, token = authentication.authenticate_credentials(self.token.key)
+        user.first_name = 'changed by a view'
+
+        cached_user, cached_token = authentication.authenticate_credentials(self.token.key)
+        self.assertIsNot(cached_user, user)
+        self.assertEqual(cached_user.pk, self.user.pk)
+        self.assertEqual(cached_user.first_name, '')
+        self.assertIsNot(cached_token, token)
+
+    @override_settings(TOKEN_CACHE_TTL=0.2)
+    def test_changes_from_other_processes_apply_once_the_ttl_expires(self):
+        self.client.get(reverse('team-create'), **self.auth)
+
+        # Like another process would: this process's cache isn't told.
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 200)
+
+        time.sleep(0.25)
+        self.assertEqual(self.client.get(reverse('team-create'), **self.auth).status_code, 401)
+
+
+class SessionSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='ash', password='pikachu123', email='ash@kanto.com')
+
+    def test_reads_do_not_write_the_session(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('team-create'))
+        expire_date = Session.objects.get().expire_date
+
+        with self.assertNumQueries(3):
+            self.client.get(reverse('team-create'))
+        self.assertEqual(Session.objects.get().expire_date, expire_date)
+
+    @override_settings(SESSION_REFRESH_INTERVAL=0)
+    def test_session_is_refreshed_after_interval(self):
+        self.client.force_login(self.user)
+        expire_date = Session.objects.get().expire_date
+
+        self.client.get(reverse('team-create'))
+
+        self.assertGreater(Session.objects.get().expire_date, expire_date)
@@ -24,6 +24,9 @@ class UserLogin(APIView):
 
 class UserLogout(APIView):
     def post(self, request):
+        if request.user.is_authenticated:
+            # Cached credentials are dropped by the Token post_delete receiver.
+            Token.objects.filter(user=request.user).delete()
         logout(request)
         return Response(status=status.HTTP_200_OK)
 